@@ -0,0 +1,19 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+
+class ListPaginationTests(TestCase):
+    def test_cursor_links_keep_the_encoded_search(self):
+        User = get_user_model()
+        admin = User.objects.create_user('admin@example.com', 'Admin', role='admin')
+        for i in range(25):
+            User.objects.create_user(f'a&b{i}@example.com', f'A&B #{i}')
+        self.client.force_login(admin)
+
+        response = self.client.get('/admin-panel/users/', {'q': 'a&b'})
+        next_url = f'?q=a%26b&cursor={response.context["users"].next_cursor}'
+        self.assertContains(response, f'href="{next_url}"')
+
+        response = self.client.get('/admin-panel/users/' + next_url)
+        self.assertEqual(len(response.context['users']), 5)
+        self.assertEqual(response.context['q'], 'a&b')
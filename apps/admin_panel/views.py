@@ -1,8 +1,9 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
-from django.db.models import Count, Sum, Q
-from django.db.models.functions import TruncDay, TruncMonth
+from django.db import transaction
+from django.db.models import Count, F, Sum, Q
+from django.db.models.functions import Greatest, TruncDay, TruncMonth
 from django.core.paginator import Paginator
 from django.http import JsonResponse
 from django.utils import timezone
@@ -10,11 +11,15 @@ from django.views.decorators.http import require_POST
 import json
 from datetime import timedelta, date
 
+from streamify_project.pagination import KeysetPaginator
 from .decorators import admin_required
 from apps.users.models import User
 from apps.content.models import Content, Genre, Comment, Like
+from apps.content.dedup import savings as media_savings
+from apps.content.result_cache import stats as result_cache_stats
 from apps.subscriptions.models import Plan, Subscription
 from apps.payments.models import Payment
+from apps.analytics.unique_viewers import SCOPE_SITE, unique_viewers
 
 
 # ──────────────────────────────────────────────
@@ -59,6 +64,11 @@ def dashboard_view(request):
     active_subs = Subscription.objects.filter(status='active', end_date__gte=now.date()).count()
     total_revenue = Payment.objects.filter(status='completed').aggregate(t=Sum('amount'))['t'] or 0
     revenue_30d = Payment.objects.filter(status='completed', payment_date__gte=thirty_days_ago).aggregate(t=Sum('amount'))['t'] or 0
+    today = timezone.localdate()
+    unique_viewers_30d = unique_viewers(SCOPE_SITE, 0, today - timedelta(days=29), today)
+    unique_viewers_today = unique_viewers(SCOPE_SITE, 0, today, today)
+    dedup = media_savings()
+    result_cache = result_cache_stats()
 
     # User growth chart data (last 30 days)
     user_growth = list(
@@ -112,6 +122,10 @@ def dashboard_view(request):
         'active_subs': active_subs,
         'total_revenue': float(total_revenue),
         'revenue_30d': float(revenue_30d),
+        'unique_viewers_30d': unique_viewers_30d,
+        'unique_viewers_today': unique_viewers_today,
+        'dedup': dedup,
+        'result_cache': result_cache,
         'user_growth_json': json.dumps([{'day': str(d.date()), 'count': c} for d, c in user_growth]),
         'revenue_chart_json': json.dumps([{'day': str(d.date()), 'total': float(t)} for d, t in revenue_chart]),
         'content_by_type_json': json.dumps(content_by_type),
@@ -141,14 +155,14 @@ def users_list_view(request):
     if role:
         qs = qs.filter(role=role)
 
-    paginator = Paginator(qs, 20)
-    users = paginator.get_page(request.GET.get('page', 1))
+    paginator = KeysetPaginator(qs, 20, ordering=('-date_joined', '-id'))
+    users = paginator.get_page(request.GET.get('cursor'))
 
     return render(request, 'admin_panel/users.html', {
         'users': users,
         'q': q,
         'role': role,
-        'total_count': qs.count(),
+        'total_count': paginator.count,
     })
 
 
@@ -217,11 +231,11 @@ def content_list_view(request):
         qs = qs.filter(is_published=False)
     elif status == 'premium':
         qs = qs.filter(is_premium=True)
-    paginator = Paginator(qs, 25)
-    content = paginator.get_page(request.GET.get('page', 1))
+    paginator = KeysetPaginator(qs, 25, ordering=('-uploaded_at', '-id'))
+    content = paginator.get_page(request.GET.get('cursor'))
     return render(request, 'admin_panel/content.html', {
         'content': content, 'q': q, 'ctype': ctype, 'status': status,
-        'total_count': qs.count(),
+        'total_count': paginator.count,
     })
 
 
@@ -251,19 +265,26 @@ def delete_content_view(request, pk):
 @admin_required
 def subscriptions_view(request):
     now = timezone.now()
+    # Active rows past their end date count as expired until
+    # `manage.py sweep_subscriptions` next marks them
+    lapsed = Q(status='active', end_date__lt=now.date())
+    by_status = {
+        'active': Q(status='active', end_date__gte=now.date()),
+        'expired': Q(status='expired') | lapsed,
+    }
     qs = Subscription.objects.select_related('user', 'plan').order_by('-created_at')
     status_filter = request.GET.get('status', '')
     if status_filter:
-        qs = qs.filter(status=status_filter)
+        qs = qs.filter(by_status.get(status_filter, Q(status=status_filter)))
     paginator = Paginator(qs, 25)
     subscriptions = paginator.get_page(request.GET.get('page', 1))
 
     # Stats
-    stats = {
-        'active': Subscription.objects.filter(status='active', end_date__gte=now.date()).count(),
-        'expired': Subscription.objects.filter(status='expired').count(),
-        'cancelled': Subscription.objects.filter(status='cancelled').count(),
-    }
+    stats = Subscription.objects.aggregate(
+        active=Count('pk', filter=by_status['active']),
+        expired=Count('pk', filter=by_status['expired']),
+        cancelled=Count('pk', filter=Q(status='cancelled')),
+    )
     plans = Plan.objects.annotate(sub_count=Count('subscription')).all()
 
     return render(request, 'admin_panel/subscriptions.html', {
@@ -334,8 +355,8 @@ def payments_view(request):
         qs = qs.filter(status=status_filter)
     if q:
         qs = qs.filter(Q(user__email__icontains=q) | Q(user__name__icontains=q))
-    paginator = Paginator(qs, 25)
-    payments = paginator.get_page(request.GET.get('page', 1))
+    paginator = KeysetPaginator(qs, 25, ordering=('-payment_date', '-id'), with_count=False)
+    payments = paginator.get_page(request.GET.get('cursor'))
     total_revenue = Payment.objects.filter(status='completed').aggregate(t=Sum('amount'))['t'] or 0
     return render(request, 'admin_panel/payments.html', {
         'payments': payments,
@@ -394,8 +415,8 @@ def comments_view(request):
     q = request.GET.get('q', '')
     if q:
         qs = qs.filter(Q(text__icontains=q) | Q(user__name__icontains=q))
-    paginator = Paginator(qs, 30)
-    comments = paginator.get_page(request.GET.get('page', 1))
+    paginator = KeysetPaginator(qs, 30, ordering=('-created_at', '-id'), with_count=False)
+    comments = paginator.get_page(request.GET.get('cursor'))
     return render(request, 'admin_panel/comments.html', {'comments': comments, 'q': q})
 
 
@@ -403,7 +424,9 @@ def comments_view(request):
 @require_POST
 def delete_comment_view(request, pk):
     comment = get_object_or_404(Comment, pk=pk)
-    comment.delete()
+    with transaction.atomic():
+        removed = comment.delete()[1].get(Comment._meta.label, 0)
+        Content.objects.filter(pk=comment.content_id).update(comment_count=Greatest(F('comment_count') - removed, 0))
     return JsonResponse({'deleted': True})
 
 
@@ -0,0 +1,76 @@
+"""
+HyperLogLog cardinality sketch.
+
+A sketch of precision p keeps 2**p one-byte registers (4 KiB at the default
+p=12, about 1.6% standard error) no matter how many items are added. Adding
+the same item twice changes nothing and two sketches merge by taking the
+register-wise maximum, so per-day sketches can be combined into any range.
+"""
+import hashlib
+import math
+import zlib
+
+DEFAULT_PRECISION = 12
+
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        if not 4 <= precision <= 18:
+            raise ValueError('precision must be between 4 and 18')
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.size)
+        if len(self.registers) != self.size:
+            raise ValueError(f'expected {self.size} registers, got {len(self.registers)}')
+
+    def __repr__(self):
+        return f'<HyperLogLog p={self.precision} ~{self.count()}>'
+
+    def add(self, value):
+        h = _hash64(value)
+        bits = 64 - self.precision
+        index = h >> bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError('cannot merge sketches of different precision')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = self.size
+        alpha = 0.7213 / (1 + 1.079 / m) if m >= 128 else {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is far more accurate while most registers are empty
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        """Compressed form for storage (sparse sketches shrink to a few dozen bytes)."""
+        return bytes([self.precision]) + zlib.compress(bytes(self.registers), 6)
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = bytes(data)
+        return cls(data[0], zlib.decompress(data[1:]))
+
+    @classmethod
+    def union(cls, sketches, precision=DEFAULT_PRECISION):
+        merged = cls(precision)
+        for sketch in sketches:
+            merged.merge(sketch)
+        return merged
@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.analytics.unique_viewers import backfill_unique_viewers
+
+
+class Command(BaseCommand):
+    help = 'Replay stored content views into the unique-viewer sketches (idempotent).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='How far back to replay')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        read = backfill_unique_viewers(since)
+        self.stdout.write(self.style.SUCCESS(f'Replayed {read} view(s) into unique-viewer sketches.'))
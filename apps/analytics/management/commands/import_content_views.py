@@ -0,0 +1,33 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.analytics.retention import archived_days, import_archived_views
+
+
+class Command(BaseCommand):
+    help = (
+        'Load archived content views for a date range back into content_views for ad-hoc analysis. '
+        'Rows keep their ids, so rollups are unaffected; the purger will archive them again later.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('start', nargs='?', help='First day, YYYY-MM-DD')
+        parser.add_argument('end', nargs='?', help='Last day, YYYY-MM-DD (defaults to start)')
+        parser.add_argument('--archive-dir', help='Override CONTENT_VIEW_ARCHIVE_DIR')
+        parser.add_argument('--list', action='store_true', help='List archived days and exit')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for day in archived_days(options['archive_dir']):
+                self.stdout.write(day.isoformat())
+            return
+        if not options['start']:
+            raise CommandError('Give a start date (YYYY-MM-DD) or --list.')
+        try:
+            start = date.fromisoformat(options['start'])
+            end = date.fromisoformat(options['end']) if options['end'] else start
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        read, inserted = import_archived_views(start, end, root=options['archive_dir'])
+        self.stdout.write(self.style.SUCCESS(f'Read {read} archived view(s), inserted {inserted}.'))
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('content', '0007_trending_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('position', models.BigIntegerField(default=0)),
+                ('horizon', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'rollup_watermarks',
+            },
+        ),
+        migrations.CreateModel(
+            name='ContentViewHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('content', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_views', to='content.content')),
+            ],
+            options={
+                'db_table': 'content_views_hourly',
+                'indexes': [models.Index(fields=['hour'], name='content_vie_hour_801a24_idx')],
+                'unique_together': {('content', 'hour')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ContentViewDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('content', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='content.content')),
+            ],
+            options={
+                'db_table': 'content_views_daily',
+                'indexes': [models.Index(fields=['day'], name='content_vie_day_805be9_idx')],
+                'unique_together': {('content', 'day')},
+            },
+        ),
+    ]
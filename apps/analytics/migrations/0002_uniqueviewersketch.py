@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UniqueViewerSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('content', 'Content'), ('creator', 'Creator'), ('site', 'Site')], max_length=10)),
+                ('key', models.BigIntegerField(help_text='Content or creator id (0 for the site)')),
+                ('day', models.DateField()),
+                ('sketch', models.BinaryField()),
+            ],
+            options={
+                'db_table': 'unique_viewer_sketches',
+                'unique_together': {('scope', 'key', 'day')},
+            },
+        ),
+    ]
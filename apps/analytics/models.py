@@ -0,0 +1,79 @@
+from django.db import models
+from django.utils import timezone
+
+
+class ContentViewHourly(models.Model):
+    """Views per content per hour, rolled up from ContentView by apps/analytics/rollups.py"""
+    content = models.ForeignKey('content.Content', on_delete=models.CASCADE, related_name='hourly_views')
+    hour = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'content_views_hourly'
+        unique_together = ('content', 'hour')
+        indexes = [models.Index(fields=['hour'])]
+
+    def __str__(self):
+        return f"{self.content_id} @ {self.hour:%Y-%m-%d %H:00}: {self.views}"
+
+
+class ContentViewDaily(models.Model):
+    """Views per content per day, rolled up from ContentView by apps/analytics/rollups.py"""
+    content = models.ForeignKey('content.Content', on_delete=models.CASCADE, related_name='daily_views')
+    day = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'content_views_daily'
+        unique_together = ('content', 'day')
+        indexes = [models.Index(fields=['day'])]
+
+    def __str__(self):
+        return f"{self.content_id} @ {self.day}: {self.views}"
+
+
+class RollupWatermark(models.Model):
+    """
+    Progress of a rollup over an append-only table, by primary key.
+
+    Rows up to ``position`` are aggregated; ``horizon`` is the highest id seen
+    on the previous run, which is the limit of the next one (ids below it were
+    allocated long enough ago that their transactions have committed).
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    position = models.BigIntegerField(default=0)
+    horizon = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'rollup_watermarks'
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class UniqueViewerSketch(models.Model):
+    """
+    HyperLogLog of distinct viewers for one content item, creator or the whole
+    site on one day, maintained by apps/analytics/unique_viewers.py
+    """
+    SCOPE_CONTENT = 'content'
+    SCOPE_CREATOR = 'creator'
+    SCOPE_SITE = 'site'
+    SCOPE_CHOICES = [
+        (SCOPE_CONTENT, 'Content'),
+        (SCOPE_CREATOR, 'Creator'),
+        (SCOPE_SITE, 'Site'),
+    ]
+
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    key = models.BigIntegerField(help_text='Content or creator id (0 for the site)')
+    day = models.DateField()
+    sketch = models.BinaryField()
+
+    class Meta:
+        db_table = 'unique_viewer_sketches'
+        unique_together = ('scope', 'key', 'day')
+
+    def __str__(self):
+        return f"{self.scope}:{self.key} @ {self.day}"
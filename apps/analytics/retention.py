@@ -0,0 +1,179 @@
+"""
+Retention for the raw content_views table.
+
+purge_expired_views() removes views older than CONTENT_VIEW_RETENTION_DAYS in
+bounded primary-key batches. Only rows already counted by the rollups are
+eligible, and each batch is first written to a gzipped CSV partition per day
+(``<archive>/date=YYYY-MM-DD/part-<first id>-<last id>.csv.gz``) so a range
+can be loaded back with import_archived_views(). Imported rows keep their
+ids and expire again; purging them checks the day's parts covering their
+ids and deletes them without archiving them a second time.
+"""
+import csv
+import gzip
+import os
+import re
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.content.models import Content, ContentView
+from .models import RollupWatermark
+from .rollups import rolled_up_through
+
+PURGE_LOCK = 'content_views_purge'
+DEFAULT_RETENTION_DAYS = 90
+BATCH_SIZE = 5000
+FIELDS = ('id', 'content_id', 'user_id', 'ip_address', 'watched_at')
+_PART_RE = re.compile(r'part-(\d+)-(\d+)\.csv\.gz')
+
+
+def archive_dir():
+    return Path(getattr(settings, 'CONTENT_VIEW_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'var' / 'archive' / 'content_views'))
+
+
+def retention_cutoff(days=None):
+    days = getattr(settings, 'CONTENT_VIEW_RETENTION_DAYS', DEFAULT_RETENTION_DAYS) if days is None else days
+    return timezone.now() - timedelta(days=days)
+
+
+def _partition(root, day):
+    return root / f'date={day.isoformat()}'
+
+
+def _write_partition(root, day, rows):
+    """Write rows atomically; the name is derived from the id range so a retried batch overwrites itself."""
+    directory = _partition(root, day)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'part-{rows[0][0]:012d}-{rows[-1][0]:012d}.csv.gz'
+    tmp = path.with_name(path.name + '.tmp')
+    with gzip.open(tmp, 'wt', newline='') as fh:
+        writer = csv.writer(fh)
+        writer.writerow(FIELDS)
+        for row in rows:
+            writer.writerow(['' if value is None else value for value in row[:4]] + [row[4].isoformat()])
+    with open(tmp, 'rb') as fh:
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+    return path
+
+
+def _archived_ids(root, day, first_id, last_id):
+    """Ids between ``first_id`` and ``last_id`` already in ``day``'s partition (re-imported rows)."""
+    ids = set()
+    for path in _partition(root, day).glob('part-*.csv.gz'):
+        match = _PART_RE.fullmatch(path.name)
+        # Parts are named by their id range: only overlapping ones are read
+        if not match or int(match[1]) > last_id or int(match[2]) < first_id:
+            continue
+        with gzip.open(path, 'rt', newline='') as fh:
+            ids.update(int(record['id']) for record in csv.DictReader(fh))
+    return ids
+
+
+def purge_expired_views(retention_days=None, batch_size=BATCH_SIZE, pause=0.0, max_batches=None, root=None):
+    """
+    Archive and delete expired, rolled-up views. Returns (rows_deleted, files_written).
+
+    ``pause`` sleeps between batches to leave room for foreground traffic.
+    """
+    root = Path(root) if root else archive_dir()
+    cutoff = retention_cutoff(retention_days)
+    limit = rolled_up_through()
+    RollupWatermark.objects.get_or_create(name=PURGE_LOCK)
+    deleted = files = batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            # One purger at a time; each batch is archived then deleted under the lock
+            lock = RollupWatermark.objects.select_for_update().get(name=PURGE_LOCK)
+            rows = list(
+                ContentView.objects.filter(pk__lte=limit, watched_at__lt=cutoff)
+                .order_by('pk').values_list(*FIELDS)[:batch_size]
+            )
+            if not rows:
+                return deleted, files
+            by_day = defaultdict(list)
+            for row in rows:
+                by_day[timezone.localtime(row[4]).date()].append(row)
+            for day, day_rows in by_day.items():
+                archived = _archived_ids(root, day, day_rows[0][0], day_rows[-1][0])
+                day_rows = [row for row in day_rows if row[0] not in archived]
+                if day_rows:
+                    _write_partition(root, day, day_rows)
+                    files += 1
+            deleted += ContentView.objects.filter(pk__in=[row[0] for row in rows]).delete()[0]
+            lock.position = rows[-1][0]
+            lock.updated_at = timezone.now()
+            lock.save(update_fields=['position', 'updated_at'])
+        batches += 1
+        if pause:
+            time.sleep(pause)
+    return deleted, files
+
+
+def archived_days(root=None):
+    root = Path(root) if root else archive_dir()
+    if not root.exists():
+        return []
+    return sorted(date.fromisoformat(p.name.split('=', 1)[1]) for p in root.glob('date=*') if p.is_dir())
+
+
+def read_archive(start, end, root=None):
+    """Yield ContentView-shaped dicts archived between ``start`` and ``end`` (dates, inclusive)."""
+    root = Path(root) if root else archive_dir()
+    day = start
+    while day <= end:
+        for path in sorted(_partition(root, day).glob('part-*.csv.gz')):
+            with gzip.open(path, 'rt', newline='') as fh:
+                yield from csv.DictReader(fh)
+        day += timedelta(days=1)
+
+
+def import_archived_views(start, end, root=None, batch_size=BATCH_SIZE):
+    """
+    Load an archived date range back into content_views, keeping original ids
+    (so the rollups are not double counted and repeated imports are no-ops).
+    Views of content or users deleted since are loaded without them / skipped.
+    Returns (rows_read, rows_inserted).
+    """
+    read = inserted = 0
+    batch = []
+
+    def flush():
+        nonlocal inserted
+        live_content = set(
+            Content.objects.filter(pk__in={view.content_id for view in batch}).values_list('pk', flat=True)
+        )
+        live_users = set(get_user_model().objects.filter(
+            pk__in={view.user_id for view in batch if view.user_id is not None}
+        ).values_list('pk', flat=True))
+        views = [view for view in batch if view.content_id in live_content]
+        for view in views:
+            if view.user_id not in live_users:
+                view.user_id = None
+        before = ContentView.objects.filter(pk__in=[view.pk for view in views]).count()
+        ContentView.objects.bulk_create(views, ignore_conflicts=True)
+        inserted += len(views) - before
+        batch.clear()
+
+    for record in read_archive(start, end, root):
+        read += 1
+        batch.append(ContentView(
+            pk=int(record['id']),
+            content_id=int(record['content_id']),
+            user_id=int(record['user_id']) if record['user_id'] else None,
+            ip_address=record['ip_address'] or None,
+            watched_at=parse_datetime(record['watched_at']),
+        ))
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return read, inserted
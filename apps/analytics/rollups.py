@@ -0,0 +1,131 @@
+"""
+Hourly and daily rollups of ContentView.
+
+roll_up_views() aggregates raw views by primary-key range into
+ContentViewHourly and ContentViewDaily. Each batch and the watermark move
+together in one transaction, so a crashed or repeated run never counts a view
+twice. Readers combine the rollups with the short tail of raw rows above the
+watermark, so figures stay exact and raw rows below the watermark can be
+pruned without changing any report.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, DateField, Max, Sum
+from django.db.models.functions import TruncDate, TruncHour, TruncMonth
+from django.utils import timezone
+
+from apps.content.models import Content, ContentView
+from .models import ContentViewDaily, ContentViewHourly, RollupWatermark
+
+WATERMARK = 'content_views'
+BATCH_SIZE = 50_000
+
+
+def rolled_up_through():
+    """Highest ContentView id already counted in the rollups (safe to prune up to here)."""
+    return RollupWatermark.objects.filter(name=WATERMARK).values_list('position', flat=True).first() or 0
+
+
+def _merge(model, key_field, deltas):
+    """Add ``deltas`` {(content_id, key): views} onto existing rollup rows."""
+    existing = model.objects.filter(
+        content_id__in={content_id for content_id, _ in deltas},
+        **{f'{key_field}__in': {key for _, key in deltas}},
+    ).values_list('content_id', key_field, 'views')
+    totals = Counter(deltas)
+    for content_id, key, views in existing:
+        if (content_id, key) in totals:
+            totals[(content_id, key)] += views
+    model.objects.bulk_create(
+        [model(content_id=content_id, views=views, **{key_field: key}) for (content_id, key), views in totals.items()],
+        update_conflicts=True, unique_fields=['content', key_field], update_fields=['views'],
+    )
+
+
+def _roll_batch(watermark, upper):
+    hourly = Counter({
+        (content_id, hour): n for content_id, hour, n in
+        ContentView.objects.filter(pk__gt=watermark.position, pk__lte=upper).order_by()
+        .annotate(hour=TruncHour('watched_at')).values('content_id', 'hour')
+        .annotate(n=Count('id')).values_list('content_id', 'hour', 'n')
+    })
+    # Views of deleted content are not rolled up (the raw rows await the purger)
+    live = set(Content.objects.filter(pk__in={content_id for content_id, _ in hourly}).values_list('pk', flat=True))
+    counted = sum(hourly.values())
+    hourly = Counter({key: n for key, n in hourly.items() if key[0] in live})
+    daily = Counter()
+    for (content_id, hour), n in hourly.items():
+        daily[(content_id, timezone.localtime(hour).date())] += n
+    if hourly:
+        _merge(ContentViewHourly, 'hour', hourly)
+        _merge(ContentViewDaily, 'day', daily)
+    return counted
+
+
+def roll_up_views(batch_size=BATCH_SIZE, settle=True):
+    """
+    Roll raw views into the hourly/daily tables. Returns views counted.
+
+    With settle=True only ids seen by the previous run are rolled up, so a
+    view flush still in flight cannot be skipped; settle=False rolls up to
+    the current maximum (backfills, or when nothing else is writing).
+    """
+    RollupWatermark.objects.get_or_create(name=WATERMARK)
+    counted = 0
+    while True:
+        with transaction.atomic():
+            # The row lock also keeps two rollup runs from interleaving
+            watermark = RollupWatermark.objects.select_for_update().get(name=WATERMARK)
+            if watermark.position >= watermark.horizon or not settle:
+                top = ContentView.objects.aggregate(top=Max('pk'))['top'] or 0
+                if settle or watermark.position >= top:
+                    watermark.horizon = top
+                    watermark.updated_at = timezone.now()
+                    watermark.save(update_fields=['horizon', 'updated_at'])
+                    return counted
+                watermark.horizon = top
+            upper = min(watermark.position + batch_size, watermark.horizon)
+            counted += _roll_batch(watermark, upper)
+            watermark.position = upper
+            watermark.updated_at = timezone.now()
+            watermark.save(update_fields=['position', 'updated_at'])
+
+
+# ── Readers ───────────────────────────────────
+
+def _tail(content_filter):
+    return ContentView.objects.filter(pk__gt=rolled_up_through(), **content_filter).order_by()
+
+
+def total_views(**content_filter):
+    """Exact view total for content matching ``content_filter`` (e.g. content__uploaded_by=user)."""
+    rolled = ContentViewDaily.objects.filter(**content_filter).aggregate(total=Sum('views'))['total'] or 0
+    return rolled + _tail(content_filter).count()
+
+
+def views_by_month(**content_filter):
+    """[{'month': date, 'count': int}, ...] oldest first."""
+    months = Counter(dict(
+        ContentViewDaily.objects.filter(**content_filter).order_by()
+        .annotate(month=TruncMonth('day')).values('month')
+        .annotate(views=Sum('views')).values_list('month', 'views')
+    ))
+    months.update(dict(
+        _tail(content_filter).annotate(month=TruncMonth('watched_at', output_field=DateField()))
+        .values('month').annotate(n=Count('id')).values_list('month', 'n')
+    ))
+    return [{'month': month, 'count': months[month]} for month in sorted(months)]
+
+
+def views_by_day(since, **content_filter):
+    """[(date, views), ...] from ``since`` (a date) onwards, oldest first."""
+    days = Counter(dict(
+        ContentViewDaily.objects.filter(day__gte=since, **content_filter).order_by()
+        .values('day').annotate(views=Sum('views')).values_list('day', 'views')
+    ))
+    days.update(dict(
+        _tail(content_filter).annotate(day=TruncDate('watched_at')).filter(day__gte=since)
+        .values('day').annotate(n=Count('id')).values_list('day', 'n')
+    ))
+    return sorted(days.items())
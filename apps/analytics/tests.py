@@ -0,0 +1,105 @@
+import datetime
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.content.models import Content, ContentView
+
+from . import retention, unique_viewers
+from .models import RollupWatermark, UniqueViewerSketch
+from .rollups import WATERMARK
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        user = get_user_model().objects.create_user('creator@example.com', 'Creator', role='creator')
+        content = Content.objects.create(
+            title='Track', content_type='music', file_path='local:x.mp3', uploaded_by=user, is_published=True,
+        )
+        self.old = timezone.now() - datetime.timedelta(days=200)
+        ContentView.objects.bulk_create([
+            ContentView(content=content, ip_address='127.0.0.1', watched_at=self.old + datetime.timedelta(hours=i))
+            for i in range(10)
+        ])
+        self.ids = sorted(ContentView.objects.values_list('pk', flat=True))
+        # Everything is counted by the rollups
+        RollupWatermark.objects.create(name=WATERMARK, position=self.ids[-1])
+
+    def archived(self):
+        day = timezone.localtime(self.old).date()
+        return [int(record['id']) for record in retention.read_archive(day, day + datetime.timedelta(days=1), self.root)]
+
+    def parts(self):
+        return sorted(path.name for path in Path(self.root).rglob('part-*.csv.gz'))
+
+    def test_purge_archives_then_deletes(self):
+        deleted, files = retention.purge_expired_views(batch_size=4, root=self.root)
+        self.assertEqual(deleted, 10)
+        self.assertGreaterEqual(files, 3)
+        self.assertFalse(ContentView.objects.exists())
+        self.assertEqual(self.archived(), self.ids)
+
+    def test_reimported_rows_are_not_archived_twice(self):
+        retention.purge_expired_views(batch_size=4, root=self.root)
+        parts = self.parts()
+        day = timezone.localtime(self.old).date()
+        self.assertEqual(retention.import_archived_views(day, day + datetime.timedelta(days=1), self.root), (10, 10))
+        self.assertEqual(sorted(ContentView.objects.values_list('pk', flat=True)), self.ids)
+
+        # Purged again in different batches: deleted, but no new parts
+        deleted, files = retention.purge_expired_views(batch_size=3, root=self.root)
+        self.assertEqual((deleted, files), (10, 0))
+        self.assertEqual(self.parts(), parts)
+        self.assertEqual(self.archived(), self.ids)
+
+    def test_new_rows_beside_reimported_ones_are_archived(self):
+        retention.purge_expired_views(batch_size=4, root=self.root)
+        day = timezone.localtime(self.old).date()
+        retention.import_archived_views(day, day + datetime.timedelta(days=1), self.root)
+        late = ContentView.objects.create(content_id=ContentView.objects.first().content_id, watched_at=self.old)
+        RollupWatermark.objects.filter(name=WATERMARK).update(position=late.pk)
+
+        deleted, files = retention.purge_expired_views(root=self.root)
+        self.assertEqual((deleted, files), (11, 1))
+        self.assertEqual(sorted(self.archived()), sorted(self.ids + [late.pk]))
+
+    def test_import_drops_deleted_users_and_skips_deleted_content(self):
+        viewer = get_user_model().objects.create_user('viewer@example.com', 'Viewer')
+        ContentView.objects.filter(pk__in=self.ids[:5]).update(user=viewer)
+        retention.purge_expired_views(batch_size=4, root=self.root)
+        viewer.delete()
+        day = timezone.localtime(self.old).date()
+        self.assertEqual(retention.import_archived_views(day, day + datetime.timedelta(days=1), self.root, 4), (10, 10))
+        self.assertFalse(ContentView.objects.filter(user__isnull=False).exists())
+
+        ContentView.objects.all().delete()
+        Content.objects.all().delete()
+        self.assertEqual(retention.import_archived_views(day, day + datetime.timedelta(days=1), self.root, 4), (10, 0))
+
+
+class UniqueViewerTests(TestCase):
+    def test_locks_only_the_sketches_it_updates(self):
+        today = timezone.now()
+        yesterday = today - datetime.timedelta(days=1)
+        unique_viewers.record_unique_viewers([(1, 7, None, today), (2, 8, None, yesterday)], {1: 5, 2: 5})
+        self.assertEqual(UniqueViewerSketch.objects.count(), 6)
+
+        # Content 1 yesterday and content 2 today exist but are not touched
+        unique_viewers.record_unique_viewers([(1, 7, None, yesterday), (2, 8, None, today)], {1: 5, 2: 5})
+        with mock.patch.object(unique_viewers, 'LOCK_CHUNK', 2), CaptureQueriesContext(connection) as queries:
+            unique_viewers.record_unique_viewers([(1, 9, None, today), (2, 9, None, yesterday)], {1: 5, 2: 5})
+        locked = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        self.assertEqual(len(locked), 3)
+        with connection.cursor() as cursor:
+            self.assertEqual(sum(len(cursor.execute(sql).fetchall()) for sql in locked), 6)
+        self.assertEqual(unique_viewers.unique_viewers(unique_viewers.SCOPE_CONTENT, 1, end=today.date()), 2)
+        self.assertEqual(unique_viewers.unique_viewers(unique_viewers.SCOPE_CREATOR, 5, end=today.date()), 3)
@@ -0,0 +1,119 @@
+"""
+Distinct-viewer counts from per-day HyperLogLog sketches.
+
+record_unique_viewers() folds a batch of view events into the sketches of
+each content item, its creator and the site for the day of the view; it is
+called by the view buffer as views are written. Because sketches ignore
+repeats, replaying the same views (see backfill_unique_viewers) is harmless.
+Ranges are answered by merging one small row per day, never by scanning
+content_views.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .hll import HyperLogLog
+from .models import UniqueViewerSketch
+
+SCOPE_CONTENT = UniqueViewerSketch.SCOPE_CONTENT
+SCOPE_CREATOR = UniqueViewerSketch.SCOPE_CREATOR
+SCOPE_SITE = UniqueViewerSketch.SCOPE_SITE
+
+# Sketch rows locked per query (three parameters each)
+LOCK_CHUNK = 300
+
+
+def viewer_key(user_id, ip_address):
+    """Signed-in viewers are counted by account, anonymous ones by address."""
+    if user_id:
+        return f'u{user_id}'
+    if ip_address:
+        return f'ip{ip_address}'
+    return None
+
+
+def record_unique_viewers(views, creators):
+    """
+    ``views`` are (content_id, user_id, ip_address, watched_at) tuples and
+    ``creators`` maps content id to uploader id. Call inside a transaction.
+    """
+    pending = defaultdict(set)
+    for content_id, user_id, ip_address, watched_at in views:
+        viewer = viewer_key(user_id, ip_address)
+        if viewer is None or content_id not in creators:
+            continue
+        day = timezone.localtime(watched_at).date()
+        pending[(SCOPE_CONTENT, content_id, day)].add(viewer)
+        pending[(SCOPE_CREATOR, creators[content_id], day)].add(viewer)
+        pending[(SCOPE_SITE, 0, day)].add(viewer)
+    if not pending:
+        return 0
+
+    UniqueViewerSketch.objects.bulk_create(
+        [UniqueViewerSketch(scope=scope, key=key, day=day, sketch=HyperLogLog().to_bytes())
+         for scope, key, day in pending],
+        ignore_conflicts=True,
+    )
+    keys = sorted(pending)
+    changed = []
+    # Exact (scope, key, day) rows in fixed lock order, a chunk at a time so
+    # the query stays within the database's parameter limit
+    for offset in range(0, len(keys), LOCK_CHUNK):
+        condition = Q()
+        for scope, key, day in keys[offset:offset + LOCK_CHUNK]:
+            condition |= Q(scope=scope, key=key, day=day)
+        rows = UniqueViewerSketch.objects.select_for_update().filter(condition).order_by('scope', 'key', 'day')
+        for row in rows:
+            sketch = HyperLogLog.from_bytes(row.sketch)
+            before = bytes(sketch.registers)
+            sketch.update(pending[(row.scope, row.key, row.day)])
+            if sketch.registers != before:
+                row.sketch = sketch.to_bytes()
+                changed.append(row)
+    UniqueViewerSketch.objects.bulk_update(changed, ['sketch'], batch_size=500)
+    return len(changed)
+
+
+def _merged(scope, keys, start, end):
+    rows = UniqueViewerSketch.objects.filter(scope=scope, key__in=keys, day__range=(start, end))
+    merged = {key: HyperLogLog() for key in keys}
+    for key, data in rows.values_list('key', 'sketch').iterator():
+        merged[key].merge(HyperLogLog.from_bytes(data))
+    return merged
+
+
+def unique_viewers(scope, key=0, start=None, end=None):
+    """Estimated distinct viewers of one scope/key between two dates (inclusive)."""
+    end = end or timezone.localdate()
+    start = start or end - timedelta(days=29)
+    return _merged(scope, [key], start, end)[key].count()
+
+
+def unique_viewers_by_key(scope, keys, start=None, end=None):
+    """{key: estimated distinct viewers} for several content items or creators at once."""
+    end = end or timezone.localdate()
+    start = start or end - timedelta(days=29)
+    return {key: sketch.count() for key, sketch in _merged(scope, list(keys), start, end).items()}
+
+
+def backfill_unique_viewers(since, batch_size=10_000):
+    """Replay raw views from ``since`` into the sketches. Returns views read."""
+    from apps.content.models import Content, ContentView
+
+    creators = dict(Content.objects.values_list('pk', 'uploaded_by_id'))
+    read = 0
+    last = 0
+    while True:
+        batch = list(
+            ContentView.objects.filter(pk__gt=last, watched_at__gte=since).order_by('pk')
+            .values_list('pk', 'content_id', 'user_id', 'ip_address', 'watched_at')[:batch_size]
+        )
+        if not batch:
+            return read
+        with transaction.atomic():
+            record_unique_viewers([row[1:] for row in batch], creators)
+        read += len(batch)
+        last = batch[-1][0]
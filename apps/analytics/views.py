@@ -1,9 +1,26 @@
+from datetime import timedelta
+
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Sum
-from django.db.models.functions import TruncMonth
-from apps.content.models import Content, ContentView
+from django.db.models import Sum
+from django.utils import timezone
+from apps.content.models import Content
 from apps.payments.models import Payment
+from . import rollups
+from .unique_viewers import SCOPE_CONTENT, SCOPE_CREATOR, SCOPE_SITE, unique_viewers, unique_viewers_by_key
+
+RANGE_CHOICES = (7, 30, 90, 365)
+
+
+def _date_range(request):
+    try:
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        days = 30
+    if days not in RANGE_CHOICES:
+        days = 30
+    end = timezone.localdate()
+    return days, end - timedelta(days=days - 1), end
 
 
 @login_required
@@ -12,21 +29,24 @@ def creator_analytics_view(request):
         from django.shortcuts import redirect
         return redirect('content:home')
     my_content = Content.objects.filter(uploaded_by=request.user)
-    total_views = ContentView.objects.filter(content__in=my_content).count()
-    top_content = my_content.order_by('-view_count')[:10]
-    monthly_views = (
-        ContentView.objects
-        .filter(content__in=my_content)
-        .annotate(month=TruncMonth('watched_at'))
-        .values('month')
-        .annotate(count=Count('id'))
-        .order_by('month')
-    )
+    # Read from the hourly/daily rollups, never the raw views table
+    total_views = rollups.total_views(content__uploaded_by=request.user)
+    top_content = list(my_content.order_by('-view_count')[:10])
+    monthly_views = rollups.views_by_month(content__uploaded_by=request.user)
+    # Distinct viewers come from merged per-day HyperLogLog sketches
+    days, start, end = _date_range(request)
+    unique_total = unique_viewers(SCOPE_CREATOR, request.user.pk, start, end)
+    unique_by_content = unique_viewers_by_key(SCOPE_CONTENT, [item.pk for item in top_content], start, end)
+    for item in top_content:
+        item.unique_viewers = unique_by_content[item.pk]
     context = {
         'my_content': my_content,
         'total_views': total_views,
+        'unique_viewers': unique_total,
+        'days': days,
+        'range_choices': RANGE_CHOICES,
         'top_content': top_content,
-        'monthly_views': list(monthly_views),
+        'monthly_views': monthly_views,
         'total_content': my_content.count(),
     }
     return render(request, 'analytics/creator.html', context)
@@ -41,13 +61,17 @@ def admin_analytics_view(request):
     total_users = User.objects.count()
     total_content = Content.objects.count()
     total_revenue = Payment.objects.filter(status='completed').aggregate(total=Sum('amount'))['total'] or 0
-    total_views = ContentView.objects.count()
+    total_views = rollups.total_views()
+    days, start, end = _date_range(request)
     recent_payments = Payment.objects.filter(status='completed').order_by('-payment_date')[:10]
     context = {
         'total_users': total_users,
         'total_content': total_content,
         'total_revenue': total_revenue,
         'total_views': total_views,
+        'unique_viewers': unique_viewers(SCOPE_SITE, 0, start, end),
+        'days': days,
+        'range_choices': RANGE_CHOICES,
         'recent_payments': recent_payments,
     }
     return render(request, 'analytics/admin.html', context)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Content, Comment, Genre, Like, ContentView
+from .models import Content, Comment, Genre, Like, ContentView, MediaBlob, MediaJob
 
 
 @admin.register(Genre)
@@ -16,7 +16,22 @@ class ContentAdmin(admin.ModelAdmin):
     list_editable = ['is_published', 'is_premium']
     filter_horizontal = ['genre']
     date_hierarchy = 'uploaded_at'
-    readonly_fields = ['view_count', 'uploaded_at', 'updated_at']
+    readonly_fields = ['view_count', 'like_count', 'comment_count', 'trending_score', 'uploaded_at', 'updated_at',
+                       'processing_status', 'codec', 'bitrate', 'width', 'height', 'file_blob']
+
+
+@admin.register(MediaJob)
+class MediaJobAdmin(admin.ModelAdmin):
+    list_display = ['content', 'status', 'attempts', 'run_after', 'updated_at']
+    list_filter = ['status']
+    readonly_fields = ['content', 'source', 'attempts', 'locked_at', 'last_error', 'created_at', 'updated_at']
+
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ['sha256', 'size', 'ref_count', 'reuse_count', 'created_at']
+    search_fields = ['sha256', 'stored']
+    readonly_fields = ['sha256', 'size', 'stored', 'ref_count', 'reuse_count', 'created_at']
 
 
 @admin.register(Comment)
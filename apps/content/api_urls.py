@@ -1,8 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .api_views import ContentViewSet
+from .api_views import ContentViewSet, UploadViewSet
 
 router = DefaultRouter()
+# Registered first: the content detail route would otherwise match 'uploads/'
+router.register(r'uploads', UploadViewSet, basename='upload')
 router.register(r'', ContentViewSet, basename='content')
 
 urlpatterns = [
@@ -1,6 +1,15 @@
-from rest_framework import serializers, viewsets, permissions, filters
+from django.db.models import prefetch_related_objects
+from django.shortcuts import get_object_or_404
+from rest_framework import serializers, viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
-from .models import Content, Comment, Genre, Like
+from apps.search.filters import FullTextSearchFilter, RelevanceOrderingFilter
+from streamify_project.pagination import KeysetPagination
+from streamify_project.thumbnails import SrcsetField
+from . import result_cache, uploads
+from .models import Content, Comment, Genre, Like, UploadSession
+from .recommendations import TOP_N, recommendations_for
 
 
 class GenreSerializer(serializers.ModelSerializer):
@@ -15,11 +24,12 @@ class ContentSerializer(serializers.ModelSerializer):
     like_count = serializers.ReadOnlyField()
     comment_count = serializers.ReadOnlyField()
     duration_display = serializers.ReadOnlyField()
+    thumbnail_srcset = SrcsetField(source='thumbnail')
 
     class Meta:
         model = Content
-        fields = ['id', 'title', 'description', 'content_type', 'file_path', 'thumbnail',
-                  'duration', 'duration_display', 'genre', 'artist_name', 'album',
+        fields = ['id', 'title', 'description', 'content_type', 'file_path', 'thumbnail', 'thumbnail_srcset',
+                  'duration', 'duration_display', 'processing_status', 'codec', 'bitrate', 'width', 'height', 'genre', 'artist_name', 'album',
                   'is_premium', 'view_count', 'like_count', 'comment_count',
                   'uploaded_by_name', 'uploaded_at']
 
@@ -36,13 +46,17 @@ class CommentSerializer(serializers.ModelSerializer):
 class ContentViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Content.objects.filter(is_published=True)
     serializer_class = ContentSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = KeysetPagination
+    # ?search= is answered from the full-text index, best matches first
+    filter_backends = [FullTextSearchFilter, RelevanceOrderingFilter]
     search_fields = ['title', 'description', 'artist_name', 'album']
-    ordering_fields = ['uploaded_at', 'view_count', 'title']
+    ordering_fields = ['uploaded_at', 'view_count', 'trending_score', 'title']
     ordering = ['-uploaded_at']
 
     def get_queryset(self):
-        qs = super().get_queryset()
+        # Uploader joined and genres prefetched so a page costs a fixed number
+        # of queries; like/comment counts are stored columns on Content.
+        qs = super().get_queryset().select_related('uploaded_by').prefetch_related('genre')
         content_type = self.request.query_params.get('type')
         genre = self.request.query_params.get('genre')
         if content_type:
@@ -50,3 +64,135 @@ class ContentViewSet(viewsets.ReadOnlyModelViewSet):
         if genre:
             qs = qs.filter(genre__slug=genre)
         return qs
+
+    def list(self, request, *args, **kwargs):
+        # Pages are cached as ids (result_cache.py); the rows are always fresh
+        params = {name: request.query_params.get(name, '') for name in ('type', 'genre', 'ordering', 'cursor')}
+        params['search'] = result_cache.normalize_query(request.query_params.get('search', ''))
+        computed = []
+
+        def compute():
+            computed.append(self.paginate_queryset(self.filter_queryset(self.get_queryset())))
+            page = self.paginator.page
+            return {'ids': [item.pk for item in computed[0]], 'next': page.next_cursor, 'previous': page.previous_cursor}
+
+        cached = result_cache.cached(
+            'api', params, compute, depends_on=result_cache.dependencies(params['type'], params['genre']),
+        )
+        if computed:
+            rows = computed[0]
+        else:
+            by_id = self.get_queryset().in_bulk(cached['ids'])
+            rows = self.paginator.restore_page(
+                request, [by_id[pk] for pk in cached['ids'] if pk in by_id], cached['next'], cached['previous'],
+            )
+        return self.get_paginated_response(self.get_serializer(rows, many=True).data)
+
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated])
+    def recommended(self, request):
+        items = recommendations_for(request.user, limit=TOP_N)
+        prefetch_related_objects(items, 'genre')
+        return Response(self.get_serializer(items, many=True).data)
+
+
+class UploadSessionCreateSerializer(serializers.Serializer):
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    mime_type = serializers.CharField(max_length=100, required=False, default='')
+    checksum = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False, default='')
+    title = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, default='', allow_blank=True)
+    content_type = serializers.ChoiceField(choices=Content.TYPE_CHOICES)
+    genre = serializers.PrimaryKeyRelatedField(queryset=Genre.objects.all(), many=True, required=False, default=list)
+    artist_name = serializers.CharField(max_length=255, required=False, default='', allow_blank=True)
+    album = serializers.CharField(max_length=255, required=False, default='', allow_blank=True)
+    is_published = serializers.BooleanField(required=False, default=False)
+    is_premium = serializers.BooleanField(required=False, default=False)
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    missing = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'total_size', 'chunk_size', 'chunk_count', 'status',
+                  'missing', 'content', 'expires_at']
+
+    def get_missing(self, session):
+        return uploads.missing_ranges(session) if session.status == 'active' else []
+
+
+class IsCreator(permissions.BasePermission):
+    message = 'Only creators can upload content.'
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and request.user.is_creator)
+
+
+class UploadViewSet(viewsets.ViewSet):
+    """
+    Resumable uploads: POST to open a session, PUT each chunk to
+    ``<id>/chunks/<offset>/`` with an ``X-Chunk-SHA256`` header, GET the
+    session to see which byte ranges are still missing, then POST
+    ``<id>/finalize/`` to create the Content.
+    """
+    permission_classes = [IsCreator]
+    lookup_value_regex = '[0-9a-f-]{36}'
+
+    def _session(self, pk):
+        return get_object_or_404(UploadSession, pk=pk, user=self.request.user)
+
+    def _error(self, error):
+        return Response({'detail': str(error)}, status=error.status)
+
+    def create(self, request):
+        serializer = UploadSessionCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = dict(serializer.validated_data)
+        file_fields = {key: data.pop(key) for key in ('filename', 'size', 'mime_type', 'checksum')}
+        data['genre'] = [genre.pk for genre in data['genre']]
+        try:
+            session = uploads.start_session(
+                request.user, file_fields['filename'], file_fields['size'], data,
+                mime_type=file_fields['mime_type'], checksum=file_fields['checksum'],
+            )
+        except uploads.UploadError as error:
+            return self._error(error)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        return Response(UploadSessionSerializer(self._session(pk)).data)
+
+    def destroy(self, request, pk=None):
+        session = self._session(pk)
+        if session.status == 'finalizing':
+            return Response({'detail': 'This upload is being finalized.'}, status=status.HTTP_409_CONFLICT)
+        if session.status == 'active':
+            uploads.discard_parts(session.pk)
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=['put'], url_path=r'chunks/(?P<offset>\d+)')
+    def chunk(self, request, pk=None, offset=None):
+        session = self._session(pk)
+        # Read the raw body as a stream; request.data would buffer the whole chunk
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        stream = request.stream
+        if stream is None:
+            return Response({'detail': 'Empty chunk.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            index = uploads.write_chunk(
+                session, int(offset), stream, length, request.META.get('HTTP_X_CHUNK_SHA256', ''),
+            )
+        except uploads.UploadError as error:
+            return self._error(error)
+        return Response({'index': index, 'missing': uploads.missing_ranges(session)})
+
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        session = self._session(pk)
+        try:
+            content = uploads.finalize(session)
+        except uploads.UploadError as error:
+            return self._error(error)
+        return Response(ContentSerializer(content).data, status=status.HTTP_201_CREATED)
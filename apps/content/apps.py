@@ -5,3 +5,18 @@ class ContentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.content'
     verbose_name = 'Content'
+
+    def ready(self):
+        from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+
+        from . import dedup, result_cache
+        from .models import Content, Genre
+
+        post_save.connect(dedup.content_saved, sender=Content, dispatch_uid='content_release_replaced_blobs')
+        post_delete.connect(dedup.content_deleted, sender=Content, dispatch_uid='content_release_media_blob')
+        pre_save.connect(result_cache.content_pre_save, sender=Content, dispatch_uid='result_cache_content_before')
+        post_save.connect(result_cache.content_saved, sender=Content, dispatch_uid='result_cache_content_saved')
+        pre_delete.connect(result_cache.content_pre_delete, sender=Content, dispatch_uid='result_cache_content_deleted')
+        m2m_changed.connect(result_cache.genres_changed, sender=Content.genre.through, dispatch_uid='result_cache_genres')
+        post_save.connect(result_cache.genre_changed, sender=Genre, dispatch_uid='result_cache_genre_saved')
+        post_delete.connect(result_cache.genre_changed, sender=Genre, dispatch_uid='result_cache_genre_deleted')
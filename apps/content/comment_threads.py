@@ -0,0 +1,104 @@
+"""
+Threaded comments for the content detail page.
+
+A page of top-level comments and the first few replies to each one are
+loaded in two queries (replies are picked with a ROW_NUMBER() window per
+parent) and assembled into a tree in memory. Further replies and further
+pages are fetched by cursor through the JSON endpoints in views.py.
+"""
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from django.utils.timesince import timesince
+
+from streamify_project.pagination import KeysetPaginator
+from .models import Comment
+
+COMMENTS_PER_PAGE = 20
+REPLY_PREVIEW = 3
+REPLIES_PER_PAGE = 20
+
+# Newest conversations first, replies in the order they were written
+THREAD_ORDERING = ('-created_at', '-id')
+REPLY_ORDERING = ('created_at', 'id')
+
+
+def _thread_paginator(content, per_page=COMMENTS_PER_PAGE):
+    queryset = content.comments.filter(parent=None).select_related('user')
+    return KeysetPaginator(queryset, per_page, ordering=THREAD_ORDERING, with_count=False, salt='comments')
+
+
+def _reply_paginator(parent_id, per_page=REPLIES_PER_PAGE):
+    queryset = Comment.objects.filter(parent_id=parent_id).select_related('user')
+    return KeysetPaginator(queryset, per_page, ordering=REPLY_ORDERING, with_count=False, salt='comment-replies')
+
+
+def attach_replies(comments, limit=REPLY_PREVIEW):
+    """Set preview_replies, reply_count and replies_cursor on each comment (one query)."""
+    by_id = {comment.pk: comment for comment in comments}
+    for comment in comments:
+        comment.preview_replies = []
+        comment.reply_count = 0
+        comment.replies_cursor = None
+    if not by_id:
+        return comments
+
+    replies = (
+        Comment.objects.filter(parent_id__in=by_id).select_related('user')
+        .annotate(
+            position=Window(
+                RowNumber(), partition_by=[F('parent_id')],
+                order_by=[F('created_at').asc(), F('id').asc()],
+            ),
+            sibling_count=Window(Count('id'), partition_by=[F('parent_id')]),
+        )
+        .filter(position__lte=limit)
+        .order_by('parent_id', 'position')
+    )
+    for reply in replies:
+        parent = by_id[reply.parent_id]
+        parent.preview_replies.append(reply)
+        parent.reply_count = reply.sibling_count
+
+    for comment in comments:
+        if comment.reply_count > len(comment.preview_replies):
+            paginator = _reply_paginator(comment.pk)
+            comment.replies_cursor = paginator.encode_cursor(comment.preview_replies[-1])
+    return comments
+
+
+def thread_page(content, cursor=None, strict=False):
+    """
+    Return a KeysetPage of top-level comments with their reply previews.
+
+    With strict=True an invalid cursor raises InvalidCursor instead of
+    falling back to the first page.
+    """
+    paginator = _thread_paginator(content)
+    page = paginator.page(cursor) if strict else paginator.get_page(cursor)
+    attach_replies(page.object_list)
+    return page
+
+
+def reply_page(parent_id, cursor=None):
+    """Return a KeysetPage of replies to one comment; raises InvalidCursor."""
+    return _reply_paginator(parent_id).page(cursor)
+
+
+def serialize_comment(comment, viewer, content_owner_id):
+    user = comment.user
+    data = {
+        'id': comment.pk,
+        'parent': comment.parent_id,
+        'user_name': user.name,
+        'avatar': user.profile_picture.url if user.profile_picture else None,
+        'text': comment.text,
+        'created_at': comment.created_at.isoformat(),
+        'timesince': timesince(comment.created_at),
+        'is_author': comment.user_id == content_owner_id,
+        'can_delete': viewer.is_authenticated and (viewer.pk == comment.user_id or viewer.is_admin),
+    }
+    if hasattr(comment, 'preview_replies'):
+        data['reply_count'] = comment.reply_count
+        data['replies'] = [serialize_comment(r, viewer, content_owner_id) for r in comment.preview_replies]
+        data['replies_cursor'] = comment.replies_cursor
+    return data
@@ -0,0 +1,161 @@
+"""
+Content-hash de-duplication of uploaded media.
+
+Uploads arrive with their SHA-256 already computed while the request body
+was received (upload_handlers.py, or uploads.finalize() for chunked
+uploads). When a MediaBlob with that hash exists, the new Content row points
+at its stored file instead of uploading the bytes again; otherwise the file
+is stored as usual and registered as a new blob.
+
+Each blob counts the Content rows referencing it. Replacing or deleting a
+row's file releases its blob, and the stored file is deleted only once the
+last reference is gone. Rows stored before de-duplication have no blob and
+their files are never deleted here.
+
+Local files are named by their hash, so an upload of the same bytes lands
+on the very file a release is deleting. release() therefore unlinks it
+while the deleted blob row is still locked and uncommitted: an upload that
+still finds the blob waits on that lock and then stores the file again, and
+one that finds no blob comes after the file is gone.
+"""
+import hashlib
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.deletion import ProtectedError
+
+from cloudinary import uploader
+from streamify_project.storage import local_media_storage
+
+from .fields import LocalMedia
+from .models import Content, MediaBlob
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK = 1024 * 1024
+
+
+def file_digest(upload):
+    """The hex SHA-256 of ``upload``, from the upload handler when it computed one."""
+    digest = getattr(upload, 'sha256', None)
+    if digest:
+        return digest
+    hasher = hashlib.sha256()
+    for chunk in upload.chunks(HASH_BLOCK):
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _reference(blob_id, reused=False):
+    """Take a reference to a blob; False if it was deleted meanwhile."""
+    updates = {'ref_count': F('ref_count') + 1}
+    if reused:
+        updates['reuse_count'] = F('reuse_count') + 1
+    return bool(MediaBlob.objects.filter(pk=blob_id).update(**updates))
+
+
+def _register(digest, size, stored):
+    """Record a freshly stored file; returns the blob now holding a reference for it."""
+    try:
+        with transaction.atomic():
+            return MediaBlob.objects.create(sha256=digest, size=size, stored=stored, ref_count=1)
+    except IntegrityError:
+        # A concurrent upload of the same bytes registered first: share its
+        # blob and drop the copy this upload made (local copies are the same file)
+        blob = MediaBlob.objects.get(sha256=digest)
+        _reference(blob.pk, reused=True)
+        if blob.stored != stored:
+            delete_stored(stored)
+        return blob
+
+
+def store_upload(field, instance, upload):
+    """MediaField.pre_save for de-duplicated fields: returns the stored value to save."""
+    blob_attname = instance._meta.get_field(field.blob_field).attname
+    previous = getattr(instance, blob_attname)
+    digest = file_digest(upload)
+
+    blob = MediaBlob.objects.filter(sha256=digest).first()
+    if blob is not None and _reference(blob.pk, reused=True):
+        setattr(instance, field.attname, field.to_python(blob.stored))
+    else:
+        stored = field.store(instance, upload)
+        blob = _register(digest, upload.size, stored)
+        if blob.stored != stored:
+            setattr(instance, field.attname, field.to_python(blob.stored))
+
+    setattr(instance, blob_attname, blob.pk)
+    if previous:
+        # Released by content_saved once the row points at the new blob
+        instance._replaced_blobs = getattr(instance, '_replaced_blobs', []) + [previous]
+    return blob.stored
+
+
+def release(blob_id):
+    """Drop one reference; deletes the blob and its file when none are left."""
+    with transaction.atomic():
+        # The row stays locked (SQLite: the database write lock) until commit
+        MediaBlob.objects.filter(pk=blob_id, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+        blob = MediaBlob.objects.select_for_update().filter(pk=blob_id, ref_count=0).first()
+        if blob is None:
+            return False
+        try:
+            # Conditional, so a reference taken since the read above keeps the blob
+            deleted = MediaBlob.objects.filter(pk=blob_id, ref_count=0).delete()[0]
+        except ProtectedError:
+            logger.warning('Media blob %s has no counted references but is still in use', blob_id)
+            return False
+        if not deleted:
+            return False
+        if isinstance(_to_python(blob.stored), LocalMedia):
+            # Still under the lock: nothing can register this hash until commit
+            delete_stored(blob.stored)
+        else:
+            # Uploads never share a Cloudinary public id
+            transaction.on_commit(lambda: delete_stored(blob.stored))
+    return True
+
+
+def _to_python(stored):
+    return Content._meta.get_field('file_path').to_python(stored)
+
+
+def delete_stored(stored):
+    """Delete a stored file given its MediaField value."""
+    value = _to_python(stored)
+    try:
+        if isinstance(value, LocalMedia):
+            local_media_storage.delete(value.name)
+        else:
+            uploader.destroy(value.public_id, resource_type=value.resource_type, type=value.type)
+    except Exception:
+        logger.exception('Deleting stored media %s failed', stored)
+
+
+def content_saved(sender, instance, **kwargs):
+    """post_save receiver releasing the blobs of files the save replaced."""
+    for blob_id in instance.__dict__.pop('_replaced_blobs', []):
+        transaction.on_commit(lambda blob_id=blob_id: release(blob_id))
+
+
+def content_deleted(sender, instance, **kwargs):
+    """post_delete receiver releasing a deleted Content row's blob."""
+    if instance.file_blob_id:
+        blob_id = instance.file_blob_id
+        transaction.on_commit(lambda: release(blob_id))
+
+
+def savings():
+    """Totals for the admin dashboard's de-duplication report."""
+    totals = MediaBlob.objects.aggregate(
+        blobs=Count('pk'),
+        stored_bytes=Sum('size'),
+        # What the current library would take without sharing, minus what it takes
+        saved_bytes=Sum(F('size') * (F('ref_count') - 1), filter=Q(ref_count__gt=0)),
+        # Every upload answered from an existing blob, including since-deleted rows
+        avoided_bytes=Sum(F('size') * F('reuse_count')),
+        reused_uploads=Sum('reuse_count'),
+        shared_blobs=Count('pk', filter=Q(ref_count__gt=1)),
+    )
+    return {key: value or 0 for key, value in totals.items()}
@@ -0,0 +1,139 @@
+"""
+Media fields that store uploads in Cloudinary or in local sharded storage.
+
+MEDIA_STORAGE_BACKEND picks where new uploads go. Stored values say where
+each file lives (local ones are prefixed ``local:``), so rows uploaded under
+either backend keep resolving after the setting changes. A field with a
+``blob_field`` de-duplicates uploads by content hash (see dedup.py).
+"""
+from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import models
+
+from cloudinary import CloudinaryResource, uploader
+from cloudinary.models import CloudinaryField
+from streamify_project.storage import local_media_storage
+
+LOCAL_PREFIX = 'local:'
+# Larger files go to Cloudinary in parts of this size, read one at a time
+CLOUDINARY_CHUNK_SIZE = 20 * 1024 * 1024
+
+
+def local_backend_enabled():
+    return getattr(settings, 'MEDIA_STORAGE_BACKEND', 'cloudinary') == 'local'
+
+
+class LocalMedia:
+    """A locally stored file; mirrors the parts of CloudinaryResource templates use."""
+
+    def __init__(self, name, storage=local_media_storage):
+        self.name = name
+        self.storage = storage
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return f'<LocalMedia {self.name}>'
+
+    def __bool__(self):
+        return bool(self.name)
+
+    def __eq__(self, other):
+        return isinstance(other, LocalMedia) and other.name == self.name
+
+    def __hash__(self):
+        return hash(self.name)
+
+    @property
+    def url(self):
+        return self.storage.url(self.name)
+
+    @property
+    def path(self):
+        return self.storage.path(self.name)
+
+    @property
+    def size(self):
+        return self.storage.size(self.name)
+
+    def open(self, mode='rb'):
+        return self.storage.open(self.name, mode)
+
+    def get_prep_value(self):
+        return LOCAL_PREFIX + self.name
+
+
+class MediaField(CloudinaryField):
+    description = 'A media file stored in Cloudinary or local sharded storage'
+
+    def __init__(self, *args, blob_field=None, **kwargs):
+        self.blob_field = blob_field
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.blob_field:
+            kwargs['blob_field'] = self.blob_field
+        return name, path, args, kwargs
+
+    def _parse(self, value):
+        if isinstance(value, str) and value.startswith(LOCAL_PREFIX):
+            return LocalMedia(value[len(LOCAL_PREFIX):])
+        return self.parse_cloudinary_resource(value)
+
+    def from_db_value(self, value, expression, connection, *args, **kwargs):
+        if value:
+            return self._parse(value)
+        return value
+
+    def to_python(self, value):
+        if isinstance(value, LocalMedia):
+            return value
+        if isinstance(value, str) and value:
+            return self._parse(value)
+        return super().to_python(value)
+
+    def pre_save(self, model_instance, add):
+        value = getattr(model_instance, self.attname)
+        if isinstance(value, UploadedFile):
+            if self.blob_field:
+                from .dedup import store_upload
+
+                return store_upload(self, model_instance, value)
+            return self.store(model_instance, value)
+        return super().pre_save(model_instance, add)
+
+    def store(self, model_instance, value):
+        """Upload ``value`` to the configured backend and return the stored value."""
+        if local_backend_enabled():
+            stored = LocalMedia(local_media_storage.save(value.name, value))
+            setattr(model_instance, self.attname, stored)
+            return stored.get_prep_value()
+        if value.size > CLOUDINARY_CHUNK_SIZE:
+            return self._upload_large(model_instance, value)
+        return super().pre_save(model_instance, False)
+
+    def _upload_large(self, model_instance, value):
+        options = {'type': self.type, 'resource_type': self.resource_type}
+        options.update({key: val(model_instance) if callable(val) else val for key, val in self.options.items()})
+        value.seek(0)
+        result = uploader.upload_large(value, filename=value.name, chunk_size=CLOUDINARY_CHUNK_SIZE, **options)
+        stored = CloudinaryResource(
+            result['public_id'], version=str(result['version']), format=result.get('format'),
+            type=result['type'], resource_type=result['resource_type'], metadata=result,
+        )
+        setattr(model_instance, self.attname, stored)
+        return self.get_prep_value(stored)
+
+    def get_prep_value(self, value):
+        if isinstance(value, LocalMedia):
+            return value.get_prep_value()
+        return super().get_prep_value(value)
+
+    def formfield(self, **kwargs):
+        if local_backend_enabled():
+            # Plain upload field: the file is stored by pre_save, not by the form
+            return models.Field.formfield(self, **{'form_class': forms.FileField, **kwargs})
+        return super().formfield(**kwargs)
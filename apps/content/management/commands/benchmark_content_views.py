@@ -0,0 +1,77 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from apps.content.models import Content, ContentView
+from apps.content.view_buffer import flush_views
+from apps.content.views import content_detail_view
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare content_detail_view throughput with synchronous view writes '
+        'against the write-behind buffer. Runs inside a rolled-back transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--items', type=int, default=20, help='Distinct content items to spread hits over')
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        with transaction.atomic():
+            items = self._fixtures(options['items'])
+            results = [self._run('sync', items, total), self._run('memory', items, total)]
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'{"mode":<8} {"requests":>9} {"seconds":>9} {"req/s":>9} {"queries/req":>12}')
+        for mode, seconds, queries in results:
+            self.stdout.write(
+                f'{mode:<8} {total:>9} {seconds:>9.3f} {total / seconds:>9.1f} {queries / total:>12.2f}'
+            )
+        speedup = results[0][1] / results[1][1]
+        self.stdout.write(self.style.SUCCESS(f'Buffered ingestion: {speedup:.2f}x detail-page throughput'))
+
+    def _fixtures(self, count):
+        creator = get_user_model().objects.create_user(
+            email='bench-views@example.invalid', name='Benchmark', role='creator'
+        )
+        return [
+            Content.objects.create(
+                title=f'Benchmark {i}', content_type='video', file_path='bench/video.mp4',
+                uploaded_by=creator, is_published=True,
+            )
+            for i in range(count)
+        ]
+
+    def _run(self, mode, items, total):
+        factory = RequestFactory()
+        # Large size/interval so only the explicit flush below writes buffered rows
+        with override_settings(CONTENT_VIEW_BUFFER_BACKEND=mode,
+                               CONTENT_VIEW_BUFFER_SIZE=total + 1,
+                               CONTENT_VIEW_FLUSH_INTERVAL=3600):
+            before = ContentView.objects.count()
+            queries = []
+
+            def count_queries(execute, sql, params, many, context):
+                queries.append(sql)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count_queries):
+                started = time.perf_counter()
+                for i in range(total):
+                    item = items[i % len(items)]
+                    request = factory.get(f'/content/{item.pk}/', REMOTE_ADDR='127.0.0.1')
+                    request.user = AnonymousUser()
+                    content_detail_view(request, pk=item.pk)
+                flush_views()
+                elapsed = time.perf_counter() - started
+            written = ContentView.objects.count() - before
+        if written != total:
+            self.stderr.write(f'{mode}: expected {total} view rows, found {written}')
+        return mode, elapsed, len(queries)
@@ -0,0 +1,115 @@
+import os
+import random
+import socket
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from streamify_project.media_server import serve_media
+
+LEGACY_BLOCK_SIZE = 8192
+
+
+def _legacy_serve(path, start, end):
+    """The previous ranged_media_serve: Python open() plus 8 KiB reads of one range."""
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = fh.read(min(LEGACY_BLOCK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _send_response(sock, response):
+    """Deliver a response body the way gunicorn does: sendfile when a file descriptor is available."""
+    filelike = getattr(response, 'file_to_stream', None)
+    if filelike is not None and hasattr(filelike, 'fileno'):
+        fd = filelike.fileno()
+        offset = os.lseek(fd, 0, os.SEEK_CUR)
+        nbytes = int(response['Content-Length'])
+        sent = 0
+        while sent < nbytes:
+            sent += os.sendfile(sock.fileno(), fd, offset + sent, nbytes - sent)
+    else:
+        for chunk in response:
+            sock.sendall(chunk)
+    response.close()
+
+
+class Command(BaseCommand):
+    help = 'Compare seek throughput of the media server against the previous ranged_media_serve.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=512, help='Size of the synthetic MP4')
+        parser.add_argument('--seeks', type=int, default=200)
+        parser.add_argument('--range-kb', type=int, default=4096, help='Bytes fetched per seek')
+
+    def handle(self, *args, **options):
+        size = options['size_mb'] * 1024 * 1024
+        length = options['range_kb'] * 1024
+        rng = random.Random(3)
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, 'movie.mp4')
+            with open(path, 'wb') as fh:
+                block = os.urandom(1024 * 1024)
+                for _ in range(options['size_mb']):
+                    fh.write(block)
+            offsets = [rng.randrange(0, size - length) for _ in range(options['seeks'])]
+
+            sender, receiver = socket.socketpair()
+            done = threading.Event()
+
+            def drain():
+                buf = bytearray(1024 * 1024)
+                while receiver.recv_into(buf):
+                    pass
+                done.set()
+
+            threading.Thread(target=drain, daemon=True).start()
+            factory = RequestFactory()
+
+            def legacy(start):
+                for chunk in _legacy_serve(path, start, start + length - 1):
+                    sender.sendall(chunk)
+
+            def current(start):
+                request = factory.get('/media/movie.mp4', HTTP_RANGE=f'bytes={start}-{start + length - 1}')
+                _send_response(sender, serve_media(request, 'movie.mp4', document_root=root))
+
+            results = [self._run('ranged_media_serve', legacy, offsets, length),
+                       self._run('serve_media', current, offsets, length)]
+
+            request = factory.get('/media/movie.mp4')
+            etag = serve_media(request, 'movie.mp4', document_root=root)['ETag']
+            started = time.perf_counter()
+            for _ in range(1000):
+                response = serve_media(factory.get('/media/movie.mp4', HTTP_IF_NONE_MATCH=etag),
+                                       'movie.mp4', document_root=root)
+            revalidate_us = (time.perf_counter() - started) * 1000
+            sender.close()
+            done.wait(5)
+            receiver.close()
+
+        self.stdout.write(f'{"implementation":<20} {"MB/s":>9} {"p50 ms":>8} {"p99 ms":>8}')
+        for name, mbps, p50, p99 in results:
+            self.stdout.write(f'{name:<20} {mbps:>9.1f} {p50:>8.2f} {p99:>8.2f}')
+        self.stdout.write(f'304 revalidation: {revalidate_us:.1f}us per request (status {response.status_code})')
+        self.stdout.write(self.style.SUCCESS(f'serve_media: {results[1][1] / results[0][1]:.2f}x seek throughput'))
+
+    def _run(self, name, fn, offsets, length):
+        timings = []
+        for start in offsets:
+            began = time.perf_counter()
+            fn(start)
+            timings.append(time.perf_counter() - began)
+        total = sum(timings)
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        return name, len(offsets) * length / total / 1e6, statistics.median(timings) * 1000, p99 * 1000
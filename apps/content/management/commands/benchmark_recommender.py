@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.content import recommendations as recs
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark recommender training and batched scoring on a synthetic '
+        'engagement matrix (no database access).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--items', type=int, default=50_000)
+        parser.add_argument('--per-user', type=int, default=30, help='Average interactions per user')
+        parser.add_argument('--factors', type=int, default=recs.FACTORS)
+        parser.add_argument('--sample', type=int, default=5_000, help='Users scored to measure batch throughput')
+
+    def handle(self, *args, **options):
+        if not recs.SCIPY_AVAILABLE:
+            raise CommandError('numpy and scipy are required for this benchmark.')
+        np = recs.np
+        n_users, n_items = options['users'], options['items']
+        rng = np.random.default_rng(42)
+
+        # Zipf-like popularity so a few items dominate, as in real catalogues
+        popularity = 1.0 / np.arange(1, n_items + 1) ** 0.8
+        popularity /= popularity.sum()
+        nnz = n_users * options['per_user']
+        user_idx = rng.integers(0, n_users, nnz)
+        item_idx = rng.choice(n_items, nnz, p=popularity)
+        weights = rng.choice([recs.VIEW_WEIGHT, recs.LIKE_WEIGHT, recs.PLAYLIST_WEIGHT], nnz, p=[0.8, 0.15, 0.05])
+        matrix = recs.engagement_matrix(user_idx, item_idx, weights.astype(np.float32), (n_users, n_items))
+        self.stdout.write(f'{n_users} users x {n_items} items, {matrix.nnz} non-zeros')
+
+        started = time.perf_counter()
+        u, s, vt = recs.randomized_svd(matrix, options['factors'])
+        train_seconds = time.perf_counter() - started
+        self.stdout.write(f'train     {train_seconds:>9.2f}s  (rank {s.size})')
+
+        item_factors = np.ascontiguousarray(vt.T)
+        user_vectors = u * s
+        candidates = np.ones(n_items, dtype=bool)
+        sample = min(options['sample'], n_users)
+        started = time.perf_counter()
+        for start in range(0, sample, recs.SCORE_BATCH):
+            stop = min(start + recs.SCORE_BATCH, sample)
+            recs.top_n(user_vectors[start:stop], item_factors, matrix[start:stop], candidates, recs.TOP_N)
+        batch_seconds = time.perf_counter() - started
+        rate = sample / batch_seconds
+        self.stdout.write(
+            f'score     {rate:>9.0f} users/s  (all {n_users} users in ~{n_users / rate:.1f}s)'
+        )
+
+        timings = []
+        for row in rng.integers(0, n_users, 200):
+            started = time.perf_counter()
+            history = matrix[row:row + 1]
+            recs.top_n(history @ item_factors, item_factors, history, candidates, recs.TOP_N)
+            timings.append(time.perf_counter() - started)
+        timings = np.array(timings) * 1000
+        self.stdout.write(
+            f'fold-in   p50 {np.percentile(timings, 50):.2f}ms  p99 {np.percentile(timings, 99):.2f}ms per user'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Serving reads precomputed ids from the cache/UserRecommendation row and does no scoring.'
+        ))
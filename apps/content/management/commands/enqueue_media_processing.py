@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from apps.content.media_jobs import enqueue
+from apps.content.models import Content, MediaJob
+
+
+class Command(BaseCommand):
+    help = 'Queue media processing for content that has not been processed yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help='Also re-run jobs that ran out of attempts')
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            retried = MediaJob.objects.filter(status='failed').update(status='queued', attempts=0)
+            self.stdout.write(f'Re-queued {retried} failed job(s).')
+        queued = 0
+        # Materialized first: enqueueing writes while the worker pool may already be running
+        for content in list(Content.objects.exclude(processing_status='ready').only('pk', 'file_path')):
+            queued += enqueue(content) is not None
+        self.stdout.write(self.style.SUCCESS(f'Queued {queued} content item(s).'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.content.view_buffer import flush_views, get_buffer
+
+
+class Command(BaseCommand):
+    help = 'Write buffered content views to the database (run on deploy/shutdown or from cron).'
+
+    def handle(self, *args, **options):
+        pending = get_buffer().pending()
+        written = flush_views()
+        self.stdout.write(self.style.SUCCESS(
+            f'Flushed {written} view(s) ({pending} were pending in this buffer).'
+        ))
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.content.media_probe import ProbeError, probe
+from apps.content.media_processing import metadata_fields, source_location
+from apps.content.models import Content
+
+UPDATE_FIELDS = ['duration', 'codec', 'bitrate', 'width', 'height']
+
+
+class Command(BaseCommand):
+    help = 'Fill in duration, codec, bitrate and resolution from media headers (reads a few KB per file).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-probe rows that already have a duration')
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        queryset = Content.objects.all() if options['all'] else Content.objects.filter(duration=0)
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+        probed = failed = bytes_read = 0
+        started = time.perf_counter()
+        for start in range(0, len(ids), options['batch_size']):
+            batch = list(Content.objects.filter(pk__in=ids[start:start + options['batch_size']]).only('pk', *UPDATE_FIELDS, 'file_path'))
+            changed = []
+            for content in batch:
+                try:
+                    info = probe(source_location(content.file_path))
+                except (ProbeError, OSError) as exc:
+                    failed += 1
+                    self.stderr.write(f'#{content.pk}: {exc}')
+                    continue
+                bytes_read += info['bytes_read']
+                if 'duration' in info:
+                    content.duration = round(info['duration'])
+                for field, value in metadata_fields(info).items():
+                    setattr(content, field, value)
+                changed.append(content)
+            Content.objects.bulk_update(changed, UPDATE_FIELDS)
+            probed += len(changed)
+        elapsed = time.perf_counter() - started
+        average = bytes_read / probed if probed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Probed {probed} file(s), {failed} failed, in {elapsed:.1f}s '
+            f'({bytes_read / 1024:.0f} KiB read, {average / 1024:.1f} KiB per file).'
+        ))
@@ -0,0 +1,38 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.content.media_jobs import DEFAULT_WORKERS, run_pending
+
+
+class Command(BaseCommand):
+    help = 'Run media processing jobs (probe, metadata, thumbnails) with a pool of worker threads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'MEDIA_PROCESSING_WORKERS', DEFAULT_WORKERS))
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument('--poll', type=float, default=5, help='Seconds to wait when the queue is empty')
+
+    def _worker(self, once, poll):
+        processed = 0
+        try:
+            while True:
+                done = run_pending()
+                processed += done
+                if once and not done:
+                    return processed
+                if not done:
+                    time.sleep(poll)
+        finally:
+            close_old_connections()
+
+    def handle(self, *args, **options):
+        workers = max(options['workers'], 1)
+        self.stdout.write(f'Processing media jobs with {workers} worker(s)...')
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='media-worker') as pool:
+            futures = [pool.submit(self._worker, options['once'], options['poll']) for _ in range(workers)]
+            processed = sum(future.result() for future in futures)
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} job(s).'))
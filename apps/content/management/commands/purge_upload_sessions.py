@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.content.uploads import purge_expired_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete expired resumable upload sessions and their stored chunks.'
+
+    def handle(self, *args, **options):
+        removed = purge_expired_sessions()
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} upload session(s).'))
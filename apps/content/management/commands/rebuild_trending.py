@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.content.trending import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute trending scores from stored views, likes and comments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=14, help='History window to replay')
+
+    def handle(self, *args, **options):
+        scored = rebuild(window_days=options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Scored {scored} content item(s).'))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from apps.content.models import Comment, Content, Like
+
+
+def _count_of(model):
+    return Coalesce(Subquery(
+        model.objects.filter(content=OuterRef('pk'))
+        .order_by().values('content').annotate(n=Count('pk')).values('n')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild Content.like_count and Content.comment_count from the likes and comments tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Content ids updated per statement')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        bounds = Content.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            self.stdout.write('No content to reconcile.')
+            return
+
+        fixed = 0
+        for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+            with transaction.atomic():
+                batch = Content.objects.filter(pk__gte=start, pk__lt=start + batch_size)
+                # Only touch rows that drifted so unchanged rows are not rewritten
+                fixed += (
+                    batch.alias(likes_actual=_count_of(Like), comments_actual=_count_of(Comment))
+                    .filter(~Q(like_count=F('likes_actual')) | ~Q(comment_count=F('comments_actual')))
+                    .update(like_count=_count_of(Like), comment_count=_count_of(Comment))
+                )
+        self.stdout.write(self.style.SUCCESS(f'Reconciled counters on {fixed} content item(s).'))
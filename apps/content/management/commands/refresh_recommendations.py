@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.content.recommendations import FACTORS, TOP_N, refresh, train
+
+
+class Command(BaseCommand):
+    help = 'Train the "For you" recommender, or re-score only users with new activity.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help='Fold in users active since the last run instead of retraining')
+        parser.add_argument('--factors', type=int, default=FACTORS)
+        parser.add_argument('--top-n', type=int, default=TOP_N)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            if options['incremental']:
+                stats = refresh(n=options['top_n'])
+            else:
+                stats = train(factors=options['factors'], n=options['top_n'])
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {stats['users']} user(s) over {stats['items']} item(s) in {elapsed:.2f}s."
+        ))
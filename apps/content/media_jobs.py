@@ -0,0 +1,182 @@
+"""
+Background queue for media processing, backed by the media_jobs table.
+
+enqueue() records a MediaJob once the saving transaction commits (one per
+stored file, so repeated saves do not duplicate work). A file another item
+already shares (see dedup.py) is not processed again: the results of the
+processed copy are reused. Jobs are claimed with
+a conditional UPDATE, which works on every database without a broker;
+failures are retried with exponential backoff and jobs left running by a
+dead worker are picked up again after MEDIA_PROCESSING_JOB_TIMEOUT.
+
+With MEDIA_PROCESSING_BACKEND = 'local' each web process runs a small
+thread pool that drains the queue after every enqueue; 'worker' leaves the
+queue to `manage.py process_media_jobs`, and 'sync' processes inline.
+"""
+import logging
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .media_processing import copy_results, process_content, stored_value
+from .models import Content, MediaJob
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = 'local'
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_JOB_TIMEOUT = 15 * 60
+RETRY_BASE_DELAY = 30
+CLAIM_BATCH = 10
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _processed_twin(content, source):
+    """Another item with the same stored file that has already been processed."""
+    if not content.file_blob_id:
+        return None
+    return (
+        Content.objects.filter(file_blob_id=content.file_blob_id, file_path=source, processing_status='ready')
+        .exclude(pk=content.pk).order_by('pk').first()
+    )
+
+
+def enqueue(content):
+    """Queue processing of ``content``'s current file. Returns the job, or None if there is nothing to do."""
+    source = stored_value(content.file_path)
+    if not source:
+        return None
+    twin = _processed_twin(content, source)
+    try:
+        with transaction.atomic():
+            job = MediaJob.objects.create(content=content, source=source, status='done' if twin else 'queued')
+    except IntegrityError:  # this file is already queued or processed
+        return MediaJob.objects.get(content=content, source=source)
+    if twin:
+        Content.objects.filter(pk=content.pk).update(**copy_results(twin, content))
+        return job
+    Content.objects.filter(pk=content.pk).update(processing_status='pending')
+    transaction.on_commit(kick)
+    return job
+
+
+def _requeue_stale(now):
+    stale = MediaJob.objects.filter(
+        status='running', locked_at__lt=now - timedelta(seconds=_setting('MEDIA_PROCESSING_JOB_TIMEOUT', DEFAULT_JOB_TIMEOUT)),
+    )
+    max_attempts = _setting('MEDIA_PROCESSING_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    stale.filter(attempts__lt=max_attempts).update(status='queued', run_after=now, locked_at=None)
+    stale.filter(attempts__gte=max_attempts).update(status='failed', last_error='Worker timed out.')
+
+
+def claim_job():
+    """Atomically take the next due job, or return None when the queue is idle."""
+    now = timezone.now()
+    _requeue_stale(now)
+    candidates = list(
+        MediaJob.objects.filter(status='queued', run_after__lte=now)
+        .order_by('run_after', 'id').values_list('pk', flat=True)[:CLAIM_BATCH]
+    )
+    for pk in candidates:
+        # Only one worker can flip a given row from queued to running
+        claimed = MediaJob.objects.filter(pk=pk, status='queued').update(
+            status='running', locked_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return MediaJob.objects.select_related('content').get(pk=pk)
+    return None
+
+
+def run_job(job):
+    """Process one claimed job and record the outcome. Returns True on success."""
+    Content.objects.filter(pk=job.content_id).update(processing_status='processing')
+    try:
+        process_content(job.content, job.source)
+    except Exception:
+        logger.exception('Processing media job %s failed', job.pk)
+        error = traceback.format_exc(limit=5)
+        if job.attempts >= _setting('MEDIA_PROCESSING_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS):
+            MediaJob.objects.filter(pk=job.pk).update(status='failed', last_error=error, locked_at=None)
+            Content.objects.filter(pk=job.content_id).update(processing_status='failed')
+        else:
+            delay = RETRY_BASE_DELAY * 2 ** (job.attempts - 1)
+            MediaJob.objects.filter(pk=job.pk).update(
+                status='queued', last_error=error, locked_at=None,
+                run_after=timezone.now() + timedelta(seconds=delay),
+            )
+            Content.objects.filter(pk=job.content_id).update(processing_status='pending')
+            if _backend() == 'local':
+                _schedule_retry(delay)
+        return False
+    MediaJob.objects.filter(pk=job.pk).update(status='done', last_error='', locked_at=None)
+    return True
+
+
+def run_pending(limit=None):
+    """Run due jobs in this thread until the queue is idle. Returns jobs processed."""
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_job()
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
+
+
+# ── In-process worker pool ('local' backend) ──
+
+_state_lock = threading.Lock()
+_state = {'pid': None, 'pool': None}
+
+
+def _backend():
+    return _setting('MEDIA_PROCESSING_BACKEND', DEFAULT_BACKEND)
+
+
+def _get_pool():
+    """Return this process's pool, rebuilding it after a fork."""
+    if _state['pid'] != os.getpid():
+        with _state_lock:
+            if _state['pid'] != os.getpid():
+                _state['pool'] = ThreadPoolExecutor(
+                    max_workers=_setting('MEDIA_PROCESSING_WORKERS', DEFAULT_WORKERS),
+                    thread_name_prefix='media-worker',
+                )
+                _state['pid'] = os.getpid()
+    return _state['pool']
+
+
+def _drain():
+    try:
+        run_pending()
+    except Exception:
+        logger.exception('Draining the media job queue failed')
+    finally:
+        close_old_connections()
+
+
+def _schedule_retry(delay):
+    timer = threading.Timer(delay, kick)
+    timer.daemon = True
+    timer.start()
+
+
+def kick():
+    """Start processing queued jobs according to MEDIA_PROCESSING_BACKEND."""
+    backend = _backend()
+    if backend == 'sync':
+        run_pending()
+    elif backend == 'local':
+        _get_pool().submit(_drain)
@@ -0,0 +1,379 @@
+"""
+Header-only media probing.
+
+probe() reads just the container headers of a media file through positioned
+range reads (a local file, or HTTP Range requests for a URL) and returns its
+duration, codec, bitrate and, for video, resolution. Payloads such as an MP4
+``mdat`` box or the frames of an MP3 are skipped over, so a probe touches a
+few kilobytes however long the file is. Understood formats: MP4/MOV, MP3
+(Xing/Info, VBRI or constant bitrate), Ogg Vorbis/Opus, WAV and FLAC.
+"""
+import os
+import re
+import struct
+import urllib.request
+
+BLOCK_SIZE = 16 * 1024
+SYNC_SEARCH = 64 * 1024
+OGG_TAIL = 64 * 1024
+HTTP_TIMEOUT = 10
+
+
+class ProbeError(Exception):
+    """The file is not in a format this module understands, or is corrupt."""
+
+
+class RangeSource:
+    """Random access to a local file or URL, fetched in cached blocks."""
+
+    def __init__(self, location, block_size=BLOCK_SIZE):
+        self.location = location
+        self.block_size = block_size
+        self.bytes_read = 0
+        self._blocks = {}
+        self._fh = None
+        self.size = None
+        if not location.startswith(('http://', 'https://')):
+            self._fh = open(location, 'rb')
+            self.size = os.fstat(self._fh.fileno()).st_size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._fh:
+            self._fh.close()
+
+    def _fetch(self, start, length):
+        if self._fh:
+            data = os.pread(self._fh.fileno(), length, start)
+        else:
+            request = urllib.request.Request(self.location, headers={'Range': f'bytes={start}-{start + length - 1}'})
+            with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT) as response:
+                if response.status != 206:
+                    raise ProbeError('The server does not support range requests.')
+                total = response.headers.get('Content-Range', '').rpartition('/')[2]
+                if total.isdigit():
+                    self.size = int(total)
+                data = response.read(length)
+        self.bytes_read += len(data)
+        return data
+
+    def read(self, offset, length):
+        """Return up to ``length`` bytes at ``offset`` (fewer at end of file)."""
+        if offset < 0 or length <= 0 or (self.size is not None and offset >= self.size):
+            return b''
+        if self.size is not None:
+            length = min(length, self.size - offset)
+        first, last = offset // self.block_size, (offset + length - 1) // self.block_size
+        missing = [index for index in range(first, last + 1) if index not in self._blocks]
+        if missing:
+            # One request covering every block we do not have yet
+            data = self._fetch(missing[0] * self.block_size, (missing[-1] - missing[0] + 1) * self.block_size)
+            for index in missing:
+                start = (index - missing[0]) * self.block_size
+                self._blocks[index] = data[start:start + self.block_size]
+        data = b''.join(self._blocks[index] for index in range(first, last + 1))
+        start = offset - first * self.block_size
+        return data[start:start + length]
+
+
+# ── MP4 / MOV ─────────────────────────────────
+
+def _boxes(src, start, end):
+    """Yield (type, payload_start, box_end) for the boxes between start and end."""
+    offset = start
+    while offset + 8 <= end:
+        header = src.read(offset, 16)
+        if len(header) < 8:
+            return
+        size, kind = struct.unpack('>I4s', header[:8])
+        header_size = 8
+        if size == 1:
+            if len(header) < 16:
+                return
+            size, header_size = struct.unpack('>Q', header[8:16])[0], 16
+        elif size == 0:
+            size = end - offset  # extends to the end of the enclosing box
+        if size < header_size:
+            raise ProbeError(f'Corrupt {kind!r} box at offset {offset}.')
+        yield kind, offset + header_size, offset + size
+        offset += size
+
+
+def _find_box(src, start, end, *path):
+    for kind in path:
+        for child, child_start, child_end in _boxes(src, start, end):
+            if child == kind:
+                start, end = child_start, child_end
+                break
+        else:
+            return None
+    return start, end
+
+
+def _fourcc(data):
+    return data.decode('latin-1').strip(' \x00')
+
+
+def _mp4_track(src, start, end):
+    track = {}
+    tkhd = _find_box(src, start, end, b'tkhd')
+    if tkhd:
+        data = src.read(tkhd[0], 96)
+        position = 88 if data[:1] == b'\x01' else 76
+        if len(data) >= position + 8:
+            width, height = struct.unpack('>II', data[position:position + 8])
+            track['width'], track['height'] = width >> 16, height >> 16
+    hdlr = _find_box(src, start, end, b'mdia', b'hdlr')
+    if hdlr:
+        track['handler'] = src.read(hdlr[0] + 8, 4)
+    stsd = _find_box(src, start, end, b'mdia', b'minf', b'stbl', b'stsd')
+    if stsd:
+        entry = src.read(stsd[0] + 8, 8)
+        if len(entry) == 8:
+            track['codec'] = _fourcc(entry[4:8])
+    return track
+
+
+def _probe_mp4(src):
+    moov = _find_box(src, 0, src.size, b'moov')
+    if moov is None:
+        raise ProbeError('No moov box; the file may be truncated.')
+    info = {'format': 'mp4'}
+    tracks = []
+    for kind, start, end in _boxes(src, *moov):
+        if kind == b'mvhd':
+            data = src.read(start, 32)
+            if data[:1] == b'\x01':
+                timescale, duration = struct.unpack('>IQ', data[20:32])
+            else:
+                timescale, duration = struct.unpack('>II', data[12:20])
+            if timescale:
+                info['duration'] = duration / timescale
+        elif kind == b'trak':
+            tracks.append(_mp4_track(src, start, end))
+    video = next((t for t in tracks if t.get('handler') == b'vide'), None)
+    audio = next((t for t in tracks if t.get('handler') == b'soun'), None)
+    if video:
+        info['codec'] = video.get('codec')
+        if video.get('width'):
+            info['width'], info['height'] = video['width'], video['height']
+    elif audio:
+        info['codec'] = audio.get('codec')
+    return info
+
+
+# ── MP3 ───────────────────────────────────────
+
+MP3_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+MP3_SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 25: (11025, 12000, 8000)}
+MP3_VERSIONS = {3: 1, 2: 2, 0: 25}
+
+
+def _id3v2_size(header):
+    """Length of an ID3v2 tag starting with ``header`` (0 if there is none)."""
+    if len(header) < 10 or header[:3] != b'ID3':
+        return 0
+    size = (header[6] & 0x7F) << 21 | (header[7] & 0x7F) << 14 | (header[8] & 0x7F) << 7 | (header[9] & 0x7F)
+    return 10 + size + (10 if header[5] & 0x10 else 0)
+
+
+def _mp3_frame(header):
+    """Decode a 4-byte MPEG audio frame header, or return None."""
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = MP3_VERSIONS.get((header[1] >> 3) & 3)
+    layer = 4 - ((header[1] >> 1) & 3)
+    bitrate_index, rate_index = header[2] >> 4, (header[2] >> 2) & 3
+    if version is None or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    bitrate = MP3_BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 1
+    if layer == 1:
+        samples, length = 384, (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 576 if layer == 3 and version != 1 else 1152
+        length = samples // 8 * bitrate // sample_rate + padding
+    return {
+        'version': version, 'layer': layer, 'bitrate': bitrate, 'sample_rate': sample_rate,
+        'samples': samples, 'length': length, 'mono': header[3] >> 6 == 3,
+    }
+
+
+def _probe_mp3(src, audio_start):
+    first = frame = None
+    # Scan block by block, so a file that starts cleanly costs a single read
+    for window_start in range(audio_start, audio_start + SYNC_SEARCH, BLOCK_SIZE):
+        window = src.read(window_start, BLOCK_SIZE + 3)
+        for match in re.finditer(b'\xff', window[:BLOCK_SIZE]):
+            candidate = _mp3_frame(window[match.start():match.start() + 4])
+            # Require the next frame header to line up too, to skip false syncs in junk data
+            if candidate and _mp3_frame(src.read(window_start + match.start() + candidate['length'], 4)):
+                first, frame = window_start + match.start(), candidate
+                break
+        if frame or len(window) <= BLOCK_SIZE:
+            break
+    if frame is None:
+        raise ProbeError('No MPEG audio frames found.')
+
+    info = {
+        'format': 'mp3', 'codec': f"mp{frame['layer']}",
+        'sample_rate': frame['sample_rate'], 'channels': 1 if frame['mono'] else 2,
+    }
+    data = src.read(first, 200)
+    side_info = (17 if frame['mono'] else 32) if frame['version'] == 1 else (9 if frame['mono'] else 17)
+    frames = audio_bytes = None
+    xing = data[4 + side_info:4 + side_info + 16]
+    if xing[:4] in (b'Xing', b'Info'):
+        flags = struct.unpack('>I', xing[4:8])[0]
+        fields = iter(struct.unpack('>II', xing[8:16]))
+        frames = next(fields) if flags & 1 else None
+        audio_bytes = next(fields) if flags & 2 else None
+    elif data[36:40] == b'VBRI':
+        audio_bytes, frames = struct.unpack('>II', data[46:54])
+
+    if frames:
+        info['duration'] = frames * frame['samples'] / frame['sample_rate']
+        audio_bytes = audio_bytes or src.size - first
+        info['bitrate'] = int(audio_bytes * 8 / info['duration']) if info['duration'] else frame['bitrate']
+    else:
+        # Constant bitrate: the size of the audio data gives the duration
+        audio_bytes = src.size - first - (128 if src.read(src.size - 128, 3) == b'TAG' else 0)
+        info['bitrate'] = frame['bitrate']
+        info['duration'] = audio_bytes * 8 / frame['bitrate']
+    return info
+
+
+# ── Ogg (Vorbis, Opus) ────────────────────────
+
+def _probe_ogg(src):
+    page = src.read(0, 282)
+    if len(page) < 28:
+        raise ProbeError('Truncated Ogg page.')
+    serial = page[14:18]
+    packet = page[27 + page[26]:]
+    if packet.startswith(b'OpusHead'):
+        pre_skip = struct.unpack('<H', packet[10:12])[0]
+        info = {'format': 'ogg', 'codec': 'opus', 'channels': packet[9], 'sample_rate': 48000}
+        clock, offset = 48000, pre_skip
+    elif packet.startswith(b'\x01vorbis'):
+        channels, sample_rate, _maximum, nominal = struct.unpack('<BIii', packet[11:24])
+        info = {'format': 'ogg', 'codec': 'vorbis', 'channels': channels, 'sample_rate': sample_rate}
+        if nominal > 0:
+            info['bitrate'] = nominal
+        clock, offset = sample_rate, 0
+    else:
+        raise ProbeError('Unsupported Ogg codec.')
+
+    # The granule position of the stream's last page is its length in samples
+    tail_start = max(src.size - OGG_TAIL, 0)
+    tail = src.read(tail_start, OGG_TAIL)
+    position = tail.rfind(b'OggS')
+    while position >= 0:
+        granule = struct.unpack('<q', tail[position + 6:position + 14])[0] if position + 14 <= len(tail) else -1
+        if tail[position + 14:position + 18] == serial and granule >= 0:
+            info['duration'] = max(granule - offset, 0) / clock
+            break
+        position = tail.rfind(b'OggS', 0, position)
+    return info
+
+
+# ── WAV ───────────────────────────────────────
+
+WAV_CODECS = {1: 'pcm', 3: 'pcm_float', 6: 'alaw', 7: 'mulaw', 0x11: 'adpcm_ima', 0x55: 'mp3'}
+
+
+def _probe_wav(src):
+    info = {'format': 'wav'}
+    byte_rate = None
+    offset = 12
+    while offset + 8 <= src.size:
+        kind, size = struct.unpack('<4sI', src.read(offset, 8))
+        if kind == b'fmt ':
+            data = src.read(offset + 8, 26)
+            tag, channels, sample_rate, byte_rate, _align, bits = struct.unpack('<HHIIHH', data[:16])
+            if tag == 0xFFFE and len(data) >= 26:  # WAVE_FORMAT_EXTENSIBLE
+                tag = struct.unpack('<H', data[24:26])[0]
+            info.update(codec=WAV_CODECS.get(tag, f'wav_{tag:#x}'), channels=channels, sample_rate=sample_rate)
+            if tag in (1, 3):
+                info['codec'] = f"{info['codec']}_{bits}"
+            info['bitrate'] = byte_rate * 8
+        elif kind == b'data':
+            if size in (0, 0xFFFFFFFF):  # written while streaming
+                size = src.size - offset - 8
+            if byte_rate:
+                info['duration'] = size / byte_rate
+            break
+        offset += 8 + size + (size & 1)
+    if 'codec' not in info:
+        raise ProbeError('WAV file without a fmt chunk.')
+    return info
+
+
+# ── FLAC ──────────────────────────────────────
+
+def _probe_flac(src, start):
+    block = src.read(start + 4, 38)
+    if len(block) < 38 or block[0] & 0x7F != 0:
+        raise ProbeError('FLAC stream without STREAMINFO.')
+    fields = int.from_bytes(block[14:22], 'big')
+    sample_rate = fields >> 44
+    info = {
+        'format': 'flac', 'codec': 'flac', 'sample_rate': sample_rate,
+        'channels': ((fields >> 41) & 7) + 1,
+    }
+    total_samples = fields & ((1 << 36) - 1)
+    if sample_rate and total_samples:
+        info['duration'] = total_samples / sample_rate
+    return info
+
+
+def _probe(src):
+    head = src.read(0, 64)
+    if src.size is None:
+        raise ProbeError('Could not determine the file size.')
+    if head[4:8] in (b'ftyp', b'moov', b'mdat', b'wide', b'free', b'skip'):
+        return _probe_mp4(src)
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return _probe_wav(src)
+    if head[:4] == b'OggS':
+        return _probe_ogg(src)
+    if head[:4] == b'fLaC':
+        return _probe_flac(src, 0)
+    tag_size = _id3v2_size(head)
+    if tag_size and src.read(tag_size, 4) == b'fLaC':
+        return _probe_flac(src, tag_size)
+    if tag_size or _mp3_frame(head[:4]):
+        return _probe_mp3(src, tag_size)
+    raise ProbeError('Unrecognized media format.')
+
+
+def probe(location):
+    """
+    Probe the file at a local path or URL.
+
+    Returns a dict with ``format`` and ``codec`` plus whichever of duration
+    (seconds), bitrate (bits/s), width, height, sample_rate and channels the
+    headers give, and ``bytes_read``. Raises ProbeError for unknown formats.
+    """
+    with RangeSource(location) as src:
+        try:
+            info = _probe(src)
+        except (struct.error, IndexError, StopIteration) as exc:
+            raise ProbeError(f'Corrupt media headers: {exc}') from exc
+        if info.get('duration') and 'bitrate' not in info:
+            info['bitrate'] = int(src.size * 8 / info['duration'])
+        info['bytes_read'] = src.bytes_read
+    return {key: value for key, value in info.items() if value is not None}
@@ -0,0 +1,143 @@
+"""
+Processing steps run for each uploaded media file.
+
+process_content() probes the file for duration, codec, bitrate and video
+dimensions and, when the item has no thumbnail, grabs one (a video frame or
+the embedded cover art of audio). Probing reads only the container headers
+(media_probe.py), falling back to ffprobe for other formats; thumbnails need
+ffmpeg and are skipped without it. Every step only writes derived fields,
+so running it twice for the same file is harmless.
+"""
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.core.files.uploadedfile import UploadedFile
+
+from .fields import LocalMedia
+from .media_probe import ProbeError, probe as probe_headers
+from .models import Content
+
+PROBE_TIMEOUT = 60
+THUMBNAIL_TIMEOUT = 120
+THUMBNAIL_WIDTH = 640
+
+
+def stored_value(field_value):
+    """The string a MediaField stores for ``field_value`` (used as the job source key)."""
+    if not field_value:
+        return ''
+    return Content._meta.get_field('file_path').get_prep_value(field_value) or ''
+
+
+def source_location(field_value):
+    """A local path or URL ffmpeg can read the stored file from."""
+    if isinstance(field_value, LocalMedia):
+        return field_value.path
+    return field_value.build_url(secure=True) if hasattr(field_value, 'build_url') else field_value.url
+
+
+def probe(location):
+    """Return a dict with any of duration (seconds), codec, bitrate (bits/s), width and height."""
+    try:
+        return probe_headers(location)
+    except ProbeError:
+        return ffprobe(location)
+
+
+def ffprobe(location):
+    if not shutil.which('ffprobe'):
+        return {}
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', location],
+        capture_output=True, timeout=PROBE_TIMEOUT, check=True,
+    )
+    data = json.loads(result.stdout or b'{}')
+    fmt = data.get('format', {})
+    info = {}
+    if fmt.get('duration'):
+        info['duration'] = float(fmt['duration'])
+    if fmt.get('bit_rate'):
+        info['bitrate'] = int(fmt['bit_rate'])
+    streams = data.get('streams', [])
+    for stream in streams:
+        if stream.get('codec_type') == 'video' and stream.get('width') and not stream.get('disposition', {}).get('attached_pic'):
+            info['width'], info['height'] = int(stream['width']), int(stream['height'])
+            info['codec'] = stream.get('codec_name', '')
+            break
+    else:
+        audio = next((stream for stream in streams if stream.get('codec_type') == 'audio'), None)
+        if audio:
+            info['codec'] = audio.get('codec_name', '')
+    return info
+
+
+def metadata_fields(info):
+    """The Content fields a probe result fills in, duration excluded."""
+    fields = {key: info[key] for key in ('bitrate', 'width', 'height') if key in info}
+    if info.get('codec'):
+        fields['codec'] = info['codec'][:20]
+    return fields
+
+
+def make_thumbnail(location, content_type, duration=0):
+    """Write a JPEG thumbnail to a temporary file and return its path, or None."""
+    if not shutil.which('ffmpeg'):
+        return None
+    fd, output = tempfile.mkstemp(suffix='.jpg')
+    os.close(fd)
+    command = ['ffmpeg', '-v', 'error', '-y']
+    if content_type == 'video':
+        # A frame a little way in is more representative than the (often black) first one
+        command += ['-ss', f'{min(duration * 0.1, 10):.2f}']
+    command += ['-i', location, '-an', '-frames:v', '1', '-vf', f'scale={THUMBNAIL_WIDTH}:-2', output]
+    result = subprocess.run(command, capture_output=True, timeout=THUMBNAIL_TIMEOUT)
+    if result.returncode != 0 or not os.path.getsize(output):
+        # Audio without cover art has no picture stream; that is not an error
+        os.unlink(output)
+        return None
+    return output
+
+
+def copy_results(processed, content):
+    """The field updates giving ``content`` the results already computed for ``processed``."""
+    updates = {
+        'processing_status': 'ready',
+        'duration': processed.duration,
+        'codec': processed.codec,
+        'bitrate': processed.bitrate,
+        'width': processed.width,
+        'height': processed.height,
+    }
+    if not content.thumbnail and processed.thumbnail:
+        # Thumbnails are never deleted with their item, so the stored image can be shared
+        updates['thumbnail'] = processed.thumbnail
+    return updates
+
+
+def process_content(content, source):
+    """Fill in media metadata for ``content`` if ``source`` is still its current file."""
+    if stored_value(content.file_path) != source:
+        return False  # the file was replaced; the job for the new file takes over
+    location = source_location(content.file_path)
+    info = probe(location)
+    updates = {'processing_status': 'ready'}
+    if 'duration' in info:
+        updates['duration'] = round(info['duration'])
+    updates.update(metadata_fields(info))
+
+    if not content.thumbnail:
+        thumbnail = make_thumbnail(location, content.content_type, info.get('duration', 0))
+        if thumbnail:
+            stem = os.path.splitext(os.path.basename(str(content.file_path)))[0] or 'thumbnail'
+            with open(thumbnail, 'rb') as fh:
+                content.thumbnail = UploadedFile(
+                    fh, name=f'{stem}.jpg', content_type='image/jpeg', size=os.path.getsize(thumbnail),
+                )
+                content.save(update_fields=['thumbnail'])
+            os.unlink(thumbnail)
+
+    Content.objects.filter(pk=content.pk).update(**updates)
+    return True
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:45
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0002_alter_content_file_path_alter_content_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contentview',
+            name='watched_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:48
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Content = apps.get_model('content', 'Content')
+    Like = apps.get_model('content', 'Like')
+    Comment = apps.get_model('content', 'Comment')
+
+    def count_of(model):
+        return Coalesce(Subquery(
+            model.objects.filter(content=OuterRef('pk'))
+            .order_by().values('content').annotate(n=Count('pk')).values('n')
+        ), 0)
+
+    Content.objects.update(like_count=count_of(Like), comment_count=count_of(Comment))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0003_alter_contentview_watched_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='content',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='content',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0004_content_like_count_comment_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedContent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('content', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbours', to='content.content')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='content.content')),
+            ],
+            options={
+                'db_table': 'content_related',
+                'ordering': ['content', 'rank'],
+                'unique_together': {('content', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:57
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0006_userrecommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='content',
+            name='trending_score',
+            field=models.FloatField(db_index=True, default=0),
+        ),
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('type', 'Content type'), ('genre', 'Genre')], max_length=10)),
+                ('key', models.CharField(max_length=50)),
+                ('score', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'trending_scores',
+                'indexes': [models.Index(fields=['scope', '-score'], name='trending_sc_scope_b2c925_idx')],
+                'unique_together': {('scope', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0007_trending_score'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contentview',
+            name='content',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='views', to='content.content'),
+        ),
+    ]
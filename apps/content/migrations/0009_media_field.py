@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:06
+
+import apps.content.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0008_contentview_no_cascade'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='content',
+            name='file_path',
+            field=apps.content.fields.MediaField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='content',
+            name='thumbnail',
+            field=apps.content.fields.MediaField(blank=True, max_length=255, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0011_media_processing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='content',
+            name='codec',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+    ]
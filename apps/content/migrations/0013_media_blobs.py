@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:19
+
+import apps.content.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def register_local_blobs(apps, schema_editor):
+    """Give locally stored files a blob; their names are already the SHA-256 of the bytes."""
+    import os
+
+    from apps.content.fields import LOCAL_PREFIX
+    from streamify_project.storage import local_media_storage
+
+    Content = apps.get_model('content', 'Content')
+    MediaBlob = apps.get_model('content', 'MediaBlob')
+    stored_values = (
+        Content.objects.filter(file_path__startswith=LOCAL_PREFIX)
+        .order_by().values_list('file_path', flat=True).distinct()
+    )
+    for media in list(stored_values):
+        stored = LOCAL_PREFIX + media.name
+        rows = Content.objects.filter(file_path=stored)
+        try:
+            size = local_media_storage.size(media.name)
+        except OSError:
+            size = 0
+        blob, _ = MediaBlob.objects.get_or_create(
+            sha256=os.path.splitext(os.path.basename(media.name))[0],
+            defaults={'size': size, 'stored': stored},
+        )
+        MediaBlob.objects.filter(pk=blob.pk).update(ref_count=models.F('ref_count') + rows.count())
+        rows.update(file_blob=blob)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0012_content_codec'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('size', models.BigIntegerField(default=0)),
+                ('stored', models.CharField(max_length=500)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('reuse_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'media_blobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='content',
+            name='file_path',
+            field=apps.content.fields.MediaField(blob_field='file_blob', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='content',
+            name='file_blob',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='contents', to='content.mediablob'),
+        ),
+        migrations.RunPython(register_local_blobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0013_media_blobs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('active', 'Active'), ('finalizing', 'Finalizing'), ('complete', 'Complete')], default='active', max_length=10),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:52
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0014_upload_session_finalizing'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userrecommendation',
+            name='generated_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,7 +1,10 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
-from cloudinary.models import CloudinaryField
+
+from .fields import MediaField
 
 
 class Genre(models.Model):
@@ -19,15 +22,31 @@ class Content(models.Model):
         ('video', 'Video'),
         ('podcast', 'Podcast'),
     ]
+    PROCESSING_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
 
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     content_type = models.CharField(max_length=20, choices=TYPE_CHOICES)
-    file_path = CloudinaryField(
-    resource_type='auto'
+    file_path = MediaField(
+    resource_type='auto',
+    blob_field='file_blob'
 )
+    # The de-duplicated stored file (apps/content/dedup.py); set by file_path's pre_save
+    file_blob = models.ForeignKey(
+        'MediaBlob',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='contents'
+    )
 
-    thumbnail = CloudinaryField(
+    thumbnail = MediaField(
     resource_type='image',
     blank=True,
     null=True
@@ -44,6 +63,18 @@ class Content(models.Model):
     is_published = models.BooleanField(default=False)
     is_premium = models.BooleanField(default=False, help_text='Requires subscription')
     view_count = models.PositiveIntegerField(default=0)
+    # Denormalized counters, kept in step by the like/comment views
+    # (rebuild with `manage.py reconcile_content_counters`)
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    # Log of the forward-decayed engagement score, see apps/content/trending.py
+    trending_score = models.FloatField(default=0, db_index=True)
+    # Filled in by the media processing jobs (apps/content/media_jobs.py)
+    processing_status = models.CharField(max_length=10, choices=PROCESSING_CHOICES, default='pending')
+    codec = models.CharField(max_length=20, blank=True)
+    bitrate = models.PositiveIntegerField(default=0, help_text='Bits per second')
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
     uploaded_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -60,14 +91,6 @@ class Content(models.Model):
         seconds = self.duration % 60
         return f"{minutes}:{seconds:02d}"
 
-    @property
-    def like_count(self):
-        return self.likes.count()
-
-    @property
-    def comment_count(self):
-        return self.comments.count()
-
 
 class Like(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='likes')
@@ -99,9 +122,183 @@ class Comment(models.Model):
 
 class ContentView(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
-    content = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='views')
+    # No cascade: deleting content must not delete millions of rows inline.
+    # Orphaned views age out through `manage.py purge_content_views`.
+    content = models.ForeignKey(
+        Content,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='views'
+    )
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    watched_at = models.DateTimeField(auto_now_add=True)
+    watched_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         db_table = 'content_views'
+
+
+class RelatedContent(models.Model):
+    """Precomputed item-to-item neighbours, rebuilt by `manage.py build_related_content`"""
+    content = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='neighbours')
+    related = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        db_table = 'content_related'
+        ordering = ['content', 'rank']
+        unique_together = ('content', 'rank')
+
+    def __str__(self):
+        return f"{self.content_id} -> {self.related_id} (#{self.rank})"
+
+
+class UserRecommendation(models.Model):
+    """Precomputed "For you" candidates, rebuilt by `manage.py refresh_recommendations`"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='recommendations'
+    )
+    content_ids = models.JSONField(default=list)
+    # Start of the run that wrote the row: refresh resumes from the newest
+    generated_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        db_table = 'user_recommendations'
+
+    def __str__(self):
+        return f"Recommendations for {self.user_id}"
+
+
+class TrendingScore(models.Model):
+    """Decayed engagement per content type / genre, maintained by apps/content/trending.py"""
+    SCOPE_TYPE = 'type'
+    SCOPE_GENRE = 'genre'
+    SCOPE_CHOICES = [
+        (SCOPE_TYPE, 'Content type'),
+        (SCOPE_GENRE, 'Genre'),
+    ]
+
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    key = models.CharField(max_length=50)
+    score = models.FloatField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'trending_scores'
+        unique_together = ('scope', 'key')
+        indexes = [models.Index(fields=['scope', '-score'])]
+
+    def __str__(self):
+        return f"{self.scope}:{self.key} ({self.score:.2f})"
+
+
+class UploadSession(models.Model):
+    """A resumable chunked upload; see apps/content/uploads.py"""
+    STATUS_CHOICES = [
+        ('active', 'Active'),
+        ('finalizing', 'Finalizing'),
+        ('complete', 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    mime_type = models.CharField(max_length=100, blank=True)
+    total_size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    checksum = models.CharField(max_length=64, blank=True, help_text='Optional SHA-256 of the whole file')
+    metadata = models.JSONField(default=dict, help_text='Content fields applied on finalize')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='active')
+    content = models.ForeignKey(Content, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'upload_sessions'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Upload {self.id} ({self.filename})"
+
+    @property
+    def chunk_count(self):
+        return -(-self.total_size // self.chunk_size)
+
+
+class UploadChunk(models.Model):
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()
+    checksum = models.CharField(max_length=64)
+    received_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'upload_chunks'
+        unique_together = ('session', 'index')
+        ordering = ['session', 'index']
+
+    def __str__(self):
+        return f"{self.session_id} #{self.index}"
+
+
+class MediaBlob(models.Model):
+    """
+    One stored media file, shared by every Content item uploaded with the same bytes.
+
+    ``stored`` is the MediaField value pointing at the file. ``ref_count`` is
+    the number of Content rows using it; the file is deleted when it drops
+    to zero. ``reuse_count`` counts uploads that were served from this blob
+    instead of being stored again.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.BigIntegerField(default=0)
+    stored = models.CharField(max_length=500)
+    ref_count = models.PositiveIntegerField(default=0)
+    reuse_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'media_blobs'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} refs)"
+
+
+class MediaJob(models.Model):
+    """
+    One processing run for one stored file of a Content item.
+
+    ``source`` is the stored file_path value, so re-enqueueing the same file
+    is a no-op and replacing the file queues a fresh job.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    content = models.ForeignKey(Content, on_delete=models.CASCADE, related_name='media_jobs')
+    source = models.CharField(max_length=500)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'media_jobs'
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['content', 'source'], name='unique_media_job_per_source'),
+        ]
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+    def __str__(self):
+        return f"{self.content_id} ({self.status})"
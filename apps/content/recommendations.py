@@ -0,0 +1,252 @@
+"""
+Personalized "For you" recommendations.
+
+train() factorizes the user x content engagement matrix (likes, views and
+playlist adds, log-damped) with a randomized truncated SVD in NumPy, then
+scores every active user in batches and stores their top-N unseen, published
+items in UserRecommendation. refresh() folds users with new activity into the
+saved item factors without retraining; it picks up from the newest stored
+generated_at, which every run sets to the time it started. Serving is one
+primary-key lookup (a cache read when RECOMMENDATION_CACHE_TIMEOUT is set,
+with a cache shared by every worker) plus one pk__in query for the content
+rows.
+"""
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import Content, ContentView, Like, UserRecommendation
+from .related import LIKE_WEIGHT, PLAYLIST_WEIGHT, VIEW_WEIGHT
+
+try:
+    import numpy as np
+    from scipy import sparse
+    SCIPY_AVAILABLE = True
+except ImportError:  # only training and refresh need these
+    SCIPY_AVAILABLE = False
+
+FACTORS = 64
+TOP_N = 24
+SCORE_BATCH = 512
+REFRESH_BATCH = 1000
+VIEW_WINDOW_DAYS = 180
+CACHE_KEY = 'recs:user:{}'
+
+
+def _cache_timeout():
+    return getattr(settings, 'RECOMMENDATION_CACHE_TIMEOUT', 0)
+
+
+def _model_path():
+    return Path(getattr(settings, 'RECOMMENDER_MODEL_PATH', Path(settings.BASE_DIR) / 'var' / 'recommender.npz'))
+
+
+# ── Serving ───────────────────────────────────
+
+def recommendations_for(user, limit=12):
+    """Return up to ``limit`` published Content objects picked for ``user``."""
+    if not user.is_authenticated:
+        return []
+    timeout = _cache_timeout()
+    key = CACHE_KEY.format(user.pk)
+    ids = cache.get(key) if timeout else None
+    if ids is None:
+        ids = UserRecommendation.objects.filter(user_id=user.pk).values_list('content_ids', flat=True).first() or []
+        if timeout:
+            cache.set(key, ids, timeout)
+    if not ids:
+        return []
+    by_id = Content.objects.filter(is_published=True).select_related('uploaded_by').in_bulk(ids)
+    return [by_id[pk] for pk in ids if pk in by_id][:limit]
+
+
+# ── Matrix helpers (also used by benchmark_recommender) ──
+
+def randomized_svd(matrix, k, oversample=10, n_iter=4, seed=0):
+    """Rank-k truncated SVD of a sparse matrix (Halko et al. range finder)."""
+    rank = min(k + oversample, min(matrix.shape))
+    rng = np.random.default_rng(seed)
+    sample = matrix @ rng.standard_normal((matrix.shape[1], rank)).astype(np.float32)
+    for _ in range(n_iter):
+        sample, _ = np.linalg.qr(sample)
+        sample = matrix @ (matrix.T @ sample)
+    basis, _ = np.linalg.qr(sample)
+    small = np.asarray(matrix.T @ basis).T
+    u_small, s, vt = np.linalg.svd(small, full_matrices=False)
+    k = min(k, s.size)
+    return (basis @ u_small[:, :k]).astype(np.float32), s[:k].astype(np.float32), vt[:k].astype(np.float32)
+
+
+def top_n(user_vectors, item_factors, seen, candidates, n):
+    """
+    Score a batch of users against every item and return (indices, valid).
+
+    ``seen`` is the batch's CSR slice of the engagement matrix (those items are
+    excluded) and ``candidates`` a boolean mask of recommendable items.
+    """
+    scores = user_vectors @ item_factors.T
+    scores[:, ~candidates] = -np.inf
+    rows, cols = seen.nonzero()
+    scores[rows, cols] = -np.inf
+    n = min(n, scores.shape[1])
+    best = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1)
+    best = np.take_along_axis(best, order, axis=1)
+    valid = np.isfinite(np.take_along_axis(best_scores, order, axis=1))
+    return best, valid
+
+
+def engagement_matrix(user_idx, item_idx, weights, shape):
+    matrix = sparse.coo_matrix((weights, (user_idx, item_idx)), shape=shape, dtype=np.float32).tocsr()
+    matrix.data = np.log1p(matrix.data)
+    return matrix
+
+
+# ── Training / refresh ────────────────────────
+
+def _user_interactions(since, user_ids=None):
+    """Yield (user_id, content_id, weight) for signed-in engagement."""
+    from apps.playlists.models import PlaylistItem
+
+    views = ContentView.objects.filter(watched_at__gte=since, user__isnull=False).order_by()
+    likes = Like.objects.all()
+    playlist_items = PlaylistItem.objects.all()
+    if user_ids is not None:
+        views = views.filter(user_id__in=user_ids)
+        likes = likes.filter(user_id__in=user_ids)
+        playlist_items = playlist_items.filter(playlist__user_id__in=user_ids)
+
+    for user_id, content_id, n in (
+        views.values('user_id', 'content').annotate(n=Count('id'))
+        .values_list('user_id', 'content', 'n').iterator()
+    ):
+        yield user_id, content_id, VIEW_WEIGHT * n
+    for user_id, content_id in likes.values_list('user_id', 'content_id').iterator():
+        yield user_id, content_id, LIKE_WEIGHT
+    for user_id, content_id in playlist_items.values_list('playlist__user_id', 'content_id').iterator():
+        yield user_id, content_id, PLAYLIST_WEIGHT
+
+
+def _as_arrays(triples):
+    users, items, weights = zip(*triples)
+    return (np.array(users, dtype=np.int64), np.array(items, dtype=np.int64),
+            np.array(weights, dtype=np.float32))
+
+
+def _save_model(item_ids, item_factors, trained_at):
+    path = _model_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'wb') as fh:
+        np.savez(fh, item_ids=item_ids, item_factors=item_factors,
+                 trained_at=np.array(trained_at.timestamp()))
+    os.replace(tmp, path)
+
+
+def _load_model():
+    path = _model_path()
+    if not path.exists():
+        raise RuntimeError('No recommender model yet; run a full training first.')
+    with np.load(path) as data:
+        trained_at = datetime.fromtimestamp(float(data['trained_at']), tz=dt_timezone.utc)
+        return data['item_ids'], data['item_factors'], trained_at
+
+
+def _watermark(trained_at):
+    """Start of the last train/refresh that stored recommendations."""
+    latest = UserRecommendation.objects.aggregate(latest=Max('generated_at'))['latest']
+    return max(latest, trained_at) if latest else trained_at
+
+
+def _store(user_ids, user_vectors, seen, item_ids, item_factors, n, started):
+    """
+    Score users in batches and persist/cache their top-N. Rows are stamped
+    with ``started``, the watermark the next refresh resumes from. Returns
+    users written.
+    """
+    published = set(Content.objects.filter(is_published=True).values_list('pk', flat=True))
+    candidates = np.isin(item_ids, np.fromiter(published, dtype=np.int64, count=len(published)))
+    timeout = _cache_timeout()
+    written = 0
+    for start in range(0, len(user_ids), SCORE_BATCH):
+        stop = start + SCORE_BATCH
+        vectors = user_vectors[start:stop]
+        best, valid = top_n(vectors, item_factors, seen[start:stop], candidates, n)
+        # No usable history (e.g. only content newer than the model): nothing to rank on
+        valid[~np.any(vectors, axis=1)] = False
+        rows = [
+            UserRecommendation(user_id=int(user_id), content_ids=item_ids[picks[ok]].tolist(), generated_at=started)
+            for user_id, picks, ok in zip(user_ids[start:stop], best, valid)
+        ]
+        UserRecommendation.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['user'],
+            update_fields=['content_ids', 'generated_at'],
+        )
+        if timeout:
+            cache.set_many({CACHE_KEY.format(row.user_id): row.content_ids for row in rows}, timeout)
+        written += len(rows)
+    return written
+
+
+def train(factors=FACTORS, n=TOP_N, view_window_days=VIEW_WINDOW_DAYS):
+    """Full retrain over every active user. Returns a stats dict."""
+    if not SCIPY_AVAILABLE:
+        raise RuntimeError('numpy and scipy are required to train recommendations.')
+    started = timezone.now()
+    triples = list(_user_interactions(started - timedelta(days=view_window_days)))
+    if not triples:
+        return {'users': 0, 'items': 0}
+
+    users, items, weights = _as_arrays(triples)
+    user_ids, user_idx = np.unique(users, return_inverse=True)
+    item_ids, item_idx = np.unique(items, return_inverse=True)
+    matrix = engagement_matrix(user_idx, item_idx, weights, (user_ids.size, item_ids.size))
+
+    u, s, vt = randomized_svd(matrix, factors)
+    # X ~ U S V^T, so users are U*S and a new row x folds in as x @ V
+    item_factors = np.ascontiguousarray(vt.T)
+    _save_model(item_ids, item_factors, started)
+    written = _store(user_ids, u * s, matrix, item_ids, item_factors, n, started)
+    return {'users': written, 'items': int(item_ids.size)}
+
+
+def refresh(n=TOP_N, view_window_days=VIEW_WINDOW_DAYS):
+    """Re-score only users with engagement since the last train/refresh."""
+    from apps.playlists.models import PlaylistItem
+
+    if not SCIPY_AVAILABLE:
+        raise RuntimeError('numpy and scipy are required to refresh recommendations.')
+    item_ids, item_factors, trained_at = _load_model()
+    started = timezone.now()
+    watermark = _watermark(trained_at)
+
+    active = set(ContentView.objects.filter(watched_at__gte=watermark, user__isnull=False)
+                 .values_list('user_id', flat=True).distinct())
+    active |= set(Like.objects.filter(created_at__gte=watermark).values_list('user_id', flat=True))
+    active |= set(PlaylistItem.objects.filter(added_at__gte=watermark)
+                  .values_list('playlist__user_id', flat=True).distinct())
+    active = sorted(active)
+
+    since = started - timedelta(days=view_window_days)
+    written = 0
+    for start in range(0, len(active), REFRESH_BATCH):
+        batch_ids = np.array(active[start:start + REFRESH_BATCH], dtype=np.int64)
+        triples = list(_user_interactions(since, user_ids=batch_ids.tolist()))
+        if not triples:
+            continue
+        users, items, weights = _as_arrays(triples)
+        # Content uploaded after training has no factors yet; skip it until the next train
+        positions = np.searchsorted(item_ids, items)
+        known = (positions < item_ids.size) & (item_ids[np.minimum(positions, item_ids.size - 1)] == items)
+        matrix = engagement_matrix(
+            np.searchsorted(batch_ids, users[known]), positions[known], weights[known],
+            (batch_ids.size, item_ids.size),
+        )
+        written += _store(batch_ids, matrix @ item_factors, matrix, item_ids, item_factors, n, started)
+    return {'users': written, 'items': int(item_ids.size)}
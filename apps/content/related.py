@@ -0,0 +1,135 @@
+"""
+Co-engagement "related content" index.
+
+build_related_index() turns views, likes, playlist membership and watchlist
+entries into a sparse basket x item matrix, computes item-item cosine
+similarity with one sparse product and stores the top-K neighbours of every
+item in RelatedContent. The detail page then reads its shelf with a single
+indexed lookup (related_for), padding cold items with the old same-type query.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Content, ContentView, Like, RelatedContent
+
+try:
+    import numpy as np
+    from scipy import sparse
+    SCIPY_AVAILABLE = True
+except ImportError:  # only the offline builder needs these
+    SCIPY_AVAILABLE = False
+
+RELATED_LIMIT = 6
+DEFAULT_TOP_K = 20
+DEFAULT_VIEW_WINDOW_DAYS = 90
+
+# Relative strength of each signal; repeated views are damped with log1p
+VIEW_WEIGHT = 1.0
+LIKE_WEIGHT = 4.0
+PLAYLIST_WEIGHT = 3.0
+WATCHLIST_WEIGHT = 2.0
+
+
+def related_for(content, limit=RELATED_LIMIT):
+    neighbours = (
+        RelatedContent.objects
+        .filter(content=content, related__is_published=True)
+        .select_related('related__uploaded_by')
+        .order_by('rank')[:limit]
+    )
+    related = [n.related for n in neighbours]
+    if len(related) < limit:
+        # Cold item (no or few co-engagements yet): pad with the same-type shelf
+        fallback = (
+            Content.objects.filter(is_published=True, content_type=content.content_type)
+            .exclude(pk__in=[content.pk] + [item.pk for item in related])
+            .select_related('uploaded_by')[:limit - len(related)]
+        )
+        related.extend(fallback)
+    return related
+
+
+def _interactions(since):
+    """Yield (basket_key, content_id, weight) triples from every engagement source."""
+    from apps.playlists.models import PlaylistItem, Watchlist
+
+    views = ContentView.objects.filter(watched_at__gte=since).order_by()
+    for user_id, content_id, n in (
+        views.filter(user__isnull=False).values('user_id', 'content')
+        .annotate(n=Count('id')).values_list('user_id', 'content', 'n').iterator()
+    ):
+        yield f'u{user_id}', content_id, VIEW_WEIGHT * n
+    # Anonymous viewers are grouped by address
+    for ip, content_id, n in (
+        views.filter(user__isnull=True, ip_address__isnull=False)
+        .values('ip_address', 'content').annotate(n=Count('id'))
+        .values_list('ip_address', 'content', 'n').iterator()
+    ):
+        yield f'ip{ip}', content_id, VIEW_WEIGHT * n
+    for user_id, content_id in Like.objects.values_list('user_id', 'content_id').iterator():
+        yield f'u{user_id}', content_id, LIKE_WEIGHT
+    for user_id, content_id in Watchlist.objects.values_list('user_id', 'content_id').iterator():
+        yield f'u{user_id}', content_id, WATCHLIST_WEIGHT
+    # A playlist is a hand-curated basket of its own
+    for playlist_id, content_id in PlaylistItem.objects.values_list('playlist_id', 'content_id').iterator():
+        yield f'p{playlist_id}', content_id, PLAYLIST_WEIGHT
+
+
+def _top_k_per_row(matrix, k):
+    """Return (rows, cols, scores, ranks) of the k largest entries of each CSR row."""
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    order = np.lexsort((-matrix.data, rows))
+    sorted_rows = rows[order]
+    ranks = np.arange(order.size) - matrix.indptr[sorted_rows]
+    keep = ranks < k
+    order = order[keep]
+    return sorted_rows[keep], matrix.indices[order], matrix.data[order], ranks[keep]
+
+
+def similarity_matrix(baskets, items, weights):
+    """Item-item cosine similarity of a (basket, item, weight) triple list."""
+    basket_keys, basket_idx = np.unique(baskets, return_inverse=True)
+    item_ids, item_idx = np.unique(items, return_inverse=True)
+    engagement = sparse.coo_matrix(
+        (weights, (basket_idx, item_idx)),
+        shape=(basket_keys.size, item_ids.size),
+    ).tocsr()  # duplicates are summed here
+    engagement.data = np.log1p(engagement.data)
+
+    norms = np.sqrt(np.asarray(engagement.multiply(engagement).sum(axis=0)).ravel())
+    inverse = sparse.diags(np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0))
+    similarity = (inverse @ (engagement.T @ engagement) @ inverse).tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+    return item_ids, similarity
+
+
+def build_related_index(top_k=DEFAULT_TOP_K, view_window_days=DEFAULT_VIEW_WINDOW_DAYS):
+    """Rebuild RelatedContent. Returns (items_indexed, rows_written)."""
+    if not SCIPY_AVAILABLE:
+        raise RuntimeError('numpy and scipy are required to build the related-content index.')
+
+    since = timezone.now() - timedelta(days=view_window_days)
+    # Views of deleted content linger until purged; leave them out
+    live = set(Content.objects.values_list('pk', flat=True))
+    triples = [triple for triple in _interactions(since) if triple[1] in live]
+    if triples:
+        baskets, items, weights = zip(*triples)
+        item_ids, similarity = similarity_matrix(
+            np.array(baskets), np.array(items, dtype=np.int64), np.array(weights, dtype=np.float64)
+        )
+        src, dst, scores, ranks = _top_k_per_row(similarity, top_k)
+        rows = [
+            RelatedContent(content_id=int(a), related_id=int(b), score=float(s), rank=int(r))
+            for a, b, s, r in zip(item_ids[src], item_ids[dst], scores, ranks)
+        ]
+    else:
+        rows = []
+
+    with transaction.atomic():
+        RelatedContent.objects.all().delete()
+        RelatedContent.objects.bulk_create(rows, batch_size=5000)
+    return len({row.content_id for row in rows}), len(rows)
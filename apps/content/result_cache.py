@@ -0,0 +1,236 @@
+"""
+Cached result pages for search, browse and the content API.
+
+A cached page holds the ids of its rows and whatever else the page shows
+besides them (cursors, counts, facets); the rows themselves are fetched by
+primary key on every hit. Keys are built from the normalized query, the
+filters, the sort and the cursor, plus the current versions of the data the
+page depends on. Changes bump versions instead of deleting keys, so entries
+of older versions are never read again and simply expire:
+
+* ``type:<type>`` / ``genre:<slug>``: pages filtered by content type or genre,
+  bumped by saves, deletes, publish toggles and genre changes of items of
+  that type or in that genre, before or after the change;
+* ``all``: unfiltered listings and search pages (whose facets count every
+  match), bumped by any such change;
+* ``global``: every page, bumped when a Genre is saved or deleted.
+
+On a miss one worker computes the page while the others wait for its
+result instead of running the same queries. Hits, waits and misses are
+counted per worker and added to shared counters every few seconds.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Content, Genre
+
+SCOPES = ('search', 'browse', 'api')
+OUTCOMES = ('hits', 'waits', 'misses')
+VERSION_KEY = 'results:version:{}'
+PAGE_KEY = 'results:page:{}:{}'
+LOCK_KEY = 'results:lock:{}'
+STATS_KEY = 'results:stats:{}:{}'
+# A computing worker holds the lock at most this long
+LOCK_TIMEOUT = 10
+# Waiting workers poll this often, and compute the page themselves after WAIT_TIMEOUT
+POLL_INTERVAL = 0.02
+WAIT_TIMEOUT = 3
+STATS_FLUSH_INTERVAL = 5
+# Saves touching none of these leave every listing as it was
+LISTED_FIELDS = {
+    'title', 'description', 'artist_name', 'album', 'content_type', 'is_published',
+    'uploaded_at', 'view_count', 'trending_score',
+}
+
+
+def _timeout():
+    return getattr(settings, 'RESULT_CACHE_TIMEOUT', 0)
+
+
+def normalize_query(query):
+    return ' '.join((query or '').casefold().split())
+
+
+def dependencies(content_type='', genre=''):
+    """The versions a listing filtered by ``content_type`` and ``genre`` depends on."""
+    names = []
+    if content_type:
+        names.append(f'type:{content_type}')
+    if genre:
+        names.append(f'genre:{genre}')
+    return names or ['all']
+
+
+# ── Versions ──────────────────────────────────
+
+def _versions(names):
+    keys = [VERSION_KEY.format(name) for name in ('global', *names)]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # Seeded from the clock, so a counter the cache evicted never
+            # comes back at a value older entries were stored under
+            cache.add(key, time.time_ns() // 1000, timeout=None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump(*names):
+    for name in set(names):
+        key = VERSION_KEY.format(name)
+        try:
+            cache.incr(key)
+        except ValueError:  # never read, so nothing is cached under it
+            pass
+
+
+# ── Pages ─────────────────────────────────────
+
+def page_key(scope, params, depends_on):
+    payload = json.dumps([params, _versions(depends_on)], sort_keys=True)
+    return PAGE_KEY.format(scope, hashlib.sha1(payload.encode()).hexdigest())
+
+
+def cached(scope, params, compute, depends_on=('all',)):
+    """
+    Return ``compute()`` for the page described by ``params`` (a JSON-able
+    dict), from the cache when an up-to-date copy is there.
+    """
+    timeout = _timeout()
+    if not timeout:
+        return compute()
+    key = page_key(scope, params, depends_on)
+    value = cache.get(key)
+    if value is not None:
+        _count(scope, 'hits')
+        return value
+
+    lock = LOCK_KEY.format(key)
+    if not cache.add(lock, os.getpid(), timeout=LOCK_TIMEOUT):
+        # Another worker is computing this page: wait for its result
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                _count(scope, 'waits')
+                return value
+            if cache.get(lock) is None:
+                break  # it failed; compute below
+    try:
+        value = compute()
+        cache.set(key, value, timeout)
+    finally:
+        cache.delete(lock)
+    _count(scope, 'misses')
+    return value
+
+
+# ── Metrics ───────────────────────────────────
+
+_state_lock = threading.Lock()
+_state = {'pid': None, 'counts': {}, 'flushed': 0.0}
+
+
+def _count(scope, outcome):
+    with _state_lock:
+        if _state['pid'] != os.getpid():
+            _state.update(pid=os.getpid(), counts={}, flushed=time.monotonic())
+        counts = _state['counts']
+        counts[scope, outcome] = counts.get((scope, outcome), 0) + 1
+        if time.monotonic() - _state['flushed'] < STATS_FLUSH_INTERVAL:
+            return
+        _state.update(counts={}, flushed=time.monotonic())
+    for (scope, outcome), count in counts.items():
+        key = STATS_KEY.format(scope, outcome)
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, count)
+        except ValueError:  # evicted between add() and incr()
+            pass
+
+
+def stats():
+    """Hits, waits and misses per scope and in total, as of the last flushes."""
+    keys = {(scope, outcome): STATS_KEY.format(scope, outcome) for scope in SCOPES for outcome in OUTCOMES}
+    found = cache.get_many(keys.values())
+    scopes = {
+        scope: {outcome: found.get(keys[scope, outcome], 0) for outcome in OUTCOMES}
+        for scope in SCOPES
+    }
+    totals = {outcome: sum(counts[outcome] for counts in scopes.values()) for outcome in OUTCOMES}
+    for counts in [*scopes.values(), totals]:
+        served = sum(counts.values())
+        counts['hit_rate'] = (counts['hits'] + counts['waits']) / served if served else 0.0
+    return {**totals, 'scopes': scopes}
+
+
+# ── Signal receivers ──────────────────────────
+
+def _genre_dependencies(content_ids):
+    slugs = Genre.objects.filter(content__in=content_ids).values_list('slug', flat=True).distinct()
+    return [f'genre:{slug}' for slug in slugs]
+
+
+def _listed(update_fields):
+    return update_fields is None or bool(set(update_fields) & LISTED_FIELDS)
+
+
+def content_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance.pk is None or not _listed(update_fields):
+        return
+    # Where the row was listed before this save
+    instance._listed_before = (
+        Content.objects.filter(pk=instance.pk).values_list('content_type', 'is_published').first()
+    )
+
+
+def content_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    before = instance.__dict__.pop('_listed_before', None)
+    if raw or not _listed(update_fields):
+        return
+    types = {instance.content_type}
+    if before:
+        types.add(before[0])
+    if not instance.is_published and not (before and before[1]):
+        return  # a draft before and after: in no listing
+    content_id = instance.pk
+    transaction.on_commit(lambda: bump(
+        'all', *(f'type:{content_type}' for content_type in types), *_genre_dependencies([content_id]),
+    ))
+
+
+def content_pre_delete(sender, instance, **kwargs):
+    if instance.is_published:
+        # Read now: the genre links are deleted before post_delete
+        names = ['all', f'type:{instance.content_type}', *_genre_dependencies([instance.pk])]
+        transaction.on_commit(lambda: bump(*names))
+
+
+def genres_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """m2m_changed receiver for Content.genre, from either side."""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:  # genre.content.add(...)
+        contents = instance.content.all() if action == 'pre_clear' else Content.objects.filter(pk__in=pk_set)
+        types = contents.filter(is_published=True).values_list('content_type', flat=True).distinct()
+        names = ['all', f'genre:{instance.slug}', *(f'type:{content_type}' for content_type in types)]
+    else:
+        if not instance.is_published:
+            return
+        genres = instance.genre.all() if action == 'pre_clear' else Genre.objects.filter(pk__in=pk_set)
+        names = ['all', f'type:{instance.content_type}', *(f'genre:{slug}' for slug in genres.values_list('slug', flat=True))]
+    transaction.on_commit(lambda: bump(*names))
+
+
+def genre_changed(sender, instance, raw=False, **kwargs):
+    """post_save/post_delete receiver for Genre: names and memberships show on every page."""
+    if not raw:
+        transaction.on_commit(lambda: bump('global'))
@@ -0,0 +1,34 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from streamify_project import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail_url(image, width=None, fmt='jpg'):
+    return thumbnails.variant_url(image, width or thumbnails.default_width(), fmt)
+
+
+@register.simple_tag
+def thumbnail_srcset(image, fmt='jpg'):
+    return thumbnails.srcset(image, fmt)
+
+
+@register.simple_tag
+def responsive_image(image, sizes='100vw', width=None, **attrs):
+    """
+    A <picture> offering WebP and JPEG variants of ``image`` at every width;
+    extra keyword arguments become attributes of the <img>.
+    """
+    if not image:
+        return ''
+    extra = format_html_join(' ', '{}="{}"', ((name.replace('_', '-'), value) for name, value in attrs.items()))
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" loading="lazy" decoding="async" {}></picture>',
+        thumbnails.srcset(image, 'webp'), sizes,
+        thumbnails.variant_url(image, width or thumbnails.default_width(), 'jpg'),
+        thumbnails.srcset(image, 'jpg'), sizes, extra,
+    )
@@ -0,0 +1,53 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from apps.content.models import Content, Genre
+from streamify_project.pagination import KeysetPagination
+
+
+class ContentApiQueryCountTests(TestCase):
+    """A page costs the same queries however many rows it has: no N+1."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        genres = [Genre.objects.create(name=f'Genre {i}', slug=f'genre-{i}') for i in range(3)]
+        for i in range(60):
+            uploader = User.objects.create_user(f'creator{i}@example.com', f'Creator {i}')
+            content = Content.objects.create(
+                title=f'Track {i}', content_type='music', file_path=f'local:track{i}.mp3',
+                uploaded_by=uploader, is_published=True, like_count=i, comment_count=i,
+            )
+            content.genre.set(genres[:i % 3 + 1])
+        cls.content = content
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_list(self):
+        for page_size in (5, 20, 50):
+            with self.subTest(page_size=page_size), mock.patch.object(KeysetPagination, 'page_size', page_size):
+                # The page with its uploaders, then the genres of every row on it
+                with self.assertNumQueries(2):
+                    response = self.client.get('/api/v1/content/')
+                self.assertEqual(len(response.json()['results']), page_size)
+
+                with self.assertNumQueries(2):
+                    response = self.client.get(response.json()['next'])
+                self.assertEqual(len(response.json()['results']), min(page_size, 60 - page_size))
+
+    def test_list_filtered_by_genre(self):
+        for page_size in (5, 20):
+            with self.subTest(page_size=page_size), mock.patch.object(KeysetPagination, 'page_size', page_size):
+                with self.assertNumQueries(2):
+                    response = self.client.get('/api/v1/content/', {'genre': 'genre-2', 'type': 'music'})
+                self.assertEqual(len(response.json()['results']), page_size)
+
+    def test_retrieve(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/v1/content/{self.content.pk}/')
+        self.assertEqual(response.json()['uploaded_by_name'], 'Creator 59')
+        self.assertEqual(len(response.json()['genre']), 3)
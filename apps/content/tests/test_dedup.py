@@ -0,0 +1,151 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+
+from apps.content import dedup
+from apps.content.models import Content, MediaBlob
+from streamify_project.storage import local_media_storage
+
+
+class DedupTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        settings_override = override_settings(MEDIA_STORAGE_BACKEND='local', LOCAL_MEDIA_ROOT=os.path.join(tmp, 'media'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = get_user_model().objects.create_user('creator@example.com', 'Creator', role='creator')
+
+    def upload(self, data, title='Track'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Content.objects.create(
+                title=title, content_type='music', file_path=SimpleUploadedFile('track.mp3', data),
+                uploaded_by=self.user, is_published=True,
+            )
+
+    def stored_exists(self, blob):
+        return local_media_storage.exists(Content._meta.get_field('file_path').to_python(blob.stored).name)
+
+    def test_same_bytes_share_one_blob(self):
+        first = self.upload(b'a' * 100)
+        second = self.upload(b'a' * 100)
+        other = self.upload(b'b' * 100)
+        blob = MediaBlob.objects.get(sha256=hashlib.sha256(b'a' * 100).hexdigest())
+        self.assertEqual((blob.ref_count, blob.reuse_count), (2, 1))
+        self.assertEqual(first.file_blob_id, second.file_blob_id)
+        self.assertEqual(str(first.file_path), str(second.file_path))
+        self.assertNotEqual(other.file_blob_id, blob.pk)
+
+        # The file goes with the last reference
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(self.stored_exists(blob))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(MediaBlob.objects.filter(pk=blob.pk).exists())
+        self.assertFalse(self.stored_exists(blob))
+
+    def test_replacing_the_file_releases_the_old_blob(self):
+        content = self.upload(b'a' * 100)
+        old = MediaBlob.objects.get()
+        content.file_path = SimpleUploadedFile('new.mp3', b'b' * 100)
+        with self.captureOnCommitCallbacks(execute=True):
+            content.save()
+        self.assertFalse(MediaBlob.objects.filter(pk=old.pk).exists())
+        self.assertFalse(self.stored_exists(old))
+        self.assertEqual(MediaBlob.objects.get().pk, content.file_blob_id)
+
+    def test_concurrent_registration_shares_the_first_blob(self):
+        content = self.upload(b'a' * 100)
+        blob = MediaBlob.objects.get()
+        # Another upload stored its own copy before seeing this blob
+        copy = 'v1/video/upload/copy.mp3'
+        with mock.patch.object(dedup, 'delete_stored') as delete_stored:
+            shared = dedup._register(blob.sha256, 100, copy)
+        self.assertEqual(shared.pk, content.file_blob_id)
+        blob.refresh_from_db()
+        self.assertEqual((blob.ref_count, blob.reuse_count), (2, 1))
+        delete_stored.assert_called_once_with(copy)
+
+        # Local copies of the same bytes are the same file: nothing to delete
+        with mock.patch.object(dedup, 'delete_stored') as delete_stored:
+            dedup._register(blob.sha256, 100, blob.stored)
+        delete_stored.assert_not_called()
+        self.assertTrue(self.stored_exists(blob))
+
+    def test_release_keeps_a_blob_referenced_meanwhile(self):
+        content = self.upload(b'a' * 100)
+        blob_id = content.file_blob_id
+        Content.objects.filter(pk=content.pk).update(file_blob=None)
+        first = QuerySet.first
+
+        def first_then_reference(queryset):
+            found = first(queryset)
+            dedup._reference(blob_id, reused=True)  # an upload of the same bytes
+            return found
+
+        with mock.patch.object(QuerySet, 'first', autospec=True, side_effect=first_then_reference):
+            self.assertFalse(dedup.release(blob_id))
+        blob = MediaBlob.objects.get(pk=blob_id)
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(self.stored_exists(blob))
+
+    def test_upload_waiting_on_a_release_stores_the_file_again(self):
+        content = self.upload(b'a' * 100)
+        blob = MediaBlob.objects.get()
+        Content.objects.filter(pk=content.pk).update(file_blob=None)
+        reference = dedup._reference
+
+        def release_then_reference(blob_id, reused):
+            # The upload found the blob; its reference waits for the release
+            self.assertTrue(dedup.release(blob_id))
+            return reference(blob_id, reused)
+
+        with mock.patch.object(dedup, '_reference', side_effect=release_then_reference):
+            again = self.upload(b'a' * 100, title='Again')
+        self.assertNotEqual(again.file_blob_id, blob.pk)
+        self.assertEqual(str(again.file_path), str(content.file_path))
+        self.assertTrue(self.stored_exists(again.file_blob))
+
+    def test_release_unlinks_before_the_blob_delete_commits(self):
+        content = self.upload(b'a' * 100)
+        blob = MediaBlob.objects.get()
+        Content.objects.filter(pk=content.pk).update(file_blob=None)
+        delete_stored = dedup.delete_stored
+        depth = len(connection.savepoint_ids)
+        depths = []
+
+        def check_then_delete(stored):
+            # Deleted inside release()'s own transaction, not yet committed
+            self.assertFalse(MediaBlob.objects.filter(pk=blob.pk).exists())
+            depths.append(len(connection.savepoint_ids))
+            delete_stored(stored)
+
+        with mock.patch.object(dedup, 'delete_stored', side_effect=check_then_delete):
+            self.assertTrue(dedup.release(blob.pk))
+        self.assertEqual(depths, [depth + 1])
+        self.assertFalse(self.stored_exists(blob))
+
+    def test_release_keeps_a_blob_still_in_use(self):
+        content = self.upload(b'a' * 100)
+        # Its only reference released, yet a row still points at it
+        with self.assertLogs('apps.content.dedup', 'WARNING'):
+            self.assertFalse(dedup.release(content.file_blob_id))
+        self.assertTrue(MediaBlob.objects.filter(pk=content.file_blob_id).exists())
+
+    def test_upload_after_the_blob_was_deleted_stores_again(self):
+        self.upload(b'a' * 100)
+        with mock.patch.object(dedup, '_reference', return_value=False):
+            content = self.upload(b'a' * 100, title='Again')
+        # The stored copy meets the existing blob on registration
+        self.assertEqual(content.file_blob_id, MediaBlob.objects.get().pk)
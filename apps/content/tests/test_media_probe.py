@@ -0,0 +1,203 @@
+"""
+probe() against small synthetic files: real headers around megabytes of
+filler payload, read from disk (pread) and over HTTP Range requests.
+"""
+import os
+import re
+import shutil
+import struct
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import SimpleTestCase
+
+from apps.content import media_probe
+
+PAYLOAD = 4 * 1024 * 1024
+# Headers only: a handful of blocks whatever the payload size
+MAX_BYTES_READ = 128 * 1024
+
+
+# ── Fixture builders ──────────────────────────
+
+def _box(kind, payload):
+    return struct.pack('>I4s', 8 + len(payload), kind) + payload
+
+
+def _mp4(brand=b'isom', width=1280, height=720, codec=b'avc1', seconds=90):
+    tkhd = bytes(76) + struct.pack('>II', width << 16, height << 16)
+    stsd = struct.pack('>II', 0, 1) + struct.pack('>I4s', 16, codec) + bytes(8)
+    trak = _box(b'trak', _box(b'tkhd', tkhd) + _box(b'mdia', (
+        _box(b'hdlr', bytes(8) + b'vide' + bytes(12))
+        + _box(b'minf', _box(b'stbl', _box(b'stsd', stsd)))
+    )))
+    sound = _box(b'trak', _box(b'mdia', (
+        _box(b'hdlr', bytes(8) + b'soun' + bytes(12))
+        + _box(b'minf', _box(b'stbl', _box(b'stsd', struct.pack('>II', 0, 1) + struct.pack('>I4s', 16, b'mp4a') + bytes(8))))
+    )))
+    mvhd = bytes(12) + struct.pack('>II', 600, seconds * 600) + bytes(80)
+    head = _box(b'ftyp', brand + bytes(4) + brand) if brand != b'qt  ' else _box(b'wide', b'')
+    # The movie box after the payload, as most encoders write it
+    return head + _box(b'mdat', bytes(PAYLOAD)) + _box(b'moov', _box(b'mvhd', mvhd) + sound + trak)
+
+
+MP3_HEADER = b'\xff\xfb\x90\x00'  # MPEG-1 layer III, 128 kbit/s, 44.1 kHz, stereo
+MP3_FRAME = 144 * 128000 // 44100  # 417 bytes
+
+
+def _mp3_frames(count, first=b''):
+    frame = MP3_HEADER + bytes(MP3_FRAME - 4)
+    first = (MP3_HEADER + first + bytes(MP3_FRAME))[:MP3_FRAME]
+    return first + frame * (count - 1)
+
+
+def _id3():
+    body = bytes(100)
+    return b'ID3\x03\x00\x00' + bytes([0, 0, 0, len(body)]) + body
+
+
+def _mp3_cbr(frames):
+    return _id3() + _mp3_frames(frames) + b'TAG' + bytes(125)
+
+
+def _mp3_xing(frames, audio_bytes):
+    # The Xing header follows the 32 bytes of side information
+    xing = bytes(32) + b'Xing' + struct.pack('>III', 3, frames, audio_bytes)
+    return _id3() + _mp3_frames(PAYLOAD // MP3_FRAME, xing)
+
+
+def _mp3_vbri(frames, audio_bytes):
+    vbri = bytes(32) + b'VBRI' + struct.pack('>HHHII', 1, 0, 75, audio_bytes, frames)
+    return _mp3_frames(PAYLOAD // MP3_FRAME, vbri)
+
+
+def _ogg_page(serial, sequence, granule, body, header_type=0):
+    segments = [255] * (len(body) // 255) + [len(body) % 255]
+    return (
+        struct.pack('<4sBBqIII', b'OggS', 0, header_type, granule, serial, sequence, 0)
+        + bytes([len(segments)]) + bytes(segments) + body
+    )
+
+
+def _opus(seconds, pre_skip=312):
+    serial = 0x1234
+    head = b'OpusHead' + struct.pack('<BBHIhB', 1, 2, pre_skip, 48000, 0, 0)
+    pages = [_ogg_page(serial, 0, 0, head, 2), _ogg_page(serial, 1, 0, b'OpusTags' + bytes(8))]
+    body = bytes(255 * 200)
+    for sequence in range(2, PAYLOAD // len(body)):
+        pages.append(_ogg_page(serial, sequence, sequence * 960, body))
+    pages.append(_ogg_page(serial, len(pages), seconds * 48000 + pre_skip, body, 4))
+    return b''.join(pages)
+
+
+def _wav(seconds, sample_rate=44100, channels=2, bits=16):
+    byte_rate = sample_rate * channels * bits // 8
+    fmt = struct.pack('<HHIIHH', 1, channels, sample_rate, byte_rate, channels * bits // 8, bits)
+    data = bytes(seconds * byte_rate)
+    body = b'WAVE' + _box_le(b'fmt ', fmt) + _box_le(b'LIST', bytes(30)) + _box_le(b'data', data)
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+def _box_le(kind, payload):
+    return struct.pack('<4sI', kind, len(payload)) + payload
+
+
+def _flac(total_samples, sample_rate=48000, channels=2, bits=24):
+    fields = sample_rate << 44 | (channels - 1) << 41 | (bits - 1) << 36 | total_samples
+    streaminfo = struct.pack('>HH', 4096, 4096) + bytes(6) + fields.to_bytes(8, 'big') + bytes(16)
+    return b'fLaC' + bytes([0x80]) + len(streaminfo).to_bytes(3, 'big') + streaminfo + bytes(PAYLOAD)
+
+
+FIXTURES = {
+    'video.mp4': (_mp4, {'format': 'mp4', 'codec': 'avc1', 'duration': 90, 'width': 1280, 'height': 720}),
+    'movie.mov': (lambda: _mp4(b'qt  ', 1920, 1080, b'hvc1', 30),
+                  {'format': 'mp4', 'codec': 'hvc1', 'duration': 30, 'width': 1920, 'height': 1080}),
+    'cbr.mp3': (lambda: _mp3_cbr(10000), {
+        'format': 'mp3', 'codec': 'mp3', 'bitrate': 128000,
+        'duration': 10000 * MP3_FRAME * 8 / 128000, 'sample_rate': 44100, 'channels': 2,
+    }),
+    'xing.mp3': (lambda: _mp3_xing(5000, 3_000_000), {
+        'format': 'mp3', 'codec': 'mp3', 'duration': 5000 * 1152 / 44100,
+        'bitrate': int(3_000_000 * 8 / (5000 * 1152 / 44100)),
+    }),
+    'vbri.mp3': (lambda: _mp3_vbri(8000, 2_500_000), {
+        'format': 'mp3', 'codec': 'mp3', 'duration': 8000 * 1152 / 44100,
+        'bitrate': int(2_500_000 * 8 / (8000 * 1152 / 44100)),
+    }),
+    'opus.ogg': (lambda: _opus(240), {'format': 'ogg', 'codec': 'opus', 'duration': 240, 'channels': 2}),
+    'pcm.wav': (lambda: _wav(30), {
+        'format': 'wav', 'codec': 'pcm_16', 'duration': 30, 'bitrate': 44100 * 2 * 16, 'channels': 2,
+    }),
+    'lossless.flac': (lambda: _flac(48000 * 200), {
+        'format': 'flac', 'codec': 'flac', 'duration': 200, 'sample_rate': 48000, 'channels': 2,
+    }),
+}
+
+
+class _RangeHandler(BaseHTTPRequestHandler):
+    """Serves the fixture directory, answering Range requests with 206."""
+
+    def do_GET(self):
+        path = os.path.join(self.server.root, os.path.basename(self.path))
+        with open(path, 'rb') as fh:
+            data = fh.read()
+        start, end = map(int, re.fullmatch(r'bytes=(\d+)-(\d+)', self.headers['Range']).groups())
+        end = min(end, len(data) - 1)
+        self.send_response(206)
+        self.send_header('Content-Range', f'bytes {start}-{end}/{len(data)}')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        self.wfile.write(data[start:end + 1])
+
+    def log_message(self, *args):
+        pass
+
+
+class ProbeTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.mkdtemp()
+        for name, (build, _expected) in FIXTURES.items():
+            with open(os.path.join(cls.root, name), 'wb') as fh:
+                fh.write(build())
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _RangeHandler)
+        cls.server.root = cls.root
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.root)
+        super().tearDownClass()
+
+    def assertProbed(self, info, expected, size):
+        for key, value in expected.items():
+            if key == 'duration':
+                self.assertAlmostEqual(info[key], value, places=2)
+            else:
+                self.assertEqual(info[key], value, key)
+        self.assertGreater(size, PAYLOAD // 2)
+        self.assertLessEqual(info['bytes_read'], MAX_BYTES_READ)
+
+    def test_local_files(self):
+        for name, (_build, expected) in FIXTURES.items():
+            path = os.path.join(self.root, name)
+            with self.subTest(name):
+                self.assertProbed(media_probe.probe(path), expected, os.path.getsize(path))
+
+    def test_http_range_requests(self):
+        port = self.server.server_address[1]
+        for name, (_build, expected) in FIXTURES.items():
+            with self.subTest(name):
+                info = media_probe.probe(f'http://127.0.0.1:{port}/{name}')
+                self.assertProbed(info, expected, os.path.getsize(os.path.join(self.root, name)))
+
+    def test_unknown_format(self):
+        path = os.path.join(self.root, 'notes.txt')
+        with open(path, 'wb') as fh:
+            fh.write(b'just some text' * 100)
+        with self.assertRaises(media_probe.ProbeError):
+            media_probe.probe(path)
@@ -0,0 +1,35 @@
+import os
+import shutil
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from streamify_project.media_server import serve_media
+
+
+class ServeMediaRootTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        with open(os.path.join(self.root, 'clip.mp4'), 'wb') as fh:
+            fh.write(b'x' * 10)
+        self.request = RequestFactory().get('/media/clip.mp4')
+
+    def test_serves_from_media_root(self):
+        with override_settings(MEDIA_ROOT=self.root):
+            response = serve_media(self.request, 'clip.mp4')
+        self.assertEqual((response.status_code, response['Content-Length']), (200, '10'))
+        response.close()
+
+    def test_never_falls_back_to_the_working_directory(self):
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        self.addCleanup(os.chdir, cwd)
+        with override_settings(MEDIA_ROOT=''), self.assertRaises(ImproperlyConfigured):
+            serve_media(self.request, 'clip.mp4')
+
+    def test_paths_outside_the_root(self):
+        with override_settings(MEDIA_ROOT=os.path.join(self.root, 'media')), self.assertRaises(Http404):
+            serve_media(self.request, '../clip.mp4')
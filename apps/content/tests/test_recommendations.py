@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from apps.content import recommendations
+from apps.content.models import Content, Like, UserRecommendation
+
+
+class RecommendationRefreshTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        settings_override = override_settings(RECOMMENDER_MODEL_PATH=os.path.join(tmp, 'model.npz'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        User = get_user_model()
+        creator = User.objects.create_user('creator@example.com', 'Creator')
+        self.items = [
+            Content.objects.create(title=f'Track {i}', content_type='music', file_path=f'local:{i}.mp3',
+                                   uploaded_by=creator, is_published=True)
+            for i in range(8)
+        ]
+        self.users = [User.objects.create_user(f'user{i}@example.com', f'User {i}') for i in range(4)]
+        for i, user in enumerate(self.users):
+            for item in self.items[i:i + 3]:
+                Like.objects.create(user=user, content=item)
+
+    def test_refresh_resumes_from_the_stored_watermark(self):
+        self.assertEqual(recommendations.train(factors=2)['users'], 4)
+        trained = dict(UserRecommendation.objects.values_list('user_id', 'generated_at'))
+
+        # A new process: nothing carried over in its cache
+        cache.clear()
+        self.assertEqual(recommendations.refresh()['users'], 0)
+
+        Like.objects.create(user=self.users[0], content=self.items[7])
+        self.assertEqual(recommendations.refresh()['users'], 1)
+        refreshed = dict(UserRecommendation.objects.values_list('user_id', 'generated_at'))
+        self.assertGreater(refreshed[self.users[0].pk], trained[self.users[0].pk])
+        self.assertEqual(refreshed[self.users[1].pk], trained[self.users[1].pk])
+
+        cache.clear()
+        self.assertEqual(recommendations.refresh()['users'], 0)
+
+    def test_serving_reads_the_stored_row_without_a_shared_cache(self):
+        recommendations.train(factors=2)
+        user = self.users[0]
+        UserRecommendation.objects.filter(user=user).update(content_ids=[self.items[6].pk])
+        # Another process cached an older list; this worker must not serve it
+        cache.set(recommendations.CACHE_KEY.format(user.pk), [self.items[5].pk])
+        self.assertEqual(recommendations.recommendations_for(user), [self.items[6]])
+
+    @override_settings(RECOMMENDATION_CACHE_TIMEOUT=60)
+    def test_serving_from_a_shared_cache(self):
+        recommendations.train(factors=2)
+        user = self.users[0]
+        ids = UserRecommendation.objects.get(user=user).content_ids
+        self.assertEqual(cache.get(recommendations.CACHE_KEY.format(user.pk)), ids)
+        with mock.patch.object(UserRecommendation.objects, 'filter') as lookup:
+            recommendations.recommendations_for(user)
+        lookup.assert_not_called()
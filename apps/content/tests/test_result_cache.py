@@ -0,0 +1,115 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from apps.content import result_cache
+from apps.content.models import Content, Genre
+
+
+@override_settings(RESULT_CACHE_TIMEOUT=60)
+class VersionInvalidationTests(TestCase):
+    NAMES = ('global', 'all', 'type:music', 'type:video', 'genre:jazz', 'genre:rock')
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('creator@example.com', 'Creator', role='creator')
+        self.jazz = Genre.objects.create(name='Jazz', slug='jazz')
+        self.rock = Genre.objects.create(name='Rock', slug='rock')
+        self.content = self.create()
+        self.content.genre.set([self.jazz])
+
+    def create(self, **fields):
+        fields = {'title': 'Track', 'content_type': 'music', 'file_path': 'local:x.mp3', 'is_published': True, **fields}
+        return Content.objects.create(uploaded_by=self.user, **fields)
+
+    def bumped(self, change):
+        """The version names ``change()`` bumps once its transaction commits."""
+        before = dict(zip(self.NAMES, result_cache._versions(self.NAMES[1:])))
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        after = dict(zip(self.NAMES, result_cache._versions(self.NAMES[1:])))
+        return {name for name in self.NAMES if after[name] != before[name]}
+
+    def test_pages_are_recomputed_after_a_bump(self):
+        compute = mock.Mock(side_effect=[1, 2])
+        for _ in range(2):
+            self.assertEqual(result_cache.cached('browse', {'page': 1}, compute, depends_on=['type:music']), 1)
+        self.assertEqual(compute.call_count, 1)
+
+        result_cache.bump('type:video')
+        self.assertEqual(result_cache.cached('browse', {'page': 1}, compute, depends_on=['type:music']), 1)
+        result_cache.bump('type:music')
+        self.assertEqual(result_cache.cached('browse', {'page': 1}, compute, depends_on=['type:music']), 2)
+
+    def test_content_saves(self):
+        content = self.content
+        content.title = 'Renamed'
+        self.assertEqual(self.bumped(content.save), {'all', 'type:music', 'genre:jazz'})
+        content.content_type = 'video'
+        self.assertEqual(self.bumped(content.save), {'all', 'type:music', 'type:video', 'genre:jazz'})
+        # Counters that no listing shows
+        self.assertEqual(self.bumped(lambda: content.save(update_fields=['like_count'])), set())
+
+    def test_publish_toggles_and_drafts(self):
+        content = self.content
+        content.is_published = False
+        self.assertEqual(self.bumped(content.save), {'all', 'type:music', 'genre:jazz'})
+        content.title = 'Still a draft'
+        self.assertEqual(self.bumped(content.save), set())
+        self.assertEqual(self.bumped(lambda: self.create(is_published=False)), set())
+
+    def test_deletes(self):
+        self.assertEqual(self.bumped(self.content.delete), {'all', 'type:music', 'genre:jazz'})
+        draft = self.create(is_published=False)
+        self.assertEqual(self.bumped(draft.delete), set())
+
+    def test_genre_membership_from_either_side(self):
+        self.assertEqual(self.bumped(lambda: self.content.genre.add(self.rock)), {'all', 'type:music', 'genre:rock'})
+        self.assertEqual(
+            self.bumped(lambda: self.jazz.content.remove(self.content)), {'all', 'type:music', 'genre:jazz'},
+        )
+        self.assertEqual(self.bumped(self.content.genre.clear), {'all', 'type:music', 'genre:rock'})
+
+    def test_genre_edits_bump_every_page(self):
+        self.jazz.name = 'Jazz & Blues'
+        self.assertEqual(self.bumped(self.jazz.save), {'global'})
+
+
+@override_settings(RESULT_CACHE_TIMEOUT=60)
+class SingleFlightTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        result_cache._state.update(pid=None)
+
+    def test_waits_for_the_worker_computing_the_page(self):
+        key = result_cache.page_key('search', {'q': 'hits'}, ['all'])
+        cache.add(result_cache.LOCK_KEY.format(key), 'other worker')
+        timer = threading.Timer(0.1, cache.set, (key, 'computed elsewhere'))
+        timer.start()
+        self.addCleanup(timer.cancel)
+        compute = mock.Mock()
+        self.assertEqual(result_cache.cached('search', {'q': 'hits'}, compute), 'computed elsewhere')
+        compute.assert_not_called()
+
+    def test_computes_when_the_other_worker_fails(self):
+        key = result_cache.page_key('search', {'q': 'hits'}, ['all'])
+        lock = result_cache.LOCK_KEY.format(key)
+        cache.add(lock, 'other worker')
+        timer = threading.Timer(0.1, cache.delete, (lock,))
+        timer.start()
+        self.addCleanup(timer.cancel)
+        self.assertEqual(result_cache.cached('search', {'q': 'hits'}, lambda: 'mine'), 'mine')
+        self.assertIsNone(cache.get(lock))
+
+    @mock.patch.object(result_cache, 'STATS_FLUSH_INTERVAL', 0)
+    def test_stats(self):
+        compute = mock.Mock(return_value='page')
+        for _ in range(3):
+            result_cache.cached('api', {'page': 1}, compute)
+        result_cache.cached('browse', {'page': 1}, compute)
+        stats = result_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 2))
+        self.assertEqual(stats['scopes']['api']['hit_rate'], 2 / 3)
@@ -0,0 +1,61 @@
+import math
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.content import trending
+from apps.content.models import Content, Genre, TrendingScore
+
+
+def _strict_exp(x):
+    """exp() as PostgreSQL computes it: underflow is an error, not 0."""
+    if x is None:
+        return None
+    if x < -708.4:
+        raise ValueError('value out of range: underflow')
+    return math.exp(x)
+
+
+class TrendingScoreTests(TestCase):
+    def setUp(self):
+        if connection.vendor == 'sqlite':
+            connection.ensure_connection()
+            connection.connection.create_function('EXP', 1, _strict_exp)
+        self.user = get_user_model().objects.create_user('creator@example.com', 'Creator')
+        self.genre = Genre.objects.create(name='Jazz', slug='jazz')
+        self.content = Content.objects.create(
+            title='Track', content_type='music', file_path='local:track.mp3',
+            uploaded_by=self.user, is_published=True,
+        )
+        self.content.genre.add(self.genre)
+
+    def score(self):
+        return Content.objects.values_list('trending_score', flat=True).get(pk=self.content.pk)
+
+    def test_first_event_on_empty_score(self):
+        self.assertEqual(self.score(), 0)
+        now = timezone.now()
+        trending.record(self.content.pk, trending.LIKE_WEIGHT, now)
+        # exp(0 - log_w) is far below what exp() can return: the update must
+        # not underflow, and the score becomes the event's own value
+        self.assertAlmostEqual(self.score(), trending.log_weight(trending.LIKE_WEIGHT, now), places=6)
+        self.assertAlmostEqual(trending.current_score(self.score(), now), trending.LIKE_WEIGHT, places=6)
+
+    @override_settings(TRENDING_HALF_LIFE_HOURS=1)
+    def test_short_half_life_on_empty_score(self):
+        now = timezone.now()
+        trending.record(self.content.pk, trending.VIEW_WEIGHT, now)
+        self.assertAlmostEqual(self.score(), trending.log_weight(trending.VIEW_WEIGHT, now), places=6)
+        scope = TrendingScore.objects.get(scope=TrendingScore.SCOPE_GENRE, key=str(self.genre.pk))
+        self.assertAlmostEqual(scope.score, self.score(), places=6)
+
+    def test_events_add_up_with_decay(self):
+        now = timezone.now()
+        trending.record(self.content.pk, trending.LIKE_WEIGHT, now - timedelta(hours=24))
+        trending.record(self.content.pk, trending.COMMENT_WEIGHT, now)
+        # The day-old like counts half
+        expected = trending.LIKE_WEIGHT / 2 + trending.COMMENT_WEIGHT
+        self.assertTrue(math.isclose(trending.current_score(self.score(), now), expected, rel_tol=1e-9))
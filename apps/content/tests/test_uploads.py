@@ -0,0 +1,165 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.content import fields, uploads
+from apps.content.models import Content, Genre, MediaBlob, UploadSession
+
+CHUNK = 1024
+
+
+class FinalizeTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        settings_override = override_settings(
+            MEDIA_STORAGE_BACKEND='local', MEDIA_PROCESSING_BACKEND='worker',
+            LOCAL_MEDIA_ROOT=os.path.join(self.tmp, 'media'), UPLOAD_TMP_DIR=os.path.join(self.tmp, 'uploads'),
+            UPLOAD_CHUNK_SIZE=CHUNK,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = get_user_model().objects.create_user('creator@example.com', 'Creator', role='creator')
+        self.genre = Genre.objects.create(name='Jazz', slug='jazz')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.data = os.urandom(CHUNK * 2 + 100)
+
+    def start(self, checksum=None):
+        response = self.client.post('/api/v1/content/uploads/', {
+            'filename': 'track.mp3', 'size': len(self.data), 'title': 'Track', 'content_type': 'music',
+            'genre': [self.genre.pk],
+            'checksum': hashlib.sha256(self.data).hexdigest() if checksum is None else checksum,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+    def put_chunk(self, session_id, index):
+        body = self.data[index * CHUNK:(index + 1) * CHUNK]
+        response = self.client.generic(
+            'PUT', f'/api/v1/content/uploads/{session_id}/chunks/{index * CHUNK}/', body,
+            content_type='application/octet-stream', HTTP_X_CHUNK_SHA256=hashlib.sha256(body).hexdigest(),
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def finalize(self, session_id):
+        return self.client.post(f'/api/v1/content/uploads/{session_id}/finalize/')
+
+    def test_finalize_creates_content(self):
+        session_id = self.start()
+        for index in (2, 0, 1):
+            self.put_chunk(session_id, index)
+        response = self.finalize(session_id)
+        self.assertEqual(response.status_code, 201, response.content)
+
+        content = Content.objects.get()
+        self.assertEqual(content.title, 'Track')
+        self.assertEqual(list(content.genre.all()), [self.genre])
+        with content.file_path.open() as stored:
+            self.assertEqual(stored.read(), self.data)
+        self.assertEqual(MediaBlob.objects.get().sha256, hashlib.sha256(self.data).hexdigest())
+        session = UploadSession.objects.get()
+        self.assertEqual((session.status, session.content), ('complete', content))
+        self.assertFalse(os.path.exists(uploads._session_dir(session_id)))
+
+    def test_refinalize_returns_the_same_content(self):
+        session_id = self.start()
+        for index in range(3):
+            self.put_chunk(session_id, index)
+        first = self.finalize(session_id)
+        second = self.finalize(session_id)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(first.json()['id'], second.json()['id'])
+        self.assertEqual(Content.objects.count(), 1)
+        self.assertEqual(MediaBlob.objects.get().ref_count, 1)
+
+    def test_missing_chunks(self):
+        session_id = self.start()
+        self.put_chunk(session_id, 0)
+        self.put_chunk(session_id, 2)
+        response = self.finalize(session_id)
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Content.objects.exists())
+        self.assertEqual(UploadSession.objects.get().status, 'active')
+        missing = self.client.get(f'/api/v1/content/uploads/{session_id}/').json()['missing']
+        self.assertEqual(missing, [[CHUNK, 2 * CHUNK]])
+
+    def test_checksum_mismatch(self):
+        session_id = self.start(checksum='0' * 64)
+        for index in range(3):
+            self.put_chunk(session_id, index)
+        response = self.finalize(session_id)
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(Content.objects.exists())
+        self.assertFalse(MediaBlob.objects.exists())
+        # Released for the client to re-send chunks and finalize again
+        self.assertEqual(UploadSession.objects.get().status, 'active')
+        self.put_chunk(session_id, 0)
+
+    def test_finalize_in_progress(self):
+        session_id = self.start()
+        for index in range(3):
+            self.put_chunk(session_id, index)
+        UploadSession.objects.filter(pk=session_id).update(status='finalizing')
+        self.assertEqual(self.finalize(session_id).status_code, 409)
+        self.assertEqual(self.client.delete(f'/api/v1/content/uploads/{session_id}/').status_code, 409)
+
+    def test_failed_save_releases_the_stored_file(self):
+        session_id = self.start()
+        for index in range(3):
+            self.put_chunk(session_id, index)
+        with mock.patch.object(uploads.media_jobs, 'enqueue', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                uploads.finalize(UploadSession.objects.get())
+        self.assertFalse(Content.objects.exists())
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertEqual(UploadSession.objects.get().status, 'active')
+        self.assertEqual(self.finalize(session_id).status_code, 201)
+
+    @override_settings(MEDIA_STORAGE_BACKEND='cloudinary')
+    def test_large_cloudinary_upload_is_chunked(self):
+        session_id = self.start()
+        for index in range(3):
+            self.put_chunk(session_id, index)
+        received = []
+
+        def upload_large(file, chunk_size, **options):
+            with file:
+                for block in iter(lambda: file.read(chunk_size), b''):
+                    received.append(len(block))
+            return {'public_id': 'track', 'version': 1, 'format': 'mp3', 'type': 'upload', 'resource_type': 'video'}
+
+        with mock.patch.object(fields, 'CLOUDINARY_CHUNK_SIZE', 1000), \
+                mock.patch.object(fields.uploader, 'upload_large', side_effect=upload_large):
+            self.assertEqual(self.finalize(session_id).status_code, 201)
+        self.assertEqual(received, [1000, 1000, 148])
+        self.assertEqual(Content.objects.get().file_path.public_id, 'track')
+
+
+class ChunkReaderTests(TestCase):
+    def test_reads_and_seeks_across_parts(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        data = os.urandom(5000)
+        paths = []
+        for index, start in enumerate(range(0, len(data), 2048)):
+            paths.append(os.path.join(tmp, f'{index}.part'))
+            with open(paths[-1], 'wb') as part:
+                part.write(data[start:start + 2048])
+
+        reader = uploads.ChunkReader(paths)
+        self.assertEqual(reader.read(3000), data[:3000])
+        self.assertEqual(reader.tell(), 3000)
+        self.assertEqual(reader.seek(0, os.SEEK_END), len(data))
+        self.assertEqual(reader.read(), b'')
+        reader.seek(2000)
+        self.assertEqual(reader.read(100), data[2000:2100])
+        reader.seek(0)
+        self.assertEqual(reader.read(), data)
+        reader.close()
@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.content import view_buffer
+from apps.content.models import Content, ContentView
+
+
+class _Failure(Exception):
+    pass
+
+
+def _event(content_id):
+    return view_buffer.ViewEvent(content_id, None, '127.0.0.1', timezone.now())
+
+
+class BufferRetryTests(TestCase):
+    def buffers(self):
+        cache.clear()
+        yield view_buffer.MemoryViewBuffer(max_events=10, max_attempts=3)
+        yield view_buffer.CacheViewBuffer(prefix='test_views', max_events=10, max_attempts=3)
+
+    def drain(self, buffer, fail=False):
+        try:
+            with buffer.draining(4) as events:
+                if fail:
+                    raise _Failure
+                return [event.content_id for event in events]
+        except _Failure:
+            return None
+
+    def test_failed_batch_is_retried_then_dropped(self):
+        for buffer in self.buffers():
+            with self.subTest(type(buffer).__name__):
+                for content_id in range(6):
+                    buffer.push(_event(content_id))
+                self.assertIsNone(self.drain(buffer, fail=True))
+                self.assertIsNone(self.drain(buffer, fail=True))
+                self.assertEqual(buffer.pending(), 6)
+                with self.assertLogs('apps.content.view_buffer', 'ERROR'):
+                    self.assertIsNone(self.drain(buffer, fail=True))
+                # The poison batch is gone; the events behind it flush
+                self.assertEqual(buffer.pending(), 2)
+                self.assertEqual(self.drain(buffer), [4, 5])
+
+    def test_attempts_reset_after_a_successful_write(self):
+        for buffer in self.buffers():
+            with self.subTest(type(buffer).__name__):
+                for content_id in range(8):
+                    buffer.push(_event(content_id))
+                self.drain(buffer, fail=True)
+                self.drain(buffer, fail=True)
+                self.assertEqual(self.drain(buffer), [0, 1, 2, 3])
+                self.drain(buffer, fail=True)
+                self.drain(buffer, fail=True)
+                self.assertEqual(self.drain(buffer), [4, 5, 6, 7])
+
+    def test_buffer_is_capped(self):
+        for buffer in self.buffers():
+            with self.subTest(type(buffer).__name__):
+                with self.assertLogs('apps.content.view_buffer', 'WARNING'):
+                    for content_id in range(15):
+                        buffer.push(_event(content_id))
+                self.assertEqual(buffer.pending(), 10)
+                self.assertEqual(self.drain(buffer), [0, 1, 2, 3])
+
+
+class WriteViewsTests(TestCase):
+    def test_views_of_deleted_content_are_skipped(self):
+        user = get_user_model().objects.create_user('creator@example.com', 'Creator')
+        content = Content.objects.create(
+            title='Track', content_type='music', file_path='local:track.mp3', uploaded_by=user, is_published=True,
+        )
+        written = view_buffer.write_views([_event(content.pk), _event(content.pk), _event(content.pk + 1)])
+        self.assertEqual(written, 2)
+        self.assertEqual(ContentView.objects.count(), 2)
+        content.refresh_from_db()
+        self.assertEqual(content.view_count, 2)
+        self.assertGreater(content.trending_score, 0)
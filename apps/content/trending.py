@@ -0,0 +1,147 @@
+"""
+Time-decayed trending scores.
+
+Each engagement adds ``weight * 2 ** -(age / half_life)`` to a score. Instead
+of decaying every row on a timer, scores use forward decay: an event at time
+t is stored as ``weight * exp(rate * (t - EPOCH))`` so older rows never need
+rewriting and sorting by the stored value equals sorting by the decayed one.
+Values are kept as logarithms (a log-sum-exp update in SQL) so they stay
+small for centuries. Content rows carry their own score; per content type
+and per genre scores live in TrendingScore.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, Value, When
+from django.db.models.functions import Abs, Exp, Greatest, Ln, TruncHour
+from django.utils import timezone
+
+from .models import Comment, Content, ContentView, Genre, Like, TrendingScore
+
+EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+DEFAULT_HALF_LIFE_HOURS = 24
+
+# exp() below this underflows: PostgreSQL raises instead of returning 0
+MIN_EXPONENT = -700.0
+
+VIEW_WEIGHT = 1.0
+LIKE_WEIGHT = 5.0
+COMMENT_WEIGHT = 3.0
+
+
+def decay_rate():
+    hours = getattr(settings, 'TRENDING_HALF_LIFE_HOURS', DEFAULT_HALF_LIFE_HOURS)
+    return math.log(2) / (hours * 3600)
+
+
+def log_weight(weight, at=None):
+    """Stored (log, forward-decayed) value of one event of ``weight`` at ``at``."""
+    at = at or timezone.now()
+    return math.log(weight) + decay_rate() * (at - EPOCH).total_seconds()
+
+
+def combine(log_weights):
+    """log(sum(exp(x))) without overflow."""
+    log_weights = list(log_weights)
+    top = max(log_weights)
+    return top + math.log(sum(math.exp(x - top) for x in log_weights))
+
+
+def current_score(stored, now=None):
+    """Decayed score as of ``now`` (for display; ordering can use the stored value)."""
+    now = now or timezone.now()
+    return math.exp(stored - decay_rate() * (now - EPOCH).total_seconds()) if stored else 0.0
+
+
+def increment(log_w, field='trending_score'):
+    """SQL expression adding an event to a stored score: logaddexp(field, log_w)."""
+    log_w = Value(float(log_w))
+    # Clamped: a score far below log_w (an empty 0 score, say) adds ~nothing
+    exponent = Greatest(-Abs(F(field) - log_w), Value(MIN_EXPONENT))
+    return Greatest(F(field), log_w) + Ln(Value(1.0) + Exp(exponent))
+
+
+def bump_scopes(content_log_weights):
+    """Add per-content engagement to the content type and genre scores."""
+    if not content_log_weights:
+        return
+    ids = list(content_log_weights)
+    scopes = defaultdict(list)
+    for content_id, content_type in Content.objects.filter(pk__in=ids).values_list('pk', 'content_type'):
+        scopes[(TrendingScore.SCOPE_TYPE, content_type)].append(content_log_weights[content_id])
+    for content_id, genre_id in Content.genre.through.objects.filter(content_id__in=ids).values_list('content_id', 'genre_id'):
+        scopes[(TrendingScore.SCOPE_GENRE, str(genre_id))].append(content_log_weights[content_id])
+
+    TrendingScore.objects.bulk_create(
+        [TrendingScore(scope=scope, key=key) for scope, key in scopes], ignore_conflicts=True
+    )
+    # Fixed lock order so concurrent writers cannot deadlock
+    for scope, key in sorted(scopes):
+        TrendingScore.objects.filter(scope=scope, key=key).update(
+            score=increment(combine(scopes[(scope, key)]), 'score'), updated_at=timezone.now()
+        )
+
+
+def record(content_id, weight, at=None):
+    """Count one engagement (like, comment, ...) towards every score it affects."""
+    log_w = log_weight(weight, at)
+    with transaction.atomic():
+        Content.objects.filter(pk=content_id).update(trending_score=increment(log_w))
+        bump_scopes({content_id: log_w})
+
+
+def trending_content(content_type=None, genre_slug=None):
+    qs = Content.objects.filter(is_published=True)
+    if content_type:
+        qs = qs.filter(content_type=content_type)
+    if genre_slug:
+        qs = qs.filter(genre__slug=genre_slug)
+    return qs.order_by('-trending_score', '-id')
+
+
+def trending_genres(limit=10):
+    """Genres ordered by trending score, padded with the rest alphabetically."""
+    ids = [
+        int(key) for key in TrendingScore.objects.filter(scope=TrendingScore.SCOPE_GENRE)
+        .order_by('-score').values_list('key', flat=True)[:limit]
+    ]
+    by_id = Genre.objects.in_bulk(ids)
+    genres = [by_id[pk] for pk in ids if pk in by_id]
+    if len(genres) < limit:
+        genres.extend(Genre.objects.exclude(pk__in=ids).order_by('name')[:limit - len(genres)])
+    return genres
+
+
+def rebuild(window_days=14):
+    """
+    Recompute every score from stored history (first deploy or after changing
+    TRENDING_HALF_LIFE_HOURS). Views are bucketed by hour. Returns rows scored.
+    """
+    since = timezone.now() - timedelta(days=window_days)
+    events = defaultdict(list)
+    views = (
+        ContentView.objects.filter(watched_at__gte=since).order_by()
+        .annotate(hour=TruncHour('watched_at')).values('content_id', 'hour')
+        .annotate(n=Count('id')).values_list('content_id', 'hour', 'n')
+    )
+    for content_id, hour, n in views.iterator():
+        events[content_id].append(log_weight(VIEW_WEIGHT * n, hour))
+    for model, weight in ((Like, LIKE_WEIGHT), (Comment, COMMENT_WEIGHT)):
+        for content_id, created_at in model.objects.filter(created_at__gte=since).values_list('content_id', 'created_at').iterator():
+            events[content_id].append(log_weight(weight, created_at))
+
+    scores = {content_id: combine(values) for content_id, values in events.items()}
+    with transaction.atomic():
+        Content.objects.exclude(trending_score=0).update(trending_score=0)
+        TrendingScore.objects.all().delete()
+        ids = sorted(scores)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            Content.objects.filter(pk__in=chunk).update(trending_score=Case(
+                *[When(pk=pk, then=Value(scores[pk])) for pk in chunk]
+            ))
+        bump_scopes(scores)
+    return len(scores)
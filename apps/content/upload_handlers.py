@@ -0,0 +1,38 @@
+"""
+Upload handlers that hash files while the request body is received.
+
+They behave like Django's default handlers and attach the hex SHA-256 of
+each file as ``uploaded_file.sha256``, so de-duplication (dedup.py) needs
+no second pass over the bytes. Both are listed in FILE_UPLOAD_HANDLERS: a
+file too large for memory passes through the memory handler to the
+temporary-file one, and either way the handler that builds the file has
+seen every chunk.
+"""
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+class HashingMixin:
+    def new_file(self, *args, **kwargs):
+        # Before super(): the memory handler ends new_file with StopFutureHandlers
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        if uploaded is not None:
+            uploaded.sha256 = self.sha256.hexdigest()
+        return uploaded
+
+
+class HashingMemoryFileUploadHandler(HashingMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingMixin, TemporaryFileUploadHandler):
+    pass
@@ -0,0 +1,292 @@
+"""
+Resumable chunked uploads.
+
+A client opens an UploadSession with the file's size and the Content fields
+it wants, PUTs the file in fixed-size chunks at their byte offsets (in any
+order, retrying or resuming as needed) and finalizes. Each chunk is streamed
+to its own part file while its SHA-256 is checked, so a worker never holds
+more than one read block of it in memory. Finalize hashes the parts, streams
+them in order into the configured media backend (unless the same bytes are
+already stored, see dedup.py; Cloudinary receives large files in chunks)
+and then creates the Content row in a short transaction.
+"""
+import bisect
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.utils import timezone
+
+from . import dedup, media_jobs
+from .models import Content, UploadChunk, UploadSession
+
+READ_BLOCK = 64 * 1024
+
+
+class UploadError(Exception):
+    """A request the session cannot accept; ``status`` is the HTTP code to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _session_dir(session_id):
+    return Path(settings.UPLOAD_TMP_DIR) / str(session_id)
+
+
+def _part_path(session_id, index):
+    return _session_dir(session_id) / f'{index:08d}.part'
+
+
+def _ttl():
+    return timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+
+
+def start_session(user, filename, total_size, metadata, mime_type='', checksum=''):
+    if total_size <= 0:
+        raise UploadError('The file is empty.')
+    if total_size > settings.UPLOAD_MAX_SIZE:
+        raise UploadError(f'Files are limited to {settings.UPLOAD_MAX_SIZE} bytes.', status=413)
+    session = UploadSession.objects.create(
+        user=user,
+        filename=os.path.basename(filename)[:255],
+        mime_type=mime_type,
+        total_size=total_size,
+        chunk_size=settings.UPLOAD_CHUNK_SIZE,
+        checksum=checksum.lower(),
+        metadata=metadata,
+        expires_at=timezone.now() + _ttl(),
+    )
+    _session_dir(session.pk).mkdir(parents=True, exist_ok=True)
+    return session
+
+
+def expected_size(session, index):
+    return min(session.chunk_size, session.total_size - index * session.chunk_size)
+
+
+def write_chunk(session, offset, stream, length, checksum):
+    """
+    Store the chunk starting at byte ``offset``, read from ``stream``.
+
+    ``length`` is the request's Content-Length and ``checksum`` the hex
+    SHA-256 the client computed. Re-sending a stored chunk replaces it.
+    """
+    if session.status != 'active':
+        raise UploadError('This upload has already been finalized.', status=409)
+    if session.expires_at <= timezone.now():
+        raise UploadError('This upload has expired.', status=410)
+    if offset % session.chunk_size or offset >= session.total_size:
+        raise UploadError(f'Chunks start at multiples of {session.chunk_size} below {session.total_size}.')
+    index = offset // session.chunk_size
+    size = expected_size(session, index)
+    if length != size:
+        raise UploadError(f'The chunk at offset {offset} must be {size} bytes.')
+    if not checksum:
+        raise UploadError('A SHA-256 checksum of the chunk is required.')
+
+    part = _part_path(session.pk, index)
+    part.parent.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    received = 0
+    fd, tmp_path = tempfile.mkstemp(dir=part.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while received < size:
+                block = stream.read(min(READ_BLOCK, size - received))
+                if not block:
+                    break
+                digest.update(block)
+                out.write(block)
+                received += len(block)
+        if received != size:
+            raise UploadError(f'Expected {size} bytes, received {received}.')
+        if digest.hexdigest() != checksum.lower():
+            raise UploadError('Chunk checksum mismatch.', status=422)
+        # Parts are replaced atomically, so a concurrent retry never reads half a chunk
+        os.replace(tmp_path, part)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+    UploadChunk.objects.update_or_create(
+        session=session, index=index, defaults={'size': size, 'checksum': digest.hexdigest()},
+    )
+    UploadSession.objects.filter(pk=session.pk).update(expires_at=timezone.now() + _ttl())
+    return index
+
+
+def missing_ranges(session):
+    """Return the byte ranges [start, end) that still have to be sent."""
+    received = set(session.chunks.values_list('index', flat=True))
+    ranges = []
+    for index in range(session.chunk_count):
+        if index in received:
+            continue
+        start = index * session.chunk_size
+        end = start + expected_size(session, index)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return ranges
+
+
+class ChunkReader:
+    """Read-only, seekable file object over a session's part files, in offset order."""
+    closed = False
+
+    def __init__(self, paths):
+        self._paths = list(paths)
+        self._starts = [0]
+        for path in self._paths:
+            self._starts.append(self._starts[-1] + os.path.getsize(path))
+        self.size = self._starts[-1]
+        self._offset = 0
+        self._part = None
+        self._current = None
+
+    def _open(self):
+        """Open the part holding ``_offset``, positioned at it."""
+        part = bisect.bisect_right(self._starts, self._offset) - 1
+        if part >= len(self._paths):
+            return None
+        if part != self._part:
+            self.close()
+            self._current = open(self._paths[part], 'rb')
+            self._part = part
+        self._current.seek(self._offset - self._starts[part])
+        return self._current
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size
+        pieces = []
+        wanted = min(size, self.size - self._offset)
+        while wanted > 0:
+            block = self._open().read(min(wanted, READ_BLOCK))
+            pieces.append(block)
+            self._offset += len(block)
+            wanted -= len(block)
+        return b''.join(pieces)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self._offset
+        elif whence == os.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise OSError('Negative seek position.')
+        self._offset = offset
+        return offset
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._offset
+
+    def close(self):
+        if self._current:
+            self._current.close()
+        self._current = None
+        self._part = None
+
+
+def _file_digest(paths):
+    digest = hashlib.sha256()
+    reader = ChunkReader(paths)
+    try:
+        for block in iter(lambda: reader.read(READ_BLOCK), b''):
+            digest.update(block)
+    finally:
+        reader.close()
+    return digest.hexdigest()
+
+
+def _claim(session):
+    """Lock the session for finalizing, unless it is already complete; returns it."""
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if session.status == 'complete':
+            return session
+        if session.status == 'finalizing' and session.expires_at > timezone.now():
+            raise UploadError('This upload is already being finalized.', status=409)
+        if missing_ranges(session):
+            raise UploadError('Some chunks have not been received yet.', status=409)
+        # The claim lapses with the session, should this worker die mid-transfer
+        session.status = 'finalizing'
+        session.expires_at = timezone.now() + _ttl()
+        session.save(update_fields=['status', 'expires_at'])
+    return session
+
+
+def finalize(session):
+    """Assemble the chunks into a new Content row and return it (idempotent)."""
+    session = _claim(session)
+    if session.status == 'complete':
+        return session.content
+    try:
+        content = _store(session)
+    except Exception:
+        UploadSession.objects.filter(pk=session.pk, status='finalizing').update(status='active')
+        raise
+    discard_parts(session.pk)
+    return content
+
+
+def _store(session):
+    paths = [_part_path(session.pk, index) for index in range(session.chunk_count)]
+    # Hashed from the local parts before anything is uploaded, so a file
+    # the library already has is referenced rather than stored again
+    digest = _file_digest(paths)
+    if session.checksum and digest != session.checksum:
+        raise UploadError('File checksum mismatch; re-send the chunks.', status=422)
+
+    metadata = dict(session.metadata)
+    genre_ids = metadata.pop('genre', [])
+    upload = UploadedFile(
+        file=ChunkReader(paths), name=session.filename,
+        content_type=session.mime_type or None, size=session.total_size,
+    )
+    upload.sha256 = digest
+    content = Content(uploaded_by=session.user, file_path=upload, **metadata)
+    field = Content._meta.get_field('file_path')
+    try:
+        # Stored outside any transaction: the transfer streams the parts a
+        # block at a time and may take minutes, so no lock is held meanwhile
+        field.pre_save(content, add=True)
+    finally:
+        upload.close()
+
+    try:
+        with transaction.atomic():
+            content.save()
+            content.genre.set(genre_ids)
+            media_jobs.enqueue(content)
+            UploadSession.objects.filter(pk=session.pk).update(status='complete', content=content)
+    except Exception:
+        if content.file_blob_id:
+            dedup.release(content.file_blob_id)
+        raise
+    return content
+
+
+def discard_parts(session_id):
+    shutil.rmtree(_session_dir(session_id), ignore_errors=True)
+
+
+def purge_expired_sessions(now=None):
+    """Delete expired sessions and their part files. Returns the number removed."""
+    expired = list(UploadSession.objects.filter(expires_at__lte=now or timezone.now()).values_list('pk', flat=True))
+    for session_id in expired:
+        discard_parts(session_id)
+    UploadSession.objects.filter(pk__in=expired).delete()
+    return len(expired)
@@ -12,6 +12,8 @@ urlpatterns = [
     path('content/<int:pk>/delete/', views.delete_content_view, name='delete'),
     path('content/<int:pk>/like/', views.toggle_like_view, name='like'),
     path('content/<int:pk>/comment/', views.add_comment_view, name='comment'),
+    path('content/<int:pk>/comments/', views.comment_thread_view, name='comments'),
     path('comment/<int:pk>/delete/', views.delete_comment_view, name='delete_comment'),
+    path('comment/<int:pk>/replies/', views.comment_replies_view, name='comment_replies'),
     
 ]
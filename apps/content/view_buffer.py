@@ -0,0 +1,321 @@
+"""
+Write-behind buffering for content view events.
+
+content_detail_view hands every view to record_view(). Events are collected
+in memory (or in the shared cache when several workers run) and written on a
+timer or once the buffer fills: one bulk_create for the ContentView rows and
+one F() increment per content (view count and trending score), so concurrent
+views never lose counts. Unique-viewer sketches are updated in the same
+transaction. A batch that keeps failing to write is logged and dropped
+after CONTENT_VIEW_MAX_ATTEMPTS tries, so it cannot block the ones behind
+it, and a worker buffers at most CONTENT_VIEW_BUFFER_MAX_EVENTS views.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.analytics.unique_viewers import record_unique_viewers
+from . import trending
+from .models import Content, ContentView
+
+logger = logging.getLogger(__name__)
+
+ViewEvent = namedtuple('ViewEvent', ['content_id', 'user_id', 'ip_address', 'watched_at'])
+
+DEFAULT_BACKEND = 'memory'
+DEFAULT_BUFFER_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 5
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_MAX_EVENTS = 100_000
+BULK_BATCH_SIZE = 1000
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _drop_batch(events, attempts):
+    logger.error(
+        'Dropping %d content view events after %d failed writes: %r',
+        len(events), attempts, [tuple(event) for event in events],
+    )
+
+
+class MemoryViewBuffer:
+    """Per-process buffer. Events survive until the next flush of this worker."""
+
+    def __init__(self, max_events=DEFAULT_MAX_EVENTS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self._lock = threading.Lock()
+        self._events = []
+        # Failed writes of the batch at the head of the buffer
+        self._attempts = 0
+        self.max_events = max_events
+        self.max_attempts = max_attempts
+        self.dropped = 0
+
+    def push(self, event):
+        with self._lock:
+            if len(self._events) >= self.max_events:
+                # The database is not keeping up; shed load instead of memory
+                self.dropped += 1
+                if self.dropped == 1 or not self.dropped % self.max_events:
+                    logger.warning('Content view buffer full; %d views dropped so far', self.dropped)
+            else:
+                self._events.append(event)
+            return len(self._events)
+
+    def pending(self):
+        return len(self._events)
+
+    @contextmanager
+    def draining(self, limit):
+        with self._lock:
+            events, self._events = self._events[:limit], self._events[limit:]
+        try:
+            yield events
+        except Exception:
+            with self._lock:
+                self._attempts += 1
+                if self._attempts < self.max_attempts:
+                    # Put the batch back so a failed write is retried on the next flush
+                    self._events[:0] = events
+                    self._events[self.max_events:] = []
+                    raise
+                attempts, self._attempts = self._attempts, 0
+            _drop_batch(events, attempts)
+            raise
+        else:
+            self._attempts = 0
+
+
+class CacheViewBuffer:
+    """
+    Buffer shared by every worker through the cache (use Redis or Memcached).
+
+    Each event is stored under its own key numbered from an atomic counter;
+    flushers take a cache lock and consume keys from the head watermark up to
+    the counter, so only one node writes a given event.
+    """
+
+    # An event key may be reserved by incr() but not written yet. If it is
+    # still missing after this many seconds the writer is assumed dead.
+    GAP_TIMEOUT = 30
+    LOCK_TIMEOUT = 60
+    EVENT_TIMEOUT = 24 * 60 * 60
+
+    def __init__(self, alias='default', prefix='content_views',
+                 max_events=DEFAULT_MAX_EVENTS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.cache = caches[alias]
+        self.seq_key = f'{prefix}:seq'
+        self.head_key = f'{prefix}:head'
+        self.lock_key = f'{prefix}:flush_lock'
+        self.gap_key = f'{prefix}:gap'
+        self.attempts_key = f'{prefix}:attempts'
+        self.prefix = prefix
+        self.max_events = max_events
+        self.max_attempts = max_attempts
+
+    def _event_key(self, index):
+        return f'{self.prefix}:event:{index}'
+
+    def push(self, event):
+        found = self.cache.get_many([self.seq_key, self.head_key])
+        head = found.get(self.head_key) or 0
+        if (found.get(self.seq_key) or 0) - head >= self.max_events:
+            logger.warning('Content view buffer full; view dropped')
+            return self.max_events
+        self.cache.add(self.seq_key, 0, timeout=None)
+        index = self.cache.incr(self.seq_key)
+        self.cache.set(self._event_key(index), tuple(event), timeout=self.EVENT_TIMEOUT)
+        return index - head
+
+    def pending(self):
+        return (self.cache.get(self.seq_key) or 0) - (self.cache.get(self.head_key) or 0)
+
+    def _gap_expired(self, index):
+        gap = self.cache.get(self.gap_key)
+        if gap and gap[0] == index:
+            return time.time() - gap[1] > self.GAP_TIMEOUT
+        self.cache.set(self.gap_key, (index, time.time()), timeout=self.EVENT_TIMEOUT)
+        return False
+
+    @contextmanager
+    def draining(self, limit):
+        if not self.cache.add(self.lock_key, os.getpid(), timeout=self.LOCK_TIMEOUT):
+            # Another worker is flushing right now
+            yield []
+            return
+        try:
+            head = self.cache.get(self.head_key) or 0
+            tail = min(self.cache.get(self.seq_key) or 0, head + limit)
+            keys = [self._event_key(index) for index in range(head + 1, tail + 1)]
+            found = self.cache.get_many(keys)
+            events = []
+            last = head
+            for index, key in enumerate(keys, start=head + 1):
+                if key in found:
+                    events.append(ViewEvent(*found[key]))
+                elif not self._gap_expired(index):
+                    break
+                last = index
+            try:
+                yield events
+            except Exception:
+                attempts = self._failed(head)
+                if attempts < self.max_attempts:
+                    raise  # the head stays put: retried on the next flush
+                _drop_batch(events, attempts)
+                self._advance(head, last, keys)
+                raise
+            self._advance(head, last, keys)
+        finally:
+            self.cache.delete(self.lock_key)
+
+    def _failed(self, head):
+        """Count a failed write of the batch starting after ``head``; returns its failures."""
+        attempts = self.cache.get(self.attempts_key)
+        attempts = attempts[1] + 1 if attempts and attempts[0] == head else 1
+        self.cache.set(self.attempts_key, (head, attempts), timeout=self.EVENT_TIMEOUT)
+        return attempts
+
+    def _advance(self, head, last, keys):
+        self.cache.set(self.head_key, last, timeout=None)
+        self.cache.delete_many(keys[:last - head])
+
+
+class _Flusher(threading.Thread):
+    def __init__(self, interval):
+        super().__init__(name='content-view-flusher', daemon=True)
+        self.interval = interval
+        self.wakeup = threading.Event()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            try:
+                flush_views()
+            except Exception:
+                logger.exception('Flushing buffered content views failed')
+            finally:
+                close_old_connections()
+
+
+_state_lock = threading.Lock()
+_state = {'key': None, 'buffer': None, 'flusher': None}
+
+
+def _backend():
+    return _setting('CONTENT_VIEW_BUFFER_BACKEND', DEFAULT_BACKEND)
+
+
+def get_buffer():
+    """Return this process's buffer, rebuilding it after a fork or backend change."""
+    key = (os.getpid(), _backend())
+    if _state['key'] != key:
+        with _state_lock:
+            if _state['key'] != key:
+                limits = {
+                    'max_events': _setting('CONTENT_VIEW_BUFFER_MAX_EVENTS', DEFAULT_MAX_EVENTS),
+                    'max_attempts': _setting('CONTENT_VIEW_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS),
+                }
+                if key[1] == 'cache':
+                    buffer = CacheViewBuffer(_setting('CONTENT_VIEW_BUFFER_CACHE', 'default'), **limits)
+                else:
+                    buffer = MemoryViewBuffer(**limits)
+                _state.update(key=key, buffer=buffer, flusher=None)
+    return _state['buffer']
+
+
+def _get_flusher():
+    if _state['flusher'] is None:
+        with _state_lock:
+            if _state['flusher'] is None:
+                flusher = _Flusher(_setting('CONTENT_VIEW_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL))
+                flusher.start()
+                _state['flusher'] = flusher
+    return _state['flusher']
+
+
+def write_views(events):
+    """Persist a batch of view events. Returns the number of rows written."""
+    if not events:
+        return 0
+    content_ids = {event.content_id for event in events}
+    user_ids = {event.user_id for event in events if event.user_id}
+    # Content or users may have been deleted while their views sat in the buffer
+    creators = dict(Content.objects.filter(pk__in=content_ids).values_list('pk', 'uploaded_by_id'))
+    live_users = set(
+        get_user_model().objects.filter(pk__in=user_ids).values_list('pk', flat=True)
+    ) if user_ids else set()
+    rows = [
+        ContentView(
+            content_id=event.content_id,
+            user_id=event.user_id if event.user_id in live_users else None,
+            ip_address=event.ip_address,
+            watched_at=event.watched_at,
+        )
+        for event in events if event.content_id in creators
+    ]
+    counts = Counter(row.content_id for row in rows)
+    by_content = {}
+    for row in rows:
+        by_content.setdefault(row.content_id, []).append(trending.log_weight(trending.VIEW_WEIGHT, row.watched_at))
+    boosts = {content_id: trending.combine(values) for content_id, values in by_content.items()}
+    with transaction.atomic():
+        ContentView.objects.bulk_create(rows, batch_size=BULK_BATCH_SIZE)
+        # Fixed lock order so concurrent flushers cannot deadlock
+        for content_id in sorted(counts):
+            Content.objects.filter(pk=content_id).update(
+                view_count=F('view_count') + counts[content_id],
+                trending_score=trending.increment(boosts[content_id]),
+            )
+        trending.bump_scopes(boosts)
+        record_unique_viewers(
+            [(row.content_id, row.user_id, row.ip_address, row.watched_at) for row in rows], creators
+        )
+    return len(rows)
+
+
+def flush_views():
+    """Drain the buffer into the database. Returns the number of rows written."""
+    buffer = get_buffer()
+    limit = _setting('CONTENT_VIEW_BUFFER_SIZE', DEFAULT_BUFFER_SIZE) * 10
+    written = 0
+    while True:
+        with buffer.draining(limit) as events:
+            written += write_views(events)
+        if len(events) < limit:
+            return written
+
+
+def record_view(content_id, user_id=None, ip_address=None):
+    event = ViewEvent(content_id, user_id, ip_address, timezone.now())
+    if _backend() == 'sync':
+        write_views([event])
+        return
+    pending = get_buffer().push(event)
+    flusher = _get_flusher()
+    if pending >= _setting('CONTENT_VIEW_BUFFER_SIZE', DEFAULT_BUFFER_SIZE):
+        flusher.wakeup.set()
+
+
+@atexit.register
+def _flush_on_exit():
+    if _state['key'] is None or _state['key'][0] != os.getpid():
+        return
+    try:
+        flush_views()
+    except Exception:
+        logger.exception('Flushing buffered content views at shutdown failed')
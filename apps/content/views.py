@@ -2,22 +2,31 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse, HttpResponseForbidden
-from django.core.paginator import Paginator
-from django.db.models import Q
-from .models import Content, Like, Comment, Genre, ContentView
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from .models import Content, Like, Comment, Genre
 from .forms import ContentUploadForm, CommentForm
+from .view_buffer import record_view
+from . import media_jobs, result_cache, trending
+from .related import related_for
+from .recommendations import recommendations_for
+from .comment_threads import thread_page, reply_page, serialize_comment
+from apps.subscriptions import entitlements
+from streamify_project.pagination import InvalidCursor, KeysetPage, KeysetPaginator
 
 
 def home_view(request):
-    featured = Content.objects.filter(is_published=True).order_by('-view_count')[:6]
+    featured = trending.trending_content().select_related('uploaded_by')[:6]
     recent_music = Content.objects.filter(is_published=True, content_type='music').order_by('-uploaded_at')[:8]
     recent_videos = Content.objects.filter(is_published=True, content_type='video').order_by('-uploaded_at')[:8]
-    genres = Genre.objects.all()[:10]
+    genres = trending.trending_genres(10)
     context = {
         'featured': featured,
         'recent_music': recent_music,
         'recent_videos': recent_videos,
         'genres': genres,
+        'for_you': recommendations_for(request.user, limit=6),
     }
     return render(request, 'content/home.html', context)
 
@@ -30,47 +39,61 @@ def content_list_view(request):
         qs = qs.filter(content_type=content_type)
     if genre_slug:
         qs = qs.filter(genre__slug=genre_slug)
-    paginator = Paginator(qs, 20)
-    page = request.GET.get('page', 1)
-    content = paginator.get_page(page)
+    # Keyset pages without a COUNT(*): browse only needs "is there more"
+    paginator = KeysetPaginator(qs, 20, ordering=('-uploaded_at', '-id'), with_count=False)
+    cursor = request.GET.get('cursor', '')
+    computed = []
+
+    def compute():
+        computed.append(paginator.get_page(cursor))
+        page = computed[0]
+        return {'ids': [item.pk for item in page], 'next': page.next_cursor, 'previous': page.previous_cursor}
+
+    cached = result_cache.cached(
+        'browse', {'type': content_type, 'genre': genre_slug, 'cursor': cursor}, compute,
+        depends_on=result_cache.dependencies(content_type, genre_slug),
+    )
+    if computed:
+        content = computed[0]
+    else:
+        by_id = Content.objects.in_bulk(cached['ids'])
+        rows = [by_id[pk] for pk in cached['ids'] if pk in by_id]
+        content = KeysetPage(rows, paginator, cached['next'], cached['previous'])
     genres = Genre.objects.all()
-    context = {'content': content, 'genres': genres, 'content_type': content_type}
+    context = {'content': content, 'genres': genres, 'content_type': content_type, 'genre_slug': genre_slug}
     return render(request, 'content/list.html', context)
 
 
-def content_detail_view(request, pk):
+def _get_visible_content(request, pk):
     # Allow owner to see their own unpublished content
     if request.user.is_authenticated:
-        content = get_object_or_404(
+        return get_object_or_404(
             Content,
             Q(pk=pk, is_published=True) | Q(pk=pk, uploaded_by=request.user)
         )
-    else:
-        content = get_object_or_404(Content, pk=pk, is_published=True)
+    return get_object_or_404(Content, pk=pk, is_published=True)
+
+
+def content_detail_view(request, pk):
+    content = _get_visible_content(request, pk)
 
-    # Record view
-    ContentView.objects.create(
-        user=request.user if request.user.is_authenticated else None,
-        content=content,
-        ip_address=request.META.get('REMOTE_ADDR')
+    # Record view (buffered, written in bulk by view_buffer)
+    record_view(
+        content.pk,
+        user_id=request.user.pk if request.user.is_authenticated else None,
+        ip_address=request.META.get('REMOTE_ADDR'),
     )
-    content.view_count += 1
-    content.save(update_fields=['view_count'])
 
     user_liked = False
     if request.user.is_authenticated:
         user_liked = Like.objects.filter(user=request.user, content=content).exists()
 
-    comments = content.comments.filter(parent=None).select_related('user')
+    comments = thread_page(content)
     comment_form = CommentForm()
-    related = Content.objects.filter(
-        is_published=True, content_type=content.content_type
-    ).exclude(pk=pk)[:6]
+    related = related_for(content)
 
-    # Check if user can stream (free content or active subscription)
-    can_stream = not content.is_premium or (
-        request.user.is_authenticated and request.user.has_active_subscription
-    )
+    # Free content, or premium with an active subscription (cached, no query)
+    can_stream = entitlements.can_stream(request.user, content)
 
     context = {
         'content': content,
@@ -83,6 +106,31 @@ def content_detail_view(request, pk):
     return render(request, 'content/detail.html', context)
 
 
+def comment_thread_view(request, pk):
+    content = _get_visible_content(request, pk)
+    try:
+        page = thread_page(content, request.GET.get('cursor'), strict=True)
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    return JsonResponse({
+        'comments': [serialize_comment(c, request.user, content.uploaded_by_id) for c in page],
+        'next': page.next_cursor,
+    })
+
+
+def comment_replies_view(request, pk):
+    parent = get_object_or_404(Comment, pk=pk)
+    content = _get_visible_content(request, parent.content_id)
+    try:
+        page = reply_page(parent.pk, request.GET.get('cursor'))
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    return JsonResponse({
+        'replies': [serialize_comment(r, request.user, content.uploaded_by_id) for r in page],
+        'next': page.next_cursor,
+    })
+
+
 @login_required
 def upload_content_view(request):
     if not request.user.is_creator:
@@ -95,6 +143,7 @@ def upload_content_view(request):
             content.uploaded_by = request.user
             content.save()
             form.save_m2m()
+            media_jobs.enqueue(content)
             messages.success(request, 'Content uploaded successfully!')
             return redirect('content:detail', pk=content.pk)
     else:
@@ -122,6 +171,8 @@ def edit_content_view(request, pk):
             print("CLEANED DATA:", form.cleaned_data)
             obj = form.save()
             print("SAVED OBJECT:", obj)
+            # No-op unless a new file was uploaded
+            media_jobs.enqueue(obj)
             return redirect('content:detail', pk=obj.pk)
         else:
             print("FORM ERRORS:", form.errors)
@@ -148,13 +199,17 @@ def delete_content_view(request, pk):
 def toggle_like_view(request, pk):
     if request.method == 'POST':
         content = get_object_or_404(Content, pk=pk)
-        like, created = Like.objects.get_or_create(user=request.user, content=content)
-        if not created:
-            like.delete()
-            liked = False
-        else:
-            liked = True
-        return JsonResponse({'liked': liked, 'count': content.like_count})
+        with transaction.atomic():
+            like, created = Like.objects.get_or_create(user=request.user, content=content)
+            if created:
+                delta = 1
+                trending.record(pk, trending.LIKE_WEIGHT)
+            else:
+                # Count only rows this request actually removed
+                delta = -Like.objects.filter(pk=like.pk).delete()[0]
+            Content.objects.filter(pk=pk).update(like_count=Greatest(F('like_count') + delta, 0))
+        content.refresh_from_db(fields=['like_count'])
+        return JsonResponse({'liked': created, 'count': content.like_count})
     return JsonResponse({'error': 'Invalid method'}, status=405)
 
 
@@ -170,7 +225,10 @@ def add_comment_view(request, pk):
             parent_id = request.POST.get('parent_id')
             if parent_id:
                 comment.parent = get_object_or_404(Comment, pk=parent_id)
-            comment.save()
+            with transaction.atomic():
+                comment.save()
+                Content.objects.filter(pk=pk).update(comment_count=F('comment_count') + 1)
+                trending.record(pk, trending.COMMENT_WEIGHT)
             messages.success(request, 'Comment added.')
     return redirect('content:detail', pk=pk)
 
@@ -180,8 +238,11 @@ def delete_comment_view(request, pk):
     comment = get_object_or_404(Comment, pk=pk)
     if comment.user != request.user and not request.user.is_admin:
         return HttpResponseForbidden()
-    content_pk = comment.content.pk
-    comment.delete()
+    content_pk = comment.content_id
+    with transaction.atomic():
+        # Replies cascade, so decrement by everything that was removed
+        removed = comment.delete()[1].get(Comment._meta.label, 0)
+        Content.objects.filter(pk=content_pk).update(comment_count=Greatest(F('comment_count') - removed, 0))
     messages.success(request, 'Comment deleted.')
     return redirect('content:detail', pk=content_pk)
 
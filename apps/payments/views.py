@@ -8,6 +8,7 @@ from django.utils import timezone
 import json
 from datetime import date, timedelta
 from .models import Payment
+from apps.subscriptions import entitlements
 from apps.subscriptions.models import Plan, Subscription
 
 try:
@@ -79,5 +80,16 @@ def stripe_webhook_view(request):
     # Handle event types
     if event['type'] == 'payment_intent.succeeded':
         intent = event['data']['object']
-        Payment.objects.filter(stripe_payment_intent=intent['id']).update(status='completed')
+        payments = Payment.objects.filter(stripe_payment_intent=intent['id'])
+        user_ids = list(payments.values_list('user_id', flat=True))
+        payments.update(status='completed')
+        entitlements.invalidate(*user_ids)
+    elif event['type'] == 'payment_intent.payment_failed':
+        intent = event['data']['object']
+        payments = Payment.objects.filter(stripe_payment_intent=intent['id'], status='pending')
+        user_ids = list(payments.values_list('user_id', flat=True))
+        # A failed charge ends the period it was paying for
+        Subscription.objects.filter(pk__in=payments.values('subscription_id'), status='active').update(status='expired')
+        payments.update(status='failed')
+        entitlements.invalidate(*user_ids)
     return JsonResponse({'status': 'success'})
@@ -4,3 +4,16 @@ class SearchConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.search'
     verbose_name = 'Search'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from apps.content.models import Content, Genre
+        from . import engine, suggest
+
+        post_save.connect(engine.content_saved, sender=Content, dispatch_uid='search_index_content')
+        post_delete.connect(engine.content_deleted, sender=Content, dispatch_uid='search_remove_content')
+        post_save.connect(suggest.content_saved, sender=Content, dispatch_uid='suggest_update_content')
+        post_delete.connect(suggest.content_deleted, sender=Content, dispatch_uid='suggest_remove_content')
+        post_save.connect(suggest.genre_saved, sender=Genre, dispatch_uid='suggest_update_genre')
+        post_delete.connect(suggest.genre_deleted, sender=Genre, dispatch_uid='suggest_remove_genre')
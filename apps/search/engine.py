@@ -0,0 +1,173 @@
+"""
+Full-text search over published Content.
+
+The backend follows the database: PostgreSQL keeps a weighted tsvector per
+item in search_documents (GIN indexed), SQLite an FTS5 table ranked with
+bm25, and any other database falls back to substring matching. Title
+weighs most, then artist, album and description.
+
+search() returns the queryset filtered to matches and annotated with
+``search_score``: the text relevance scaled up by the item's popularity,
+so among similarly relevant results the well watched ones come first.
+The index is kept in step by the Content save/delete receivers below;
+`manage.py rebuild_search_index` rebuilds it from scratch.
+"""
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.expressions import ExpressionWrapper, RawSQL
+from django.db.models.functions import Ln
+
+from apps.content.models import Content
+
+FTS_TABLE = 'search_fts'
+# Indexed fields and their weights, highest first
+FIELDS = ('title', 'artist_name', 'album', 'description')
+PG_WEIGHTS = ('A', 'B', 'C', 'D')
+BM25_WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+DEFAULT_POPULARITY_WEIGHT = 0.1
+
+_TOKEN_RE = re.compile(r'\w+')
+# Whether each SQLite database has the FTS5 table, checked once per process
+_fts_tables = {}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _config():
+    return _setting('SEARCH_CONFIG', 'english')
+
+
+def backend():
+    """'postgresql', 'fts5' or 'like'."""
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite':
+        name = connection.settings_dict['NAME']
+        if name not in _fts_tables:
+            _fts_tables[name] = FTS_TABLE in connection.introspection.table_names()
+        if _fts_tables[name]:
+            return 'fts5'
+    return 'like'
+
+
+def _popularity():
+    weight = _setting('SEARCH_POPULARITY_WEIGHT', DEFAULT_POPULARITY_WEIGHT)
+    return Value(1.0) + Value(weight) * Ln(F('view_count') + 1)
+
+
+def _score(relevance):
+    return ExpressionWrapper(relevance * _popularity(), output_field=FloatField())
+
+
+def fts_query(query):
+    """An FTS5 MATCH expression for free text: all words, the last one as a prefix."""
+    tokens = _TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return ''
+    return ' '.join(f'"{token}"' for token in tokens) + '*'
+
+
+# ── Querying ──────────────────────────────────
+
+def search(queryset, query):
+    """Filter a Content queryset to ``query`` matches, annotated with ``search_score``."""
+    query = query.strip()
+    if not query:
+        return queryset.annotate(search_score=_score(Value(1.0)))
+    kind = backend()
+
+    if kind == 'postgresql':
+        ts_query = SearchQuery(query, search_type='websearch', config=_config())
+        return queryset.filter(search_document__vector=ts_query).annotate(
+            search_score=_score(SearchRank(F('search_document__vector'), ts_query)),
+        )
+
+    if kind == 'fts5':
+        match = fts_query(query)
+        if not match:
+            # No words to match; still annotated for callers ordering by the score
+            return queryset.annotate(search_score=Value(0.0, output_field=FloatField())).none()
+        table = Content._meta.db_table
+        weights = ', '.join(str(weight) for weight in BM25_WEIGHTS)
+        # bm25() is lower-is-better and only valid inside a MATCH query
+        relevance = RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{table}"."id"', (match,),
+            output_field=FloatField(),
+        )
+        matches = RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,))
+        return queryset.filter(pk__in=matches).annotate(search_score=_score(relevance))
+
+    condition = Q()
+    for field in FIELDS:
+        condition |= Q(**{f'{field}__icontains': query})
+    return queryset.filter(condition).annotate(search_score=_score(Value(1.0)))
+
+
+# ── Index maintenance ─────────────────────────
+
+def _pg_document_sql():
+    return ' || '.join(
+        f"setweight(to_tsvector(%s::regconfig, coalesce({field}, '')), '{weight}')"
+        for field, weight in zip(FIELDS, PG_WEIGHTS)
+    )
+
+
+def index(content_ids):
+    """(Re)index the given Content rows."""
+    content_ids = list(content_ids)
+    if not content_ids:
+        return
+    table = Content._meta.db_table
+    kind = backend()
+    with connection.cursor() as cursor:
+        if kind == 'postgresql':
+            cursor.execute(
+                f'INSERT INTO search_documents (content_id, vector) '
+                f'SELECT id, {_pg_document_sql()} FROM {table} WHERE id = ANY(%s) '
+                f'ON CONFLICT (content_id) DO UPDATE SET vector = EXCLUDED.vector',
+                [_config()] * len(FIELDS) + [content_ids],
+            )
+        elif kind == 'fts5':
+            placeholders = ', '.join(['%s'] * len(content_ids))
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', content_ids)
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, {", ".join(FIELDS)}) '
+                f'SELECT id, {", ".join(FIELDS)} FROM {table} WHERE id IN ({placeholders})',
+                content_ids,
+            )
+
+
+def remove(content_ids):
+    """Drop deleted Content rows from the index (search_documents rows cascade)."""
+    content_ids = list(content_ids)
+    if content_ids and backend() == 'fts5':
+        placeholders = ', '.join(['%s'] * len(content_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', content_ids)
+
+
+def prune():
+    """Drop index rows whose Content no longer exists. Returns the number removed."""
+    if backend() != 'fts5':
+        return 0  # search_documents rows are deleted with their content
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid NOT IN (SELECT id FROM {Content._meta.db_table})')
+        return cursor.rowcount
+
+
+def content_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not set(update_fields) & set(FIELDS)):
+        return
+    transaction.on_commit(lambda: index([instance.pk]))
+
+
+def content_deleted(sender, instance, **kwargs):
+    content_id = instance.pk
+    transaction.on_commit(lambda: remove([content_id]))
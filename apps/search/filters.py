@@ -0,0 +1,23 @@
+from rest_framework import filters
+
+from . import engine
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """SearchFilter answering ``?search=`` from the full-text index (engine.search)."""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return engine.search(queryset, ' '.join(terms))
+
+
+class RelevanceOrderingFilter(filters.OrderingFilter):
+    """OrderingFilter that defaults to relevance while a search is active."""
+
+    def get_default_ordering(self, view):
+        # The same test FullTextSearchFilter annotates search_score on
+        if FullTextSearchFilter().get_search_terms(view.request):
+            return ['-search_score']
+        return super().get_default_ordering(view)
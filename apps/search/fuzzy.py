@@ -0,0 +1,182 @@
+"""
+Typo-tolerant matching: "did you mean" for searches with no results.
+
+Candidates come from a trigram index. PostgreSQL uses pg_trgm (GIN indexes
+on title, artist and album, see migration 0003) through the ``<%`` word
+similarity operator. Elsewhere the trigram postings in the autocomplete
+snapshot (suggest.py) are counted with numpy: an entry is a candidate when
+it holds at least SEARCH_FUZZY_THRESHOLD of the query's trigrams. Either
+way only the closest few dozen candidates are reranked in Python, by edit
+distance against their best matching run of words plus a nudge for
+popularity, so no request compares the query with the whole catalogue.
+"""
+import math
+
+import numpy as np
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection, transaction
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+
+from apps.content.models import Content
+
+from . import suggest
+
+FIELDS = ('title', 'artist_name', 'album')
+KINDS = (suggest.TITLE, suggest.ARTIST, suggest.ALBUM)
+# Candidates reranked by edit distance
+RERANK_CANDIDATES = 32
+# Corrections must be at least this close to the query (1 - distance / length)
+MIN_SIMILARITY = 0.6
+MAX_QUERY_CHARS = 64
+DEFAULT_THRESHOLD = 0.3
+DEFAULT_POPULARITY_WEIGHT = 0.01
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def levenshtein(a, b):
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        current = [i]
+        for j, other in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != other)))
+        previous = current
+    return previous[-1]
+
+
+def edit_similarity(normalized_query, text):
+    """1 - edit distance / length against the closest run of ``text``'s words."""
+    words = suggest.normalize(text).split(' ')
+    query_words = normalized_query.count(' ') + 1
+    best = 0.0
+    # Runs up to twice as many words as the query, for "lofi" vs "lo fi"
+    for size in range(1, min(len(words), 2 * query_words + 1) + 1):
+        for start in range(len(words) - size + 1):
+            run = ' '.join(words[start:start + size])
+            if abs(len(run) - len(normalized_query)) >= len(normalized_query):
+                continue
+            distance = levenshtein(normalized_query, run)
+            best = max(best, 1 - distance / max(len(normalized_query), len(run)))
+    return best
+
+
+# ── Candidates ────────────────────────────────
+
+def index_candidates(index, normalized_query, overlay=None, limit=RERANK_CANDIDATES, threshold=None):
+    """(text, kind, weight) of the entries sharing the most trigrams with the query."""
+    threshold = _setting('SEARCH_FUZZY_THRESHOLD', DEFAULT_THRESHOLD) if threshold is None else threshold
+    grams = suggest.trigrams(normalized_query)
+    if not grams:
+        return []
+    needed = max(1, math.ceil(len(grams) * threshold))
+    overlay = overlay or {}
+    candidates = []
+
+    codes = np.array(sorted(suggest.gram_code(gram) for gram in grams), dtype=np.uint64)
+    positions = np.searchsorted(index.gram_codes, codes)
+    present = positions < len(index.gram_codes)
+    positions = positions[present][index.gram_codes[positions[present]] == codes[present]]
+    if len(positions) >= needed:
+        postings = [index.gram_entries[index.gram_offsets[p]:index.gram_offsets[p + 1]] for p in positions]
+        shared = np.bincount(np.concatenate(postings), minlength=len(index.kinds))
+        entries = np.flatnonzero(shared >= needed)
+        entries = entries[np.isin(index.kinds[entries], KINDS)]
+        common = shared[entries]
+        # Containing the query's trigrams, then being no longer than needed;
+        # popularity only breaks ties
+        closeness = (
+            common / len(grams)
+            + common / (len(grams) + index.entry_grams[entries] - common)
+            + 1e-3 * np.log1p(index.entry_weights[entries])
+        )
+        if len(entries) > limit:
+            entries = entries[np.argpartition(-closeness, limit)[:limit]]
+        for entry in entries:
+            kind, target = int(index.kinds[entry]), int(index.targets[entry])
+            if suggest._overlay_target(kind, target) in overlay:
+                continue  # changed since the snapshot
+            candidates.append((index.text(entry), kind, float(index.entry_weights[entry])))
+
+    for _seq, entries in list(overlay.values()):
+        for (kind, _target, text, weight), _keys in entries:
+            if kind in KINDS and len(grams & suggest.trigrams(suggest.normalize(text))) >= needed:
+                candidates.append((text, kind, weight))
+    return candidates
+
+
+def _postgres_candidates(normalized_query, limit=RERANK_CANDIDATES):
+    table = Content._meta.db_table
+    # The ``<%`` operator is what the pg_trgm GIN indexes serve
+    matches = RawSQL(
+        ' OR '.join(f'%s <%% "{table}"."{field}"' for field in FIELDS),
+        [normalized_query] * len(FIELDS), output_field=BooleanField(),
+    )
+    similarity = Greatest(*(TrigramWordSimilarity(normalized_query, field) for field in FIELDS))
+    rows = (
+        Content.objects.filter(Q(is_published=True), matches)
+        .annotate(similarity=similarity)
+        .order_by('-similarity', '-view_count')
+        .values_list(*FIELDS, 'view_count')[:limit]
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            'SET LOCAL pg_trgm.word_similarity_threshold = %s',
+            [_setting('SEARCH_FUZZY_THRESHOLD', DEFAULT_THRESHOLD)],
+        )
+        rows = list(rows)
+    return [
+        (text, kind, float(views))
+        for *texts, views in rows
+        for kind, text in zip(KINDS, texts) if text
+    ]
+
+
+# ── Querying ──────────────────────────────────
+
+def rerank(normalized_query, candidates):
+    """[(score, text)] best first, for the candidates close enough to suggest."""
+    weight = _setting('SEARCH_FUZZY_POPULARITY_WEIGHT', DEFAULT_POPULARITY_WEIGHT)
+    scored = {}
+    for text, _kind, views in candidates:
+        similarity = edit_similarity(normalized_query, text)
+        if similarity < MIN_SIMILARITY:
+            continue
+        score = similarity + weight * math.log1p(views)
+        if scored.get(text, (-1,))[0] < score:
+            scored[text] = (score, text)
+    return sorted(scored.values(), key=lambda item: -item[0])
+
+
+def lookup(index, query, overlay=None):
+    """The best correction of ``query`` from a suggestion index, or None."""
+    normalized = suggest.normalize(query)[:MAX_QUERY_CHARS]
+    if not normalized:
+        return None
+    return _best(normalized, index_candidates(index, normalized, overlay))
+
+
+def _best(normalized, candidates):
+    for _score, text in rerank(normalized, candidates):
+        if suggest.normalize(text) != normalized:
+            return text
+    return None
+
+
+def did_you_mean(query):
+    """A catalogue title, artist or album close to the misspelt ``query``, or None."""
+    normalized = suggest.normalize(query)[:MAX_QUERY_CHARS]
+    if not normalized:
+        return None
+    if connection.vendor == 'postgresql':
+        return _best(normalized, _postgres_candidates(normalized))
+    index = suggest.get_index()
+    if index is None:
+        return None  # the snapshot is being built
+    return lookup(index, query, suggest._state['overlay'])
@@ -0,0 +1,98 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from apps.search import fuzzy, suggest
+
+SYLLABLES = (
+    'ka ri lo mi na to be yo se la vi da ne ro su ki ma te no ha li zu gra '
+    'shan tel mor vin dor qua pex lum bri cas fen jo wel ter san mel'
+).split()
+
+
+def _word(rng):
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+
+
+def _typo(rng, word):
+    """One random substitution, deletion, insertion or transposition."""
+    i = rng.randrange(len(word))
+    letter = rng.choice('abcdefghijklmnopqrstuvwxyz')
+    edit = rng.randrange(4)
+    if edit == 0:
+        return word[:i] + letter + word[i + 1:]
+    if edit == 1 and len(word) > 3:
+        return word[:i] + word[i + 1:]
+    if edit == 2:
+        return word[:i] + letter + word[i:]
+    if i + 1 < len(word):
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word + letter
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark "did you mean" on a synthetic catalogue: builds the '
+        'suggestion index with its trigram postings and times misspelt '
+        'titles and artists against it (no database access).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=1_000_000)
+        parser.add_argument('--vocabulary', type=int, default=50_000)
+        parser.add_argument('--queries', type=int, default=2_000)
+        parser.add_argument('--naive-sample', type=int, default=20_000,
+                            help='Entries compared one by one to time the naive full scan')
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        n = options['titles']
+        vocabulary = list({_word(rng) for _ in range(options['vocabulary'])})
+        views = (1_000_000 / np.arange(1, n + 1) ** 0.8).astype(np.float32)
+        np.random.default_rng(42).shuffle(views)
+        titles = [' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 4))).title() for _ in range(n)]
+        artists = [f'{rng.choice(vocabulary)} {rng.choice(vocabulary)}'.title() for _ in range(n // 20)]
+
+        def entries():
+            for i, title in enumerate(titles):
+                yield suggest.TITLE, i + 1, title, float(views[i])
+            for i, artist in enumerate(artists):
+                yield suggest.ARTIST, -1, artist, float(views[i])
+
+        started = time.perf_counter()
+        index = suggest.PrefixIndex.build(entries())
+        self.stdout.write(
+            f'{n} titles, {len(index.kinds)} entries, {len(index.gram_codes)} trigrams: '
+            f'build {time.perf_counter() - started:.1f}s, postings {index.gram_entries.nbytes / 1024 ** 2:.0f} MiB'
+        )
+
+        # Whole short titles and artist names, one typo per word
+        sources = [rng.choice(artists if rng.random() < 0.3 else titles) for _ in range(options['queries'])]
+        queries = [' '.join(_typo(rng, word) for word in source.lower().split()) for source in sources]
+        for query in queries[:50]:  # warm up
+            fuzzy.lookup(index, query)
+
+        timings, recovered = [], 0
+        for source, query in zip(sources, queries):
+            started = time.perf_counter()
+            correction = fuzzy.lookup(index, query)
+            timings.append(time.perf_counter() - started)
+            recovered += correction is not None and suggest.normalize(correction) == suggest.normalize(source)
+        timings = np.array(timings) * 1000
+        self.stdout.write(
+            f'fuzzy     p50 {np.percentile(timings, 50):.2f}ms  p99 {np.percentile(timings, 99):.2f}ms  '
+            f'max {timings.max():.2f}ms over {len(timings)} queries; '
+            f'{100 * recovered / len(queries):.1f}% corrected to the misspelt title/artist'
+        )
+
+        # What comparing every entry's text with the query would cost
+        sample = [index.text(entry) for entry in range(min(options['naive_sample'], len(index.kinds)))]
+        query = suggest.normalize(queries[0])
+        started = time.perf_counter()
+        for text in sample:
+            fuzzy.edit_similarity(query, text)
+        per_query = (time.perf_counter() - started) * len(index.kinds) / len(sample)
+        self.stdout.write(f'naive scan of every entry: ~{per_query:.1f}s per query (extrapolated)')
+        self.stdout.write(self.style.SUCCESS('Target: p99 under 50ms.'))
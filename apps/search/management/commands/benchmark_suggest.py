@@ -0,0 +1,78 @@
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from apps.search import suggest
+
+WORDS = (
+    'love night dream fire heart light rain summer blue gold road city river moon star wild lost home '
+    'dance time sky ocean shadow storm echo glass paper silver winter golden midnight lofi beats chill '
+    'jazz live acoustic remix session theme story episode chapter world radio signal neon velvet'
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark autocomplete lookups on a synthetic catalogue: builds a '
+        'snapshot, memory-maps it and times random prefixes (no database access).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=1_000_000)
+        parser.add_argument('--queries', type=int, default=20_000)
+        parser.add_argument('--limit', type=int, default=suggest.DEFAULT_LIMIT)
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        n = options['titles']
+        # Zipf-like views so a few items dominate, as in real catalogues
+        views = (1_000_000 / np.arange(1, n + 1) ** 0.8).astype(np.float32)
+        np.random.default_rng(42).shuffle(views)
+        titles = [
+            ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 5))).title() + f' {i % 997}'
+            for i in range(n)
+        ]
+        artists = [f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}' for _ in range(n // 20)]
+
+        def entries():
+            for i, title in enumerate(titles):
+                yield suggest.TITLE, i + 1, title, float(views[i])
+            for i, artist in enumerate(artists):
+                yield suggest.ARTIST, -1, artist, float(views[i])
+
+        started = time.perf_counter()
+        index = suggest.PrefixIndex.build(entries())
+        build_seconds = time.perf_counter() - started
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'index.bin')
+            index.save(path)
+            size = os.path.getsize(path)
+            index = suggest.PrefixIndex.load(path)
+            self.stdout.write(
+                f'{n} titles, {index.size} keys: build {build_seconds:.1f}s, snapshot {size / 1024 ** 2:.0f} MiB'
+            )
+
+            # Prefixes users actually type: 1-8 leading characters of an indexed word
+            prefixes = []
+            for _ in range(options['queries']):
+                words = rng.choice(titles).split(' ')[:suggest.WORD_KEYS]
+                prefixes.append(rng.choice(words)[:rng.randint(1, 8)])
+            for prefix in prefixes[:200]:  # warm the page cache
+                suggest.lookup(index, prefix, options['limit'])
+
+            timings = []
+            for prefix in prefixes:
+                started = time.perf_counter()
+                suggest.lookup(index, prefix, options['limit'])
+                timings.append(time.perf_counter() - started)
+            timings = np.array(timings) * 1000
+            self.stdout.write(
+                f'lookup    p50 {np.percentile(timings, 50):.3f}ms  p99 {np.percentile(timings, 99):.3f}ms  '
+                f'max {timings.max():.2f}ms over {len(timings)} prefixes'
+            )
+            del index
+        self.stdout.write(self.style.SUCCESS('Target: p99 under 5ms.'))
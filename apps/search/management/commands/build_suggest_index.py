@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.search import suggest
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the autocomplete snapshot that web workers memory-map.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Write here instead of SUGGEST_SNAPSHOT_PATH')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        index = suggest.build_snapshot(options['path'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {len(index.kinds)} suggestions under {index.size} keys '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
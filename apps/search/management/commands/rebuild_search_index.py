@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from apps.content.models import Content
+from apps.search import engine
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from the content table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Content ids indexed per statement')
+
+    def handle(self, *args, **options):
+        kind = engine.backend()
+        if kind == 'like':
+            self.stdout.write('This database has no full-text index; search uses substring matching.')
+            return
+        pruned = engine.prune()
+        bounds = Content.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            self.stdout.write('No content to index.')
+            return
+
+        batch_size = options['batch_size']
+        indexed = 0
+        for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+            ids = list(Content.objects.filter(pk__gte=start, pk__lt=start + batch_size).values_list('pk', flat=True))
+            with transaction.atomic():
+                engine.index(ids)
+            indexed += len(ids)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} content item(s), dropped {pruned} stale ({kind}).'))
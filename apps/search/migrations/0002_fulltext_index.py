@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:24
+
+from django.conf import settings
+from django.db import DatabaseError, migrations
+
+FIELDS = ('title', 'artist_name', 'album', 'description')
+PG_WEIGHTS = ('A', 'B', 'C', 'D')
+
+
+def create_index(apps, schema_editor):
+    """GIN index and documents on PostgreSQL, an FTS5 table on SQLite (when compiled in)."""
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        config = getattr(settings, 'SEARCH_CONFIG', 'english')
+        document = ' || '.join(
+            f"setweight(to_tsvector('{config}', coalesce({field}, '')), '{weight}')"
+            for field, weight in zip(FIELDS, PG_WEIGHTS)
+        )
+        schema_editor.execute('CREATE INDEX search_documents_vector_gin ON search_documents USING gin (vector)')
+        schema_editor.execute(
+            f'INSERT INTO search_documents (content_id, vector) SELECT id, {document} FROM content'
+        )
+    elif connection.vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE search_fts USING fts5({', '.join(FIELDS)}, "
+                f"tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        except DatabaseError:
+            return  # SQLite without FTS5: search falls back to substring matching
+        schema_editor.execute(
+            f"INSERT INTO search_fts (rowid, {', '.join(FIELDS)}) SELECT id, {', '.join(FIELDS)} FROM content"
+        )
+
+
+def drop_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS search_documents_vector_gin')
+    elif connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS search_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_search_documents'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
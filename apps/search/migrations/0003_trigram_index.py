@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:05
+
+from django.db import migrations
+
+FIELDS = ('title', 'artist_name', 'album')
+
+
+def create_index(apps, schema_editor):
+    """pg_trgm GIN indexes on PostgreSQL; elsewhere the trigrams live in the suggestion snapshot."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for field in FIELDS:
+        schema_editor.execute(f'CREATE INDEX content_{field}_trgm ON content USING gin ({field} gin_trgm_ops)')
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS content_{field}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0002_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,21 @@
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models
+
+from apps.content.models import Content
+
+
+class SearchDocument(models.Model):
+    """Weighted full-text document of one Content row on PostgreSQL, see apps/search/engine.py"""
+    content = models.OneToOneField(
+        Content,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document'
+    )
+    vector = SearchVectorField(null=True)
+
+    class Meta:
+        db_table = 'search_documents'
+
+    def __str__(self):
+        return f"Search document for {self.content_id}"
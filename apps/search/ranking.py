@@ -0,0 +1,322 @@
+"""
+Search result pages, counts and facets.
+
+Pages sorted by popularity, trending or upload date are keyset pages over
+the database ordering (streamify_project/pagination.py), so every page of
+a browse or search costs the same index scan however deep it is. Their
+counts and facets come from two GROUP BY queries.
+
+Relevance is ranked in Python: search_page() streams narrow (id, score,
+type, genre) rows for the matches, most trending first and up to
+SEARCH_SCAN_LIMIT items, and in that single pass
+
+* keeps the page's ``per_page`` best rows after the cursor in a heap, so
+  memory stays O(per_page) however many items match,
+* counts the matches (exact while under the limit, an estimate beyond it),
+* counts content types and genres for the filter sidebar. Facets are
+  disjunctive: the type counts apply the genre filter and vice versa, so
+  picking a type still shows how many items each other type has.
+
+Every relevance page repeats the same scan, so counts and facets do not
+change as the user pages. When the matches outnumber the limit the page
+says so (``truncated``), and once the ranked ones run out, pages go on
+through the rest of the matches by keyset in scan order. Cursors are
+signed.
+"""
+import heapq
+import json
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.db.models import Count
+
+from apps.content.models import Content
+from streamify_project import pagination
+
+DEFAULT_SCAN_LIMIT = 1000
+
+# sort -> ordering; '-' marks descending terms
+SORTS = {
+    'relevance': ('-search_score', '-id'),
+    'popular': ('-view_count', '-id'),
+    'trending': ('-trending_score', '-id'),
+    'newest': ('-uploaded_at', '-id'),
+    'oldest': ('uploaded_at', 'id'),
+}
+# Relevance scans the most trending matches first, so the limit keeps the
+# items people are watching
+SCAN_ORDER = ('-trending_score', '-id')
+# Sent with a cursor to the first page after the ranked ones
+_REST = float('inf')
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+@dataclass
+class SearchPage:
+    object_list: list
+    count: int
+    count_is_exact: bool
+    type_facets: dict = field(default_factory=dict)
+    genre_facets: list = field(default_factory=list)
+    next_cursor: str = None
+    previous_cursor: str = None
+    # Relevance ranked only the first ``scan_limit`` matches
+    truncated: bool = False
+    scan_limit: int = None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _scan_limit():
+    return getattr(settings, 'SEARCH_SCAN_LIMIT', DEFAULT_SCAN_LIMIT)
+
+
+def _number(value):
+    return value.timestamp() if hasattr(value, 'timestamp') else float(value or 0)
+
+
+def _rank_key(terms, values):
+    """A tuple of floats that sorts ascending in ranking order."""
+    return tuple(
+        -_number(value) if term.startswith('-') else _number(value)
+        for term, value in zip(terms, values)
+    )
+
+
+def _salt(sort):
+    return f'search-page:{sort}'
+
+
+def encode_cursor(sort, key, backwards=False):
+    return signing.dumps({'k': list(key), 'd': 'p' if backwards else 'n'}, salt=_salt(sort), compress=True)
+
+
+def _encode_rest_cursor(sort, cursor=None):
+    """A cursor into the matches past the relevance scan (``cursor`` pages within them)."""
+    return signing.dumps({'r': cursor or ''}, salt=_salt(sort), compress=True)
+
+
+def decode_cursor(sort, cursor):
+    """(key, backwards, rest): ``rest`` is the cursor within the unranked matches, or None."""
+    try:
+        payload = signing.loads(cursor, salt=_salt(sort))
+        if 'r' in payload:
+            return None, False, str(payload['r'])
+        key = tuple(float(value) for value in payload['k'])
+    except (signing.BadSignature, KeyError, TypeError, ValueError) as exc:
+        raise InvalidCursor(str(exc)) from exc
+    return key, payload.get('d') == 'p', None
+
+
+def _scan_rows(queryset, terms, scan_order):
+    """Yield (key, scan values, content_type, genres) per item, one SQL pass joined with genres."""
+    names = [term.lstrip('-') for term in terms]
+    scan_names = [term.lstrip('-') for term in scan_order]
+    rows = (
+        queryset.order_by(*scan_order)
+        .values_list('pk', 'content_type', 'genre__slug', 'genre__name', *names, *scan_names)
+        .iterator(chunk_size=500)
+    )
+    current, content_type, key, position, genres = None, None, None, None, {}
+    for pk, row_type, genre_slug, genre_name, *values in rows:
+        # The genre join repeats an item once per genre; the scan order ends
+        # in the primary key, so those rows arrive together
+        if pk != current:
+            if current is not None:
+                yield key, position, content_type, genres
+            current, content_type, genres = pk, row_type, {}
+            key, position = _rank_key(terms, values[:len(names)]), values[len(names):]
+        if genre_slug:
+            genres[genre_slug] = genre_name
+    if current is not None:
+        yield key, position, content_type, genres
+
+
+def _filtered(queryset, content_type='', genre=''):
+    if content_type:
+        queryset = queryset.filter(content_type=content_type)
+    if genre:
+        queryset = queryset.filter(genre__slug=genre)
+    return queryset
+
+
+def _genre_list(genre_facets):
+    return sorted(
+        ({'slug': slug, 'name': name, 'count': n} for slug, (name, n) in genre_facets.items()),
+        key=lambda facet: (-facet['count'], facet['name']),
+    )
+
+
+def facets(queryset, content_type='', genre=''):
+    """(type counts, genre counts, match count) for the sidebar, counted in SQL."""
+    type_facets = dict(
+        _filtered(queryset, genre=genre).order_by().values_list('content_type').annotate(n=Count('pk'))
+    )
+    genre_facets = {
+        slug: [name, n]
+        for slug, name, n in _filtered(queryset, content_type=content_type).order_by()
+        .values_list('genre__slug', 'genre__name').annotate(n=Count('pk'))
+        if slug
+    }
+    count = type_facets.get(content_type, 0) if content_type else sum(type_facets.values())
+    return type_facets, _genre_list(genre_facets), count
+
+
+def estimate_count(queryset):
+    """The planner's row estimate for ``queryset`` on PostgreSQL, else None."""
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def load(ids):
+    """The Content rows of ``ids``, in order."""
+    by_id = Content.objects.select_related('uploaded_by').in_bulk(ids)
+    return [by_id[pk] for pk in ids if pk in by_id]
+
+
+def search_page(queryset, sort='relevance', content_type='', genre='', cursor=None, per_page=24):
+    """
+    Return the SearchPage of ``queryset`` (annotated with search_score for
+    'relevance') after/before ``cursor``; raises InvalidCursor.
+    """
+    if sort not in SORTS or sort == 'relevance':
+        return _relevance_page(queryset, content_type, genre, cursor, per_page)
+    paginator = pagination.KeysetPaginator(
+        _filtered(queryset, content_type, genre).select_related('uploaded_by'), per_page,
+        ordering=SORTS[sort], with_count=False, salt='search-page',
+    )
+    try:
+        page = paginator.page(cursor)
+    except pagination.InvalidCursor as exc:
+        raise InvalidCursor(str(exc)) from exc
+    type_facets, genre_facets, count = facets(queryset, content_type, genre)
+    return SearchPage(
+        object_list=list(page), count=count, count_is_exact=True,
+        type_facets=type_facets, genre_facets=genre_facets,
+        next_cursor=page.next_cursor, previous_cursor=page.previous_cursor,
+    )
+
+
+def _rest_page(queryset, boundary, cursor, per_page):
+    """A keyset page of the matches the relevance scan stopped before, in scan order."""
+    ordered = pagination.KeysetPaginator(queryset, per_page, ordering=SCAN_ORDER, with_count=False)
+    paginator = pagination.KeysetPaginator(
+        ordered.after(boundary).select_related('uploaded_by'), per_page,
+        ordering=SCAN_ORDER, with_count=False, salt='search-rest',
+    )
+    try:
+        return paginator.page(cursor or None)
+    except pagination.InvalidCursor as exc:
+        raise InvalidCursor(str(exc)) from exc
+
+
+def _relevance_page(queryset, content_type, genre, cursor, per_page):
+    sort = 'relevance'
+    terms = SORTS[sort]
+    boundary, backwards, rest = decode_cursor(sort, cursor) if cursor else (None, False, None)
+    limit = _scan_limit()
+
+    # Forwards keep the smallest keys after the boundary, backwards the
+    # largest before it: a bounded max-heap (negated keys) or min-heap
+    heap = []
+    count = 0
+    scanned = 0
+    truncated = False
+    last_position = None
+    type_facets = {}
+    genre_facets = {}
+    for key, position, row_type, genres in _scan_rows(queryset, terms, SCAN_ORDER):
+        if scanned == limit:
+            truncated = True
+            break
+        scanned += 1
+        last_position = position
+        type_ok = not content_type or row_type == content_type
+        genre_ok = not genre or genre in genres
+        if genre_ok:
+            type_facets[row_type] = type_facets.get(row_type, 0) + 1
+        if type_ok:
+            for slug, name in genres.items():
+                entry = genre_facets.setdefault(slug, [name, 0])
+                entry[1] += 1
+        if not (type_ok and genre_ok):
+            continue
+        count += 1
+        if rest is not None:
+            continue  # paging past the ranked matches: only the counts are needed
+        if boundary is not None and (key <= boundary if not backwards else key >= boundary):
+            continue
+        item = tuple(-value for value in key) if not backwards else key
+        if len(heap) <= per_page:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    exact = not truncated
+    if truncated:
+        # The type/genre filters are applied here, not in SQL: scale the
+        # planner's estimate by the share of scanned items that passed them
+        estimate = estimate_count(queryset)
+        if estimate:
+            count = max(count, round(estimate * count / scanned))
+    page = SearchPage(
+        object_list=[], count=count, count_is_exact=exact,
+        type_facets=type_facets, genre_facets=_genre_list(genre_facets),
+        truncated=truncated, scan_limit=limit,
+    )
+
+    if rest is not None and truncated:
+        rows = _rest_page(_filtered(queryset, content_type, genre), last_position, rest, per_page)
+        page.object_list = list(rows)
+        if rows.next_cursor:
+            page.next_cursor = _encode_rest_cursor(sort, rows.next_cursor)
+        # Back from the first of these pages is the last ranked page
+        page.previous_cursor = (
+            _encode_rest_cursor(sort, rows.previous_cursor) if rows.previous_cursor
+            else encode_cursor(sort, (_REST,) * len(terms), backwards=True)
+        )
+        return page
+    if rest is not None:
+        # Everything fits in the scan again: start over from the top
+        return _relevance_page(queryset, content_type, genre, None, per_page)
+
+    keys = sorted(tuple(-value for value in item) if not backwards else item for item in heap)
+    has_more = len(keys) > per_page
+    if backwards:
+        keys = keys[-per_page:] if has_more else keys
+        has_next, has_previous = True, has_more
+    else:
+        keys = keys[:per_page]
+        has_next, has_previous = has_more, cursor is not None
+
+    # The id is always the last ranking term
+    page.object_list = load([int(abs(key[-1])) for key in keys])
+    if truncated and (not has_next or boundary == (_REST,) * len(terms)):
+        # The ranked matches end here (or this is the last ranked page, seen
+        # from the unranked ones): the rest follow in scan order
+        page.next_cursor = _encode_rest_cursor(sort)
+    elif keys and has_next:
+        page.next_cursor = encode_cursor(sort, keys[-1])
+    if keys and has_previous:
+        page.previous_cursor = encode_cursor(sort, keys[0], backwards=True)
+    return page
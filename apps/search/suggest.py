@@ -0,0 +1,537 @@
+"""
+Search-as-you-type suggestions from an in-memory prefix index.
+
+The index is a sorted array of normalized keys (titles from each of their
+first words, artist, album and genre names) searched with binary search.
+Each key carries its entry's popularity, so the best ``limit`` entries for
+a prefix are an argpartition over one contiguous slice. Titles weigh their
+item's views; artists, albums and genres the views of all their items.
+
+The arrays live in one snapshot file (SUGGEST_SNAPSHOT_PATH) that every
+worker memory-maps, so they share a single copy through the page cache.
+`manage.py build_suggest_index` writes it; without one, a worker builds it
+in a background thread and suggestions stay empty until it is written.
+Changes since the snapshot (saves, publish toggles, deletes) are kept in a
+small overlay searched alongside it: each change is applied in the worker
+that made it and appended to a log in the shared cache, which the other
+workers replay at most every SUGGEST_REFRESH_INTERVAL seconds. Once the
+overlay holds more than SUGGEST_OVERLAY_MAX_ENTRIES changed items the
+snapshot is rebuilt the same way. Artist and album entries of the snapshot
+only change at the next build.
+
+The snapshot also holds trigram postings of every entry, which fuzzy.py
+searches for typo-tolerant matches.
+"""
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from apps.content.models import Content, Genre
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('title', 'artist', 'album', 'genre')
+TITLE, ARTIST, ALBUM, GENRE = range(len(KINDS))
+DEFAULT_LIMIT = 8
+# Title keys start at each of the first N words ("lofi" finds "Midnight Lofi Beats")
+WORD_KEYS = 3
+MAX_KEY_BYTES = 64
+# Candidates taken per pass before de-duplicating entries
+CANDIDATE_FACTOR = 4
+DEFAULT_REFRESH_INTERVAL = 1.0
+DELTA_TTL = 24 * 60 * 60
+# Changed items searched linearly beside the snapshot before it is rebuilt
+DEFAULT_MAX_OVERLAY = 10_000
+SEQ_KEY = 'suggest:seq'
+DELTA_KEY = 'suggest:delta:{}'
+# Held by the worker rebuilding the snapshot, so only one does
+BUILD_KEY = 'suggest:building'
+BUILD_TIMEOUT = 30 * 60
+MAGIC = b'SUGGEST2'
+
+_SEPARATORS = re.compile(r'[\W_]+')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def snapshot_path():
+    return _setting('SUGGEST_SNAPSHOT_PATH', os.path.join(settings.BASE_DIR, 'var', 'suggest', 'index.bin'))
+
+
+def normalize(text):
+    """Lower-case, accent-free words separated by single spaces."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return _SEPARATORS.sub(' ', text.casefold()).strip()
+
+
+def entry_keys(kind, text):
+    """The index keys (UTF-8) an entry is found under."""
+    return _word_keys(kind, normalize(text).split(' '))
+
+
+def _word_keys(kind, words):
+    if not words[0]:
+        return []
+    starts = range(min(len(words), WORD_KEYS)) if kind == TITLE else range(1)
+    return [' '.join(words[start:]).encode()[:MAX_KEY_BYTES] for start in starts]
+
+
+def trigrams(normalized):
+    """pg_trgm's trigrams of normalized text: each word padded as '  word '."""
+    grams = set()
+    for word in normalized.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def gram_code(gram):
+    return ord(gram[0]) << 42 | ord(gram[1]) << 21 | ord(gram[2])
+
+
+def trigram_postings(normalized_texts):
+    """
+    Return (codes, offsets, entries, counts): the sorted distinct trigram
+    codes, the entries holding each (entries[offsets[i]:offsets[i + 1]],
+    ascending) and every entry's number of distinct trigrams.
+    """
+    lengths, padded = [], []
+    for text in normalized_texts:
+        text = ''.join(f'  {word} ' for word in text.split())
+        padded.append(text)
+        lengths.append(len(text))
+    points = np.frombuffer(''.join(padded).encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    owners = np.repeat(np.arange(len(lengths), dtype=np.int32), lengths)[:-2]
+    codes = points[:-2] << np.uint64(42) | points[1:-1] << np.uint64(21) | points[2:]
+    # Trigrams ending in two spaces straddle two words (or entries)
+    keep = (points[1:-1] != 32) | (points[2:] != 32)
+    codes, owners = codes[keep], owners[keep]
+    # Stable, so each trigram's entries stay ascending; then drop repeats
+    order = np.argsort(codes, kind='stable')
+    codes, owners = codes[order], owners[order]
+    distinct = np.ones(len(codes), dtype=bool)
+    distinct[1:] = (codes[1:] != codes[:-1]) | (owners[1:] != owners[:-1])
+    codes, owners = codes[distinct], owners[distinct]
+    unique, starts = np.unique(codes, return_index=True)
+    counts = np.bincount(owners, minlength=len(lengths)).astype(np.uint16)
+    return unique, np.append(starts, len(codes)).astype(np.int64), owners, counts
+
+
+# ── The snapshot index ────────────────────────
+
+class PrefixIndex:
+    """
+    Immutable arrays: per entry its kind, target id (content or genre),
+    display text, weight and trigram count; per key its bytes, entry and
+    weight, sorted by key; per trigram code the entries containing it.
+    """
+    ARRAYS = (
+        'kinds', 'targets', 'text_blob', 'text_offsets', 'entry_weights', 'entry_grams',
+        'key_blob', 'key_offsets', 'key_entries', 'key_weights',
+        'gram_codes', 'gram_offsets', 'gram_entries',
+    )
+
+    def __init__(self, arrays, meta):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.meta = meta
+        self.size = len(self.key_entries)
+
+    @classmethod
+    def build(cls, entries, meta=None):
+        """``entries`` yields (kind, target, text, weight)."""
+        kinds, targets, texts, weights, normalized = [], [], [], [], []
+        keys, key_entries = [], []
+        for kind, target, text, weight in entries:
+            entry = len(kinds)
+            normalized.append(normalize(text))
+            for key in _word_keys(kind, normalized[-1].split(' ')):
+                keys.append(key)
+                key_entries.append(entry)
+            kinds.append(kind)
+            targets.append(target)
+            texts.append(text.encode())
+            weights.append(weight)
+
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        sorted_keys = [keys[i] for i in order]
+        key_entries = np.asarray(key_entries, dtype=np.int32)[order] if keys else np.zeros(0, np.int32)
+        weights = np.asarray(weights, dtype=np.float32)
+        gram_codes, gram_offsets, gram_entries, entry_grams = trigram_postings(normalized)
+        del normalized
+        arrays = {
+            'kinds': np.asarray(kinds, dtype=np.uint8),
+            'targets': np.asarray(targets, dtype=np.int64),
+            'text_blob': np.frombuffer(b''.join(texts), dtype=np.uint8),
+            'text_offsets': np.cumsum([0] + [len(t) for t in texts], dtype=np.int64),
+            'entry_weights': weights,
+            'entry_grams': entry_grams,
+            'key_blob': np.frombuffer(b''.join(sorted_keys), dtype=np.uint8),
+            'key_offsets': np.cumsum([0] + [len(k) for k in sorted_keys], dtype=np.int64),
+            'key_entries': key_entries,
+            'key_weights': weights[key_entries] if keys else np.zeros(0, np.float32),
+            'gram_codes': gram_codes,
+            'gram_offsets': gram_offsets,
+            'gram_entries': gram_entries,
+        }
+        return cls(arrays, meta or {})
+
+    def save(self, path):
+        """Write the snapshot atomically: a JSON header, then 8-byte aligned arrays."""
+        layout, offset = {}, 0
+        for name in self.ARRAYS:
+            array = np.ascontiguousarray(getattr(self, name))
+            layout[name] = [array.dtype.str, len(array), offset]
+            offset += -(-array.nbytes // 8) * 8
+        header = json.dumps({'arrays': layout, 'meta': self.meta}).encode()
+        header += b' ' * (-(len(MAGIC) + 8 + len(header)) % 8)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                out.write(MAGIC + len(header).to_bytes(8, 'little') + header)
+                for name in self.ARRAYS:
+                    data = np.ascontiguousarray(getattr(self, name)).tobytes()
+                    out.write(data + b'\0' * (-len(data) % 8))
+            # Workers still mapping the old file keep reading it until they reload
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as fh:
+            if fh.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{path} is not a suggestion snapshot')
+            header_size = int.from_bytes(fh.read(8), 'little')
+            header = json.loads(fh.read(header_size))
+        base = len(MAGIC) + 8 + header_size
+        arrays = {}
+        for name, (dtype, length, offset) in header['arrays'].items():
+            if length:
+                arrays[name] = np.memmap(path, dtype=np.dtype(dtype), mode='r', offset=base + offset, shape=(length,))
+            else:
+                arrays[name] = np.zeros(0, dtype=np.dtype(dtype))
+        return cls(arrays, header['meta'])
+
+    def _key(self, i):
+        return self.key_blob[self.key_offsets[i]:self.key_offsets[i + 1]].tobytes()
+
+    def _bisect(self, key):
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def text(self, entry):
+        return self.text_blob[self.text_offsets[entry]:self.text_offsets[entry + 1]].tobytes().decode()
+
+    def range(self, prefix):
+        """The [lo, hi) slice of keys starting with ``prefix`` (bytes)."""
+        # Valid UTF-8 never contains 0xff, so this sorts after every extension
+        return self._bisect(prefix), self._bisect(prefix + b'\xff')
+
+    def top(self, lo, hi, count):
+        """Positions of the ``count`` heaviest keys in [lo, hi), heaviest first."""
+        weights = self.key_weights[lo:hi]
+        if hi - lo > count:
+            best = np.argpartition(weights, hi - lo - count)[hi - lo - count:]
+        else:
+            best = np.arange(hi - lo)
+        return lo + best[np.argsort(-weights[best], kind='stable')]
+
+
+# ── Entries from the database ─────────────────
+
+def content_entries(content):
+    """Overlay entries for one Content row (none when it is not published)."""
+    if not content.is_published:
+        return []
+    weight = float(content.view_count)
+    entries = [(TITLE, content.pk, content.title, weight)]
+    if content.artist_name:
+        entries.append((ARTIST, content.pk, content.artist_name, weight))
+    if content.album:
+        entries.append((ALBUM, content.pk, content.album, weight))
+    return entries
+
+
+def genre_entries(genre):
+    views = genre.content.filter(is_published=True).aggregate(v=Sum('view_count'))['v'] or 0
+    return [(GENRE, genre.pk, genre.name, float(views))]
+
+
+def catalog_entries():
+    """Every entry of a full build, streamed from the database."""
+    published = Content.objects.filter(is_published=True).order_by()
+    for pk, title, views in published.values_list('pk', 'title', 'view_count').iterator(chunk_size=10_000):
+        yield TITLE, pk, title, float(views)
+    # One entry per distinct name, weighted by the views of all its items
+    for kind, field in ((ARTIST, 'artist_name'), (ALBUM, 'album')):
+        grouped = published.exclude(**{field: ''}).values_list(field).annotate(views=Sum('view_count'))
+        for name, views in grouped.iterator(chunk_size=10_000):
+            yield kind, -1, name, float(views or 0)
+    for genre in Genre.objects.annotate(views=Sum('content__view_count')).iterator():
+        yield GENRE, genre.pk, genre.name, float(genre.views or 0)
+
+
+def _current_seq():
+    return cache.get(SEQ_KEY, 0)
+
+
+def build_snapshot(path=None):
+    """Build the index from the database and write the snapshot. Returns the index."""
+    # Changes logged from here on are replayed over this snapshot
+    seq = _current_seq()
+    index = PrefixIndex.build(catalog_entries(), meta={
+        'seq': seq,
+        'built_at': time.time(),
+        'genre_slugs': dict(Genre.objects.values_list('pk', 'slug')),
+    })
+    index.save(path or snapshot_path())
+    return index
+
+
+# ── Per-process state ─────────────────────────
+
+_state_lock = threading.Lock()
+_build_lock = threading.Lock()
+_state = {'pid': None, 'index': None, 'mtime': None, 'checked': 0.0, 'seq': 0, 'overlay': {}}
+
+
+def _apply(seq, target, entries):
+    """Replace ``target``'s ('content:12' / 'genre:3') overlay entries."""
+    current = _state['overlay'].get(target)
+    if current is None or current[0] <= seq:
+        keyed = [(entry, entry_keys(entry[0], entry[2])) for entry in entries]
+        _state['overlay'][target] = (seq, keyed)
+
+
+def _load(path):
+    index = PrefixIndex.load(path)
+    snapshot_seq = index.meta.get('seq', 0)
+    with _state_lock:
+        _state.update(index=index, mtime=os.stat(path).st_mtime_ns)
+        # Changes the snapshot already contains are no longer needed
+        _state['overlay'] = {t: v for t, v in _state['overlay'].items() if v[0] > snapshot_seq}
+        _state['seq'] = max(_state['seq'], snapshot_seq)
+
+
+def _replay():
+    latest = _current_seq()
+    applied = _state['seq']
+    if latest <= applied:
+        return
+    keys = [DELTA_KEY.format(seq) for seq in range(applied + 1, latest + 1)]
+    deltas = cache.get_many(keys)
+    if len(deltas) < len(keys):
+        logger.warning('Suggestion changes %s-%s expired before replay; rebuild the snapshot', applied + 1, latest)
+    with _state_lock:
+        for seq in range(applied + 1, latest + 1):
+            delta = deltas.get(DELTA_KEY.format(seq))
+            if delta:
+                _apply(seq, *delta)
+        _state['seq'] = max(_state['seq'], latest)
+
+
+def _build_in_background(path):
+    """Rebuild the snapshot in a thread unless a worker already is. Returns the thread or None."""
+    if not _build_lock.acquire(blocking=False):
+        return None
+    if not cache.add(BUILD_KEY, os.getpid(), BUILD_TIMEOUT):
+        _build_lock.release()
+        return None
+
+    def build():
+        try:
+            build_snapshot(path)
+        except Exception:
+            logger.exception('Building the suggestion snapshot %s failed', path)
+        finally:
+            cache.delete(BUILD_KEY)
+            _build_lock.release()
+            connection.close()
+
+    thread = threading.Thread(target=build, name='suggest-build', daemon=True)
+    thread.start()
+    return thread
+
+
+def _check_overlay():
+    """Rebuild the snapshot once more items changed since it than the overlay holds."""
+    if len(_state['overlay']) <= _setting('SUGGEST_OVERLAY_MAX_ENTRIES', DEFAULT_MAX_OVERLAY):
+        return
+    path = snapshot_path()
+    try:
+        if os.stat(path).st_mtime_ns != _state['mtime']:
+            return  # a newer snapshot is waiting to be loaded
+    except FileNotFoundError:
+        pass
+    if _build_in_background(path):
+        logger.info('%s suggestion changes since the snapshot; rebuilding %s', len(_state['overlay']), path)
+
+
+def _refresh():
+    path = snapshot_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    if mtime is None:
+        # No suggestions until it is written (the loaded ones, if deleted)
+        _build_in_background(path)
+    elif mtime != _state['mtime']:
+        try:
+            _load(path)
+        except ValueError:
+            # Written by an older release in another format
+            logger.warning('Rebuilding the suggestion snapshot %s', path)
+            _build_in_background(path)
+    if _state['index'] is not None:
+        _replay()
+        _check_overlay()
+
+
+def get_index():
+    """This process's index, reloaded when a newer snapshot or changes appear; None until one is built."""
+    if _state['pid'] != os.getpid():
+        with _state_lock:
+            if _state['pid'] != os.getpid():
+                _state.update(pid=os.getpid(), index=None, mtime=None, checked=0.0, seq=0, overlay={})
+    now = time.monotonic()
+    if now - _state['checked'] >= _setting('SUGGEST_REFRESH_INTERVAL', DEFAULT_REFRESH_INTERVAL):
+        _state['checked'] = now
+        _refresh()
+    return _state['index']
+
+
+def record_change(target, entries):
+    """Publish ``target``'s new entries (an empty list removes it) to every worker."""
+    try:
+        cache.add(SEQ_KEY, 0, timeout=None)
+        seq = cache.incr(SEQ_KEY)
+        cache.set(DELTA_KEY.format(seq), (target, entries), DELTA_TTL)
+    except ValueError:  # the counter was evicted between add() and incr()
+        seq = _state['seq'] + 1
+    with _state_lock:
+        _apply(seq, target, entries)
+    _check_overlay()
+
+
+# ── Querying ──────────────────────────────────
+
+def _overlay_target(kind, target):
+    if kind == TITLE:
+        return f'content:{target}'
+    if kind == GENRE:
+        return f'genre:{target}'
+    return None  # grouped artist/album entries are only replaced by a rebuild
+
+
+def _genre_slug(genre_id):
+    """Slug of a genre created after the snapshot."""
+    return Genre.objects.filter(pk=genre_id).values_list('slug', flat=True).first() or ''
+
+
+def suggest(prefix, limit=DEFAULT_LIMIT):
+    """Up to ``limit`` suggestions for ``prefix``, most popular first."""
+    if not normalize(prefix):
+        return []
+    index = get_index()
+    if index is None:
+        return []  # the snapshot is being built
+    return lookup(index, prefix, limit, _state['overlay'])
+
+
+def lookup(index, prefix, limit=DEFAULT_LIMIT, overlay=None):
+    """Query ``index`` and the ``overlay`` of later changes."""
+    key = normalize(prefix).encode()[:MAX_KEY_BYTES]
+    if not key:
+        return []
+    overlay = overlay or {}
+    best = {}  # (kind, normalized text) -> (weight, kind, target, text)
+
+    def offer(kind, target, text, weight):
+        dedupe = (kind, normalize(text))
+        if dedupe not in best or best[dedupe][0] < weight:
+            best[dedupe] = (weight, kind, target, text)
+
+    for _seq, entries in list(overlay.values()):
+        for (kind, target, text, weight), keys in entries:
+            if any(k.startswith(key) for k in keys):
+                offer(kind, target, text, weight)
+
+    lo, hi = index.range(key)
+    count = limit * CANDIDATE_FACTOR
+    seen = set()
+    while True:
+        # Several keys can belong to one entry, so widen until enough distinct ones
+        positions = index.top(lo, hi, count)
+        for position in positions:
+            entry = int(index.key_entries[position])
+            if entry in seen:
+                continue
+            seen.add(entry)
+            kind, target = int(index.kinds[entry]), int(index.targets[entry])
+            if _overlay_target(kind, target) in overlay:
+                continue  # changed since the snapshot; the overlay has its entries
+            offer(kind, target, index.text(entry), float(index.key_weights[position]))
+        if len(best) >= limit or count >= hi - lo:
+            break
+        count *= 4
+
+    genre_slugs = index.meta.get('genre_slugs', {})
+    results = []
+    for weight, kind, target, text in sorted(best.values(), key=lambda item: -item[0])[:limit]:
+        suggestion = {'text': text, 'kind': KINDS[kind]}
+        if kind == TITLE:
+            suggestion['content_id'] = target
+        elif kind == GENRE:
+            suggestion['genre'] = genre_slugs.get(str(target)) or _genre_slug(target)
+        results.append(suggestion)
+    return results
+
+
+# ── Signal receivers ──────────────────────────
+
+def content_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    watched = {'title', 'artist_name', 'album', 'is_published'}
+    if raw or (update_fields is not None and not set(update_fields) & watched):
+        return
+    entries = content_entries(instance)
+    transaction.on_commit(lambda: record_change(f'content:{instance.pk}', entries))
+
+
+def content_deleted(sender, instance, **kwargs):
+    target = f'content:{instance.pk}'
+    transaction.on_commit(lambda: record_change(target, []))
+
+
+def genre_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: record_change(f'genre:{instance.pk}', genre_entries(instance)))
+
+
+def genre_deleted(sender, instance, **kwargs):
+    target = f'genre:{instance.pk}'
+    transaction.on_commit(lambda: record_change(target, []))
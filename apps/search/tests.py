@@ -0,0 +1,313 @@
+import datetime
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.content.models import Content, Genre
+
+from . import engine, fuzzy, ranking, suggest
+
+
+@skipUnless(connection.vendor == 'sqlite', 'exercises the FTS5 index')
+class EngineTests(TestCase):
+    def setUp(self):
+        if engine.backend() != 'fts5':
+            self.skipTest('SQLite without FTS5')
+        self.user = get_user_model().objects.create_user('creator@example.com', 'Creator', role='creator')
+
+    def create(self, **fields):
+        fields = {'title': 'Untitled', 'content_type': 'music', 'file_path': 'local:x.mp3', 'is_published': True, **fields}
+        with self.captureOnCommitCallbacks(execute=True):
+            return Content.objects.create(uploaded_by=self.user, **fields)
+
+    def matches(self, query):
+        results = engine.search(Content.objects.all(), query).order_by('-search_score', '-id')
+        return [content.title for content in results]
+
+    def test_fields_are_weighted(self):
+        self.create(title='Quiet evening', description='A blue note session')
+        self.create(title='Blue note', description='Late jazz')
+        self.create(title='Morning', album='Blue note sessions')
+        self.assertEqual(self.matches('blue note'), ['Blue note', 'Morning', 'Quiet evening'])
+        # The last word is a prefix
+        self.assertEqual(self.matches('sess'), ['Morning', 'Quiet evening'])
+        self.assertEqual(self.matches('!!'), [])
+
+    def test_popularity_lifts_equal_matches(self):
+        self.create(title='Rain song', view_count=0)
+        self.create(title='Rain song', description='', view_count=5000)
+        scores = list(engine.search(Content.objects.all(), 'rain').order_by('-search_score').values_list('view_count', flat=True))
+        self.assertEqual(scores, [5000, 0])
+
+    def test_index_follows_saves_and_deletes(self):
+        content = self.create(title='Old name')
+        content.title = 'New name'
+        with self.captureOnCommitCallbacks(execute=True):
+            content.save()
+        self.assertEqual(self.matches('old'), [])
+        self.assertEqual(self.matches('new'), ['New name'])
+
+        # Saves that leave the indexed fields alone do not reindex
+        with mock.patch.object(engine, 'index') as index, self.captureOnCommitCallbacks(execute=True):
+            content.save(update_fields=['view_count'])
+        index.assert_not_called()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            content.delete()
+        self.assertEqual(self.matches('new'), [])
+
+    def test_prune_drops_orphaned_rows(self):
+        content = self.create(title='Ghost')
+        Content.objects.filter(pk=content.pk).delete()  # a bulk delete sends no signal per row
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {engine.FTS_TABLE}')
+            self.assertEqual(cursor.fetchone()[0], 1)
+        self.assertEqual(engine.prune(), 1)
+        self.assertEqual(engine.prune(), 0)
+
+    def test_api_search_uses_the_index(self):
+        self.create(title='Something else', description='jazz mentioned')
+        self.create(title='Jazz standards')
+        response = APIClient().get('/api/v1/content/', {'search': 'jazz'})
+        self.assertEqual([item['title'] for item in response.json()['results']], ['Jazz standards', 'Something else'])
+
+
+class ApiSearchTermsTests(TestCase):
+    def test_search_without_terms_lists_everything(self):
+        user = get_user_model().objects.create_user('creator@example.com', 'Creator', role='creator')
+        for title, age in (('Older', 1), ('Newer', 0)):
+            Content.objects.create(
+                title=title, content_type='music', file_path='local:x.mp3', uploaded_by=user, is_published=True,
+                uploaded_at=timezone.now() - datetime.timedelta(days=age),
+            )
+        # Blank and separator-only queries have no terms: no relevance to order by
+        for search in (' ', ',', ' , '):
+            with self.subTest(search=search):
+                response = APIClient().get('/api/v1/content/', {'search': search})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([item['title'] for item in response.json()['results']], ['Newer', 'Older'])
+
+
+def _walk(queryset, sort, per_page, **filters):
+    """Every page from the first on: (pages, ids in order)."""
+    pages, ids, cursor = [], [], None
+    while True:
+        page = ranking.search_page(queryset, sort, cursor=cursor, per_page=per_page, **filters)
+        pages.append(page)
+        ids.extend(item.pk for item in page)
+        cursor = page.next_cursor
+        if cursor is None or len(pages) > 20:
+            return pages, ids
+
+
+@override_settings(SEARCH_SCAN_LIMIT=5)
+class SearchPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user('creator@example.com', 'Creator', role='creator')
+        cls.jazz = Genre.objects.create(name='Jazz', slug='jazz')
+        cls.rock = Genre.objects.create(name='Rock', slug='rock')
+        start = timezone.now() - datetime.timedelta(days=30)
+        cls.items = []
+        for i in range(12):
+            content = Content.objects.create(
+                title=f'Night song {i}', content_type='music' if i % 3 else 'video', file_path=f'local:{i}.mp3',
+                uploaded_by=user, is_published=True, view_count=i * 10, trending_score=float(i % 5),
+                uploaded_at=start + datetime.timedelta(days=i),
+            )
+            content.genre.set([cls.jazz] if i % 2 else [cls.jazz, cls.rock])
+            cls.items.append(content)
+        engine.index([item.pk for item in cls.items])
+
+    def published(self):
+        return Content.objects.filter(is_published=True)
+
+    def test_browsing_by_date_pages_past_the_scan_limit(self):
+        pages, ids = _walk(self.published(), 'newest', 5)
+        self.assertEqual(ids, [item.pk for item in reversed(self.items)])
+        self.assertTrue(all(page.count == 12 and page.count_is_exact and not page.truncated for page in pages))
+
+        # And back again from the last page
+        previous = ranking.search_page(self.published(), 'newest', cursor=pages[-1].previous_cursor, per_page=5)
+        self.assertEqual([item.pk for item in previous], ids[5:10])
+
+    def test_popular_facets_are_disjunctive(self):
+        page = ranking.search_page(self.published(), 'popular', content_type='video', genre='rock', per_page=5)
+        self.assertEqual([item.pk for item in page], [self.items[6].pk, self.items[0].pk])
+        self.assertEqual(page.count, 2)
+        # Types counted within the genre, genres within the type
+        self.assertEqual(page.type_facets, {'music': 4, 'video': 2})
+        self.assertEqual(
+            page.genre_facets,
+            [{'slug': 'jazz', 'name': 'Jazz', 'count': 4}, {'slug': 'rock', 'name': 'Rock', 'count': 2}],
+        )
+
+    def test_relevance_ranks_within_the_scan_then_continues(self):
+        results = engine.search(self.published(), 'night')
+        pages, ids = _walk(results, 'relevance', 2)
+        self.assertEqual(sorted(ids), sorted(item.pk for item in self.items))
+
+        first = pages[0]
+        self.assertTrue(first.truncated)
+        self.assertEqual(first.scan_limit, 5)
+        self.assertFalse(first.count_is_exact)
+        # The five most trending, best scored (most viewed) first
+        scanned = sorted(self.items, key=lambda item: (-item.trending_score, -item.pk))[:5]
+        ranked = sorted(scanned, key=lambda item: (-item.view_count, -item.pk))
+        self.assertEqual(ids[:5], [item.pk for item in ranked])
+        # The rest follow in scan order
+        rest = sorted(self.items, key=lambda item: (-item.trending_score, -item.pk))[5:]
+        self.assertEqual(ids[5:], [item.pk for item in rest])
+
+        # Back from the first unranked page to the last ranked one
+        previous = ranking.search_page(results, 'relevance', cursor=pages[3].previous_cursor, per_page=2)
+        self.assertEqual([item.pk for item in previous], ids[3:5])
+        self.assertEqual(ranking.decode_cursor('relevance', previous.next_cursor), (None, False, ''))
+
+    @override_settings(SEARCH_SCAN_LIMIT=100)
+    def test_relevance_within_the_limit_is_exact(self):
+        results = engine.search(self.published(), 'night')
+        pages, ids = _walk(results, 'relevance', 5, content_type='music')
+        self.assertEqual(len(ids), 8)
+        self.assertTrue(all(page.count == 8 and page.count_is_exact and not page.truncated for page in pages))
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ranking.InvalidCursor):
+            ranking.search_page(self.published(), 'newest', cursor='forged')
+        with self.assertRaises(ranking.InvalidCursor):
+            ranking.search_page(self.published(), 'relevance', cursor='forged')
+
+    def test_results_page_says_when_relevance_was_truncated(self):
+        response = self.client.get('/search/', {'q': 'night'})
+        self.assertContains(response, 'among the 5 top trending matches')
+        response = self.client.get('/search/', {'q': 'night', 'sort': 'newest'})
+        self.assertNotContains(response, 'top trending matches')
+
+
+def _wait_for_builds():
+    for thread in threading.enumerate():
+        if thread.name == 'suggest-build':
+            thread.join(10)
+
+
+class SuggestSnapshotTests(TransactionTestCase):
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        self.path = os.path.join(tmp, 'index.bin')
+        settings_override = override_settings(SUGGEST_SNAPSHOT_PATH=self.path, SUGGEST_REFRESH_INTERVAL=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+        suggest._state.update(pid=None)
+        self.addCleanup(suggest._state.update, pid=None)
+        self.user = get_user_model().objects.create_user('creator@example.com', 'Creator', role='creator')
+
+    def create(self, title):
+        return Content.objects.create(
+            title=title, content_type='music', file_path='local:x.mp3', uploaded_by=self.user, is_published=True,
+        )
+
+    def test_missing_snapshot_is_built_in_the_background(self):
+        self.create('Night Drive')
+        release = threading.Event()
+        build_snapshot = suggest.build_snapshot
+
+        def slow_build(path=None):
+            release.wait(10)
+            return build_snapshot(path)
+
+        with mock.patch.object(suggest, 'build_snapshot', side_effect=slow_build) as build:
+            self.assertEqual(suggest.suggest('nig'), [])
+            self.assertEqual(suggest.suggest('nig'), [])
+            release.set()
+            _wait_for_builds()
+        build.assert_called_once_with(self.path)
+        self.assertEqual([s['text'] for s in suggest.suggest('nig')], ['Night Drive'])
+
+    @override_settings(SUGGEST_OVERLAY_MAX_ENTRIES=2)
+    def test_overlay_past_the_cap_triggers_a_rebuild(self):
+        self.create('Night Drive')
+        suggest.build_snapshot(self.path)
+        self.assertEqual(len(suggest.suggest('nig')), 1)
+
+        # Each save records its change on commit
+        self.create('Night Owl')
+        self.create('Nightfall')
+        self.assertFalse([t for t in threading.enumerate() if t.name == 'suggest-build'])
+        self.assertEqual(len(suggest._state['overlay']), 2)
+
+        self.create('Nightingale')
+        _wait_for_builds()
+        # The new snapshot holds every change, so the overlay empties
+        self.assertEqual(len(suggest.suggest('nig')), 4)
+        self.assertEqual(suggest._state['overlay'], {})
+
+
+class FuzzyTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.index = suggest.PrefixIndex.build([
+            (suggest.ARTIST, -1, 'Beyoncé', 9000.0),
+            (suggest.ARTIST, -1, 'Beyond', 10.0),
+            (suggest.TITLE, 1, 'Lofi Hip Hop Beats', 500.0),
+            (suggest.TITLE, 2, 'Midnight Drive', 50.0),
+            (suggest.TITLE, 3, 'Midnight Drive Home', 5000.0),
+            (suggest.GENRE, 1, 'Hip Hop', 100000.0),
+        ])
+
+    def test_levenshtein(self):
+        self.assertEqual(fuzzy.levenshtein('kitten', 'sitting'), 3)
+        self.assertEqual(fuzzy.levenshtein('', 'abc'), 3)
+        self.assertEqual(fuzzy.levenshtein('same', 'same'), 0)
+
+    def test_corrections(self):
+        self.assertEqual(fuzzy.lookup(self.index, 'beyonse'), 'Beyoncé')
+        self.assertEqual(fuzzy.lookup(self.index, 'lofi hiphop'), 'Lofi Hip Hop Beats')
+        self.assertIsNone(fuzzy.lookup(self.index, 'xyzzy'))
+        # The query itself is never offered as its correction
+        self.assertEqual(fuzzy.lookup(self.index, 'beyond'), 'Beyoncé')
+
+    def test_popularity_breaks_ties(self):
+        # Both hold "midnight drive"; the more watched is offered
+        self.assertEqual(fuzzy.lookup(self.index, 'midnite drive'), 'Midnight Drive Home')
+
+    def test_overlay_replaces_changed_entries(self):
+        overlay = {'content:1': (1, [])}  # deleted since the snapshot
+        self.assertIsNone(fuzzy.lookup(self.index, 'lofi hiphop', overlay))
+        entry = (suggest.TITLE, 4, 'Lofi Hiphop Mix', 1.0)
+        overlay['content:4'] = (2, [(entry, suggest.entry_keys(suggest.TITLE, entry[2]))])
+        self.assertEqual(fuzzy.lookup(self.index, 'lofi hiphopp', overlay), 'Lofi Hiphop Mix')
+
+
+class DidYouMeanTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        settings_override = override_settings(SUGGEST_SNAPSHOT_PATH=os.path.join(tmp, 'index.bin'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        suggest._state.update(pid=None)
+        self.addCleanup(suggest._state.update, pid=None)
+
+    def test_search_without_results_shows_the_correction(self):
+        user = get_user_model().objects.create_user('creator@example.com', 'Creator', role='creator')
+        with self.captureOnCommitCallbacks(execute=True):
+            Content.objects.create(
+                title='Halo', artist_name='Beyoncé', content_type='music', file_path='local:x.mp3',
+                uploaded_by=user, is_published=True,
+            )
+        suggest.build_snapshot()
+        response = self.client.get('/search/', {'q': 'beyonse'})
+        self.assertEqual(response.context['corrected_query'], 'Beyoncé')
+        self.assertEqual([item.title for item in response.context['results']], ['Halo'])
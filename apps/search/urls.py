@@ -5,4 +5,5 @@ app_name = 'search'
 
 urlpatterns = [
     path('', views.search_view, name='search'),
+    path('suggest/', views.suggest_view, name='suggest'),
 ]
@@ -1,7 +1,35 @@
+from dataclasses import replace
+
+from django.http import JsonResponse
 from django.shortcuts import render
-from django.db.models import Q
-from apps.content.models import Content, Genre
-from apps.users.models import User
+from django.views.decorators.http import require_GET
+from apps.content import result_cache
+from apps.content.models import Content
+from . import engine, fuzzy, ranking, suggest
+
+
+def _search(query, content_type, genre_slug, sort, cursor):
+    """Return (page, corrected_query) for one search page."""
+    published = Content.objects.filter(is_published=True)
+    results = published
+    rank_by = sort
+    corrected_query = None
+    if query:
+        results = engine.search(published, query)
+        # Typos: show the closest title/artist/album's matches instead
+        if not results.exists():
+            corrected_query = fuzzy.did_you_mean(query)
+            if corrected_query:
+                results = engine.search(published, corrected_query)
+    elif sort == 'relevance':
+        rank_by = 'popular'  # nothing to be relevant to
+
+    # The page, the count and the sidebar's facet counts
+    try:
+        page = ranking.search_page(results, rank_by, content_type, genre_slug, cursor)
+    except ranking.InvalidCursor:
+        page = ranking.search_page(results, rank_by, content_type, genre_slug)
+    return page, corrected_query
 
 
 def search_view(request):
@@ -9,41 +37,46 @@ def search_view(request):
     content_type = request.GET.get('type', '')
     genre_slug = request.GET.get('genre', '')
     sort = request.GET.get('sort', 'relevance')
+    cursor = request.GET.get('cursor', '')
+    computed = []
 
-    results = Content.objects.filter(is_published=True)
+    def compute():
+        computed.append(_search(query, content_type, genre_slug, sort, cursor))
+        page, corrected_query = computed[0]
+        return {'page': replace(page, object_list=[item.pk for item in page]), 'corrected_query': corrected_query}
 
-    if query:
-        results = results.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query) |
-            Q(artist_name__icontains=query) |
-            Q(album__icontains=query)
-        )
-
-    if content_type:
-        results = results.filter(content_type=content_type)
-
-    if genre_slug:
-        results = results.filter(genre__slug=genre_slug)
-
-    if sort == 'popular':
-        results = results.order_by('-view_count')
-    elif sort == 'newest':
-        results = results.order_by('-uploaded_at')
-    elif sort == 'oldest':
-        results = results.order_by('uploaded_at')
+    # Facets count every match, so search pages depend on the whole catalogue
+    params = {
+        'q': result_cache.normalize_query(query), 'type': content_type, 'genre': genre_slug,
+        'sort': sort, 'cursor': cursor,
+    }
+    cached = result_cache.cached('search', params, compute)
+    if computed:
+        page, corrected_query = computed[0]
     else:
-        results = results.order_by('-view_count')
-
-    genres = Genre.objects.all()
+        page = replace(cached['page'], object_list=ranking.load(cached['page'].object_list))
+        corrected_query = cached['corrected_query']
 
     context = {
         'query': query,
-        'results': results,
-        'result_count': results.count(),
-        'genres': genres,
+        'corrected_query': corrected_query,
+        'results': page,
+        'result_count': page.count,
+        'result_count_exact': page.count_is_exact,
+        'type_facets': page.type_facets,
+        'genre_facets': page.genre_facets,
         'content_type': content_type,
         'genre_slug': genre_slug,
         'sort': sort,
     }
     return render(request, 'search/results.html', context)
+
+
+@require_GET
+def suggest_view(request):
+    query = request.GET.get('q', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', suggest.DEFAULT_LIMIT)), 1), 20)
+    except ValueError:
+        limit = suggest.DEFAULT_LIMIT
+    return JsonResponse({'query': query, 'suggestions': suggest.suggest(query, limit)})
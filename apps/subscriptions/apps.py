@@ -5,3 +5,15 @@ class SubscriptionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.subscriptions'
     verbose_name = 'Subscriptions'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from apps.payments.models import Payment
+        from . import entitlements
+        from .models import Subscription
+
+        for model in (Subscription, Payment):
+            name = model._meta.model_name
+            post_save.connect(entitlements.billing_changed, sender=model, dispatch_uid=f'entitlement_{name}_saved')
+            post_delete.connect(entitlements.billing_changed, sender=model, dispatch_uid=f'entitlement_{name}_deleted')
@@ -0,0 +1,102 @@
+"""
+Premium entitlements: which plan, if any, a user currently has.
+
+active_plan() resolves a user's active subscription once per request (the
+answer is kept on the user object, which AuthenticationMiddleware creates
+per request) and caches it across requests until the subscription stops
+counting as active at the end of its end_date, or until one of the user's
+subscriptions or payments changes, whichever comes first. Users without a
+plan are cached for ENTITLEMENT_CACHE_TIMEOUT seconds; 0 turns the
+cross-request cache off. User.has_active_subscription
+and can_stream() read from here, so premium checks on the hot path cost no
+queries.
+"""
+import datetime
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Subscription
+
+CACHE_KEY = 'entitlement:user:{}'
+DEFAULT_TIMEOUT = 60 * 60
+# Even entitlements lasting longer are re-read this often
+MAX_TIMEOUT = 7 * 24 * 60 * 60
+# Attribute memoizing the answer on a user object for one request
+MEMO = '_entitlement'
+_MISSING = object()
+
+
+@dataclass(frozen=True)
+class Entitlement:
+    subscription_id: int
+    plan_id: int
+    plan_name: str
+    plan_slug: str
+    end_date: datetime.date
+
+
+def _timeout():
+    return getattr(settings, 'ENTITLEMENT_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def _resolve(user_id):
+    row = (
+        Subscription.objects.filter(user_id=user_id, status='active', end_date__gte=timezone.now().date())
+        .order_by('-end_date')
+        .values_list('pk', 'plan_id', 'plan__name', 'plan__slug', 'end_date')
+        .first()
+    )
+    return Entitlement(*row) if row else None
+
+
+def _expires_in(entitlement):
+    """Seconds until the entitlement lapses (Subscription.is_active uses the UTC date), capped."""
+    if entitlement is None:
+        return _timeout()
+    lapses = datetime.datetime.combine(
+        entitlement.end_date + datetime.timedelta(days=1), datetime.time.min, tzinfo=datetime.timezone.utc,
+    )
+    return max(1, min(int((lapses - timezone.now()).total_seconds()), MAX_TIMEOUT))
+
+
+def active_plan(user):
+    """The user's current Entitlement, or None for free (and anonymous) users."""
+    if not user.is_authenticated:
+        return None
+    entitlement = getattr(user, MEMO, _MISSING)
+    if entitlement is _MISSING:
+        if not _timeout():
+            entitlement = _resolve(user.pk)
+        else:
+            key = CACHE_KEY.format(user.pk)
+            entitlement = cache.get(key, _MISSING)
+            if entitlement is _MISSING or (entitlement and entitlement.end_date < timezone.now().date()):
+                entitlement = _resolve(user.pk)
+                cache.set(key, entitlement, _expires_in(entitlement))
+        setattr(user, MEMO, entitlement)
+    return entitlement
+
+
+def can_stream(user, content):
+    """Free content streams for everyone, premium content for subscribers."""
+    return not content.is_premium or active_plan(user) is not None
+
+
+def invalidate(*user_ids):
+    cache.delete_many([CACHE_KEY.format(user_id) for user_id in set(user_ids)])
+
+
+# ── Signal receivers ──────────────────────────
+
+def billing_changed(sender, instance, **kwargs):
+    """post_save/post_delete receiver for Subscription and Payment."""
+    # The saving request may check again, through the same user object
+    user = instance._state.fields_cache.get('user')
+    if user is not None and hasattr(user, MEMO):
+        delattr(user, MEMO)
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate(user_id))
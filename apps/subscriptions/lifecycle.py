@@ -0,0 +1,113 @@
+"""
+Subscription lifecycle: expiring and renewing subscriptions past their end_date.
+
+sweep() walks the due subscriptions (active, with an end_date before today)
+through the (status, end_date) index, ``batch_size`` at a time, so memory
+stays bounded however many are due. Each batch, in one transaction:
+
+* renews auto-renewing subscriptions of plans still on sale that lapsed at
+  most SUBSCRIPTION_RENEWAL_GRACE_DAYS ago (a sweep that did not run over a
+  weekend still renews them): the new period starts the day after the old
+  end_date;
+* marks the rest expired.
+
+Charging renewals is out of scope here: there are no stored payment
+methods to charge, so no Payment is recorded for a renewal (a completed
+one would count money never collected, a pending one would never be
+resolved).
+
+Updates are set-based: one UPDATE for the batch's expiries and one per
+(plan, end_date) group of renewals. Several nodes can sweep at once: on
+PostgreSQL each batch locks its rows with SKIP LOCKED, so nodes take
+disjoint batches; SQLite has no row locks, so a batch takes the database
+write lock before reading and other sweepers wait for it to commit.
+"""
+import datetime
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import entitlements
+from .models import Plan, Subscription
+
+BATCH_SIZE = 1000
+DEFAULT_GRACE_DAYS = 3
+
+
+@dataclass
+class SweepResult:
+    expired: int = 0
+    renewed: int = 0
+    batches: int = 0
+
+    @property
+    def processed(self):
+        return self.expired + self.renewed
+
+
+def _grace_days():
+    return getattr(settings, 'SUBSCRIPTION_RENEWAL_GRACE_DAYS', DEFAULT_GRACE_DAYS)
+
+
+def due(today):
+    """Active subscriptions whose last day has passed, oldest first."""
+    return Subscription.objects.filter(status='active', end_date__lt=today).order_by('end_date', 'pk')
+
+
+def _claim(today, batch_size):
+    """Lock the next batch of due rows for this transaction and return them."""
+    rows = due(today)
+    if connection.features.has_select_for_update_skip_locked:
+        rows = rows.select_for_update(skip_locked=True)
+    elif connection.vendor == 'sqlite':
+        # A write that matches nothing still takes the write lock, so the
+        # rows read below cannot be claimed by another sweeper meanwhile
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {Subscription._meta.db_table} SET id = id WHERE 0')
+    return list(rows.values_list('pk', 'user_id', 'plan_id', 'end_date', 'auto_renew')[:batch_size])
+
+
+def _sweep_batch(rows, plans, renewable_from):
+    """Expire or renew one claimed batch. Returns (expired, renewed)."""
+    expire, renew = [], defaultdict(list)
+    for pk, _user_id, plan_id, end_date, auto_renew in rows:
+        plan = plans.get(plan_id)
+        if auto_renew and plan and plan.is_active and plan.duration_days and end_date >= renewable_from:
+            renew[plan, end_date].append(pk)
+        else:
+            expire.append(pk)
+
+    if expire:
+        Subscription.objects.filter(pk__in=expire).update(status='expired')
+    renewed = 0
+    for (plan, end_date), subscriptions in renew.items():
+        renewed += Subscription.objects.filter(pk__in=subscriptions).update(
+            start_date=end_date + datetime.timedelta(days=1),
+            end_date=end_date + datetime.timedelta(days=plan.duration_days),
+        )
+    return len(expire), renewed
+
+
+def sweep(today=None, batch_size=BATCH_SIZE, grace_days=None):
+    """Expire or renew every due subscription. Returns a SweepResult."""
+    today = today or timezone.now().date()
+    grace_days = _grace_days() if grace_days is None else grace_days
+    renewable_from = today - datetime.timedelta(days=grace_days)
+    plans = {plan.pk: plan for plan in Plan.objects.all()}
+    result = SweepResult()
+    while True:
+        with transaction.atomic():
+            rows = _claim(today, batch_size)
+            if not rows:
+                break
+            expired, renewed = _sweep_batch(rows, plans, renewable_from)
+            # Set-based updates send no signals: drop the cached entitlements here
+            user_ids = [row[1] for row in rows]
+            transaction.on_commit(lambda user_ids=user_ids: entitlements.invalidate(*user_ids))
+        result.expired += expired
+        result.renewed += renewed
+        result.batches += 1
+    return result
@@ -0,0 +1,32 @@
+import datetime
+import resource
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.subscriptions.lifecycle import BATCH_SIZE, sweep
+
+
+class Command(BaseCommand):
+    help = (
+        'Expire or auto-renew subscriptions past their end date '
+        '(safe to run on several nodes at once; schedule it daily or more often).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--date', type=datetime.date.fromisoformat,
+                            help='Sweep as of this day (YYYY-MM-DD) instead of today')
+        parser.add_argument('--grace-days', type=int,
+                            help='Renew lapsed subscriptions this many days old (default SUBSCRIPTION_RENEWAL_GRACE_DAYS)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        result = sweep(today=options['date'], batch_size=options['batch_size'], grace_days=options['grace_days'])
+        elapsed = time.perf_counter() - started
+        peak_mib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(self.style.SUCCESS(
+            f'Expired {result.expired} and renewed {result.renewed} subscription(s) in {result.batches} '
+            f'batch(es), {elapsed:.2f}s: {result.processed / elapsed if elapsed else 0:.0f}/s, '
+            f'peak RSS {peak_mib:.0f} MiB.'
+        ))
@@ -39,6 +39,10 @@ class Subscription(models.Model):
     class Meta:
         db_table = 'subscriptions'
         ordering = ['-created_at']
+        indexes = [
+            # Due subscriptions for the lifecycle sweeper (lifecycle.py)
+            models.Index(fields=['status', 'end_date'], name='subscriptions_status_end_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.plan} ({self.status})"
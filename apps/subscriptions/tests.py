@@ -0,0 +1,198 @@
+import datetime
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.content.models import Content
+from apps.payments import views as payment_views
+from apps.payments.models import Payment
+
+from . import entitlements, lifecycle
+from .models import Plan, Subscription
+
+TODAY = datetime.date(2026, 3, 10)
+
+
+@override_settings(SUBSCRIPTION_RENEWAL_GRACE_DAYS=3)
+class SweepTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = Plan.objects.create(name='Premium', slug='premium', description='', price=Decimal('9.99'), duration_days=30)
+        cls.retired = Plan.objects.create(name='Old', slug='old', description='', price=Decimal('4.99'), is_active=False)
+        cls.users = [get_user_model().objects.create_user(f'user{i}@example.com', f'User {i}') for i in range(8)]
+
+    def subscribe(self, user, end_date, plan=None, auto_renew=True, status='active'):
+        return Subscription.objects.create(
+            user=user, plan=plan or self.plan, status=status, auto_renew=auto_renew,
+            start_date=end_date - datetime.timedelta(days=29), end_date=end_date,
+        )
+
+    def test_expires_and_renews_due_subscriptions(self):
+        renewing = self.subscribe(self.users[0], TODAY - datetime.timedelta(days=1))
+        late = self.subscribe(self.users[1], TODAY - datetime.timedelta(days=3))
+        too_late = self.subscribe(self.users[2], TODAY - datetime.timedelta(days=4))
+        cancelled_renewal = self.subscribe(self.users[3], TODAY - datetime.timedelta(days=1), auto_renew=False)
+        retired = self.subscribe(self.users[4], TODAY - datetime.timedelta(days=1), plan=self.retired)
+        current = self.subscribe(self.users[5], TODAY)
+        cancelled = self.subscribe(self.users[6], TODAY - datetime.timedelta(days=1), status='cancelled')
+
+        result = lifecycle.sweep(TODAY, batch_size=2)
+        self.assertEqual((result.renewed, result.expired, result.batches), (2, 3, 3))
+
+        for subscription in (renewing, late):
+            old_end = subscription.end_date
+            subscription.refresh_from_db()
+            self.assertEqual(subscription.status, 'active')
+            self.assertEqual(subscription.start_date, old_end + datetime.timedelta(days=1))
+            self.assertEqual(subscription.end_date, old_end + datetime.timedelta(days=30))
+        for subscription in (too_late, cancelled_renewal, retired):
+            subscription.refresh_from_db()
+            self.assertEqual(subscription.status, 'expired')
+        for subscription, status in ((current, 'active'), (cancelled, 'cancelled')):
+            subscription.refresh_from_db()
+            self.assertEqual(subscription.status, status)
+
+        # No charge is made, so none is recorded as collected (or owed)
+        self.assertFalse(Payment.objects.exists())
+
+        # Everything due was handled: a second sweep finds nothing
+        self.assertEqual(lifecycle.sweep(TODAY).processed, 0)
+
+    def test_renews_cycle_after_cycle(self):
+        subscription = self.subscribe(self.users[0], TODAY - datetime.timedelta(days=1))
+        day = TODAY
+        for cycle in range(3):
+            with self.subTest(cycle=cycle):
+                old_end = subscription.end_date
+                self.assertEqual(lifecycle.sweep(day).renewed, 1)
+                subscription.refresh_from_db()
+                self.assertEqual(subscription.status, 'active')
+                self.assertEqual(subscription.end_date, old_end + datetime.timedelta(days=30))
+                # Nothing more to do until the new period ends
+                self.assertEqual(lifecycle.sweep(subscription.end_date).processed, 0)
+                day = subscription.end_date + datetime.timedelta(days=1)
+        self.assertFalse(Payment.objects.exists())
+
+        subscription.auto_renew = False
+        subscription.save()
+        self.assertEqual(lifecycle.sweep(day).expired, 1)
+
+    def test_sweep_drops_cached_entitlements(self):
+        user = self.users[7]
+        self.subscribe(user, TODAY - datetime.timedelta(days=5))
+        with override_settings(ENTITLEMENT_CACHE_TIMEOUT=60):
+            cache.set(entitlements.CACHE_KEY.format(user.pk), 'stale')
+            with self.captureOnCommitCallbacks(execute=True):
+                lifecycle.sweep(TODAY)
+            self.assertIsNone(cache.get(entitlements.CACHE_KEY.format(user.pk)))
+
+    @override_settings(STRIPE_WEBHOOK_SECRET='whsec_test')
+    def test_failed_charge_expires_the_subscription(self):
+        subscription = self.subscribe(self.users[0], TODAY + datetime.timedelta(days=20))
+        Payment.objects.create(
+            user=self.users[0], subscription=subscription, amount=self.plan.price, stripe_payment_intent='pi_1',
+        )
+
+        event = {'type': 'payment_intent.payment_failed', 'data': {'object': {'id': 'pi_1'}}}
+        with mock.patch.object(payment_views.stripe.Webhook, 'construct_event', return_value=event):
+            response = self.client.post('/payments/webhook/stripe/', b'{}', content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Payment.objects.get().status, 'failed')
+        subscription.refresh_from_db()
+        self.assertEqual(subscription.status, 'expired')
+
+
+@override_settings(ENTITLEMENT_CACHE_TIMEOUT=60)
+class EntitlementTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.plan = Plan.objects.create(name='Premium', slug='premium', description='', price=Decimal('9.99'), duration_days=30)
+        cls.user = get_user_model().objects.create_user('listener@example.com', 'Listener')
+
+    def setUp(self):
+        cache.clear()
+
+    def fresh_user(self):
+        """The user as a new request would load it."""
+        return get_user_model().objects.get(pk=self.user.pk)
+
+    def subscribe(self, end_date=None):
+        today = timezone.now().date()
+        with self.captureOnCommitCallbacks(execute=True):
+            return Subscription.objects.create(
+                user=self.user, plan=self.plan, status='active',
+                start_date=today, end_date=end_date or today + datetime.timedelta(days=29),
+            )
+
+    def test_resolved_once_per_request_and_cached_across_requests(self):
+        subscription = self.subscribe()
+        user = self.fresh_user()
+        with self.assertNumQueries(1):
+            self.assertEqual(entitlements.active_plan(user).subscription_id, subscription.pk)
+            self.assertTrue(user.has_active_subscription)
+            self.assertTrue(user.has_active_subscription)
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertEqual(entitlements.active_plan(user).plan_slug, 'premium')
+
+    def test_free_users_are_cached_too(self):
+        entitlements.active_plan(self.fresh_user())
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertIsNone(entitlements.active_plan(user))
+        self.assertIsNone(entitlements.active_plan(AnonymousUser()))
+
+    def test_billing_changes_invalidate(self):
+        user = self.fresh_user()
+        self.assertIsNone(entitlements.active_plan(user))
+        subscription = self.subscribe()
+        self.assertIsNotNone(entitlements.active_plan(self.fresh_user()))
+
+        # The saving request sees its own change through the same user object
+        subscription.user = user
+        subscription.status = 'cancelled'
+        with self.captureOnCommitCallbacks(execute=True):
+            subscription.save()
+        self.assertIsNone(entitlements.active_plan(user))
+        self.assertIsNone(entitlements.active_plan(self.fresh_user()))
+
+        Subscription.objects.filter(pk=subscription.pk).update(status='active')
+        self.assertIsNone(entitlements.active_plan(self.fresh_user()))  # updates skip the signal
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(user=self.user, subscription=subscription, amount=self.plan.price, status='completed')
+        self.assertIsNotNone(entitlements.active_plan(self.fresh_user()))
+
+    def test_cached_until_the_plan_lapses(self):
+        today = timezone.now().date()
+        self.subscribe(end_date=today)
+        entitlement = entitlements.active_plan(self.fresh_user())
+        midnight = datetime.datetime.combine(today + datetime.timedelta(days=1), datetime.time.min, tzinfo=datetime.timezone.utc)
+        with mock.patch.object(entitlements.timezone, 'now', return_value=midnight - datetime.timedelta(seconds=90)):
+            self.assertEqual(entitlements._expires_in(entitlement), 90)
+
+        # A copy cached past that point is not trusted
+        with mock.patch.object(entitlements.timezone, 'now', return_value=midnight + datetime.timedelta(seconds=1)):
+            self.assertIsNone(entitlements.active_plan(self.fresh_user()))
+
+    @override_settings(ENTITLEMENT_CACHE_TIMEOUT=0)
+    def test_no_shared_cache(self):
+        self.subscribe()
+        entitlements.active_plan(self.fresh_user())
+        self.assertIsNone(cache.get(entitlements.CACHE_KEY.format(self.user.pk)))
+        user = self.fresh_user()
+        with self.assertNumQueries(1):
+            entitlements.active_plan(user)
+
+    def test_can_stream(self):
+        free = Content(title='Free', is_premium=False)
+        premium = Content(title='Premium', is_premium=True)
+        self.assertTrue(entitlements.can_stream(AnonymousUser(), free))
+        self.assertFalse(entitlements.can_stream(AnonymousUser(), premium))
+        self.assertFalse(entitlements.can_stream(self.fresh_user(), premium))
+        self.subscribe()
+        self.assertTrue(entitlements.can_stream(self.fresh_user(), premium))
@@ -2,29 +2,22 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
+from .entitlements import active_plan
 from .models import Plan, Subscription
 
 
 def plans_view(request):
     plans = Plan.objects.filter(is_active=True)
-    current_sub = None
-    if request.user.is_authenticated:
-        current_sub = request.user.subscriptions.filter(
-            status='active', end_date__gte=timezone.now().date()
-        ).first()
     return render(request, 'subscriptions/plans.html', {
         'plans': plans,
-        'current_subscription': current_sub
+        'current_subscription': active_plan(request.user)
     })
 
 
 @login_required
 def subscribe_view(request, plan_slug):
     plan = get_object_or_404(Plan, slug=plan_slug, is_active=True)
-    active_sub = request.user.subscriptions.filter(
-        status='active', end_date__gte=timezone.now().date()
-    ).first()
-    if active_sub:
+    if active_plan(request.user):
         messages.info(request, 'You already have an active subscription.')
         return redirect('subscriptions:my_subscription')
     return render(request, 'subscriptions/checkout.html', {'plan': plan})
@@ -3,13 +3,16 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
+from streamify_project.thumbnails import SrcsetField
 from .models import User
 
 
 class UserSerializer(serializers.ModelSerializer):
+    profile_picture_srcset = SrcsetField(source='profile_picture')
+
     class Meta:
         model = User
-        fields = ['id', 'name', 'email', 'role', 'profile_picture', 'bio', 'date_joined']
+        fields = ['id', 'name', 'email', 'role', 'profile_picture', 'profile_picture_srcset', 'bio', 'date_joined']
         read_only_fields = ['id', 'date_joined']
 
 
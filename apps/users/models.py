@@ -57,7 +57,5 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     @property
     def has_active_subscription(self):
-        return self.subscriptions.filter(
-            status='active',
-            end_date__gte=timezone.now().date()
-        ).exists()
+        from apps.subscriptions.entitlements import active_plan
+        return active_plan(self) is not None
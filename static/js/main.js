@@ -3,6 +3,9 @@
 document.addEventListener('DOMContentLoaded', function() {
     // Initialize play buttons
     initPlayButtons();
+
+    // Search-as-you-type
+    initSearchSuggestions();
     
     // Auto-dismiss alerts
     setTimeout(() => {
@@ -204,3 +207,38 @@ function getCookie(name) {
     }
     return cookieValue;
 }
+
+// ==================== Search Suggestions ====================
+
+function initSearchSuggestions() {
+    const input = document.querySelector('input[data-suggest-url]');
+    const list = document.getElementById('search-suggestions');
+    if (!input || !list) return;
+
+    let timer = null;
+    let latest = '';
+    input.addEventListener('input', function() {
+        clearTimeout(timer);
+        const query = this.value.trim();
+        if (!query) {
+            list.innerHTML = '';
+            return;
+        }
+        timer = setTimeout(() => {
+            latest = query;
+            fetch(`${input.dataset.suggestUrl}?q=${encodeURIComponent(query)}`)
+                .then(response => response.json())
+                .then(data => {
+                    if (data.query.trim() !== latest) return;  // a newer keystroke won
+                    list.innerHTML = '';
+                    data.suggestions.forEach(item => {
+                        const option = document.createElement('option');
+                        option.value = item.text;
+                        option.label = item.kind;
+                        list.appendChild(option);
+                    });
+                })
+                .catch(() => {});
+        }, 120);
+    });
+}
@@ -0,0 +1,219 @@
+"""
+Local media serving with HTTP range and cache validation support.
+
+Whole files and single ranges are returned as a FileResponse around a real
+file descriptor, so WSGI servers with ``wsgi.file_wrapper`` (gunicorn) push
+the bytes with os.sendfile() instead of copying them through Python.
+Multi-range requests are answered as multipart/byteranges read with
+os.pread(). Strong ETags and Last-Modified drive 304/412 responses and
+If-Range. With MEDIA_OFFLOAD set, the view only resolves the path and hands
+the transfer to the fronting proxy (nginx X-Accel-Redirect or X-Sendfile).
+"""
+import mimetypes
+import os
+import secrets
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+BLOCK_SIZE = 256 * 1024
+MAX_RANGES = 16
+
+
+class _RangeFile:
+    """
+    A file positioned at ``start`` that reads at most ``length`` bytes.
+
+    ``fileno()`` is kept so a sendfile-capable file_wrapper can send the
+    range from the current offset using Content-Length as the byte count;
+    ``read()`` is bounded for servers that fall back to iterating.
+    """
+
+    def __init__(self, fh, start, length):
+        self._fh = fh
+        self._remaining = length
+        fh.seek(start)
+
+    def fileno(self):
+        return self._fh.fileno()
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._fh.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._fh.close()
+
+
+def parse_range_header(header, size):
+    """
+    Return a sorted, coalesced list of inclusive (start, end) byte ranges,
+    [] if none is satisfiable, or None if the header should be ignored
+    (malformed, not bytes, or too many/overlapping ranges to be worth it).
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+    ranges = []
+    for spec in header[len('bytes='):].split(','):
+        spec = spec.strip()
+        if not spec:
+            continue
+        first, sep, last = spec.partition('-')
+        if not sep:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else size - 1
+                if start > end and last:
+                    return None
+            else:
+                suffix = int(last)
+                start, end = max(size - suffix, 0), size - 1
+                if suffix == 0:
+                    continue
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+    if len(ranges) > MAX_RANGES:
+        return None
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _if_range_allows(request, etag, mtime):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        # Strong comparison: a weak validator never matches
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and since == int(mtime)
+
+
+def _multipart(fh, ranges, size, content_type, boundary):
+    def part_header(start, end):
+        return (
+            f'\r\n--{boundary}\r\nContent-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+        ).encode()
+
+    closing = f'\r\n--{boundary}--\r\n'.encode()
+    length = sum(len(part_header(s, e)) + e - s + 1 for s, e in ranges) + len(closing)
+
+    def body():
+        fd = fh.fileno()
+        try:
+            for start, end in ranges:
+                yield part_header(start, end)
+                offset = start
+                while offset <= end:
+                    chunk = os.pread(fd, min(BLOCK_SIZE, end - offset + 1), offset)
+                    if not chunk:
+                        return
+                    offset += len(chunk)
+                    yield chunk
+            yield closing
+        finally:
+            fh.close()
+
+    return body(), length
+
+
+def _offload(path, fullpath, content_type, accel_location=None):
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_OFFLOAD == 'x-accel-redirect':
+        location = (accel_location or settings.MEDIA_ACCEL_REDIRECT_LOCATION).rstrip('/') + '/'
+        response['X-Accel-Redirect'] = location + quote(path.lstrip('/'))
+    else:
+        response['X-Sendfile'] = fullpath
+    return response
+
+
+@require_safe
+def serve_media(request, path, document_root=None, accel_location=None):
+    document_root = document_root or settings.MEDIA_ROOT
+    if not document_root:
+        # abspath('') is the working directory, .env and all
+        raise ImproperlyConfigured('serve_media needs a document_root or MEDIA_ROOT')
+    try:
+        fullpath = safe_join(os.path.abspath(document_root), path.lstrip('/'))
+    except SuspiciousFileOperation:
+        raise Http404('File not found')
+    try:
+        fh = open(fullpath, 'rb')
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError, PermissionError):
+        raise Http404('File not found')
+
+    content_type, _ = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+    if getattr(settings, 'MEDIA_OFFLOAD', ''):
+        fh.close()
+        return _offload(path, fullpath, content_type, accel_location)
+
+    stat = os.fstat(fh.fileno())
+    size = stat.st_size
+    etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if conditional is not None:
+        fh.close()
+        response = conditional
+    else:
+        ranges = None
+        if _if_range_allows(request, etag, stat.st_mtime):
+            ranges = parse_range_header(request.META.get('HTTP_RANGE', ''), size)
+
+        if ranges == []:
+            fh.close()
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        elif not ranges:
+            response = FileResponse(fh, content_type=content_type)
+            response['Content-Length'] = str(size)
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            response = FileResponse(_RangeFile(fh, start, end - start + 1), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            boundary = secrets.token_hex(16)
+            body, length = _multipart(fh, ranges, size, content_type, boundary)
+            response = StreamingHttpResponse(
+                body, status=206, content_type=f'multipart/byteranges; boundary={boundary}'
+            )
+            response['Content-Length'] = str(length)
+
+        if request.method == 'HEAD' and response.streaming:
+            response.close()
+            fh.close()
+            head = HttpResponse(status=response.status_code, content_type=response['Content-Type'])
+            for header in ('Content-Range', 'Content-Length'):
+                if response.has_header(header):
+                    head[header] = response[header]
+            response = head
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    patch_cache_control(response, max_age=getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600))
+    return response
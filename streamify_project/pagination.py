@@ -0,0 +1,220 @@
+"""
+Keyset (cursor) pagination shared by the HTML list views and the REST API.
+
+Pages are addressed by the ordering values of the boundary row rather than an
+OFFSET, so a deep page costs the same index range scan as the first one.
+Cursors are signed, so clients cannot forge positions or replay a cursor
+against a different ordering. Counting the full result set is optional.
+"""
+import datetime
+import decimal
+import uuid
+
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def _dump_value(value):
+    # isoformat() keeps microseconds; DjangoJSONEncoder would truncate them
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    return value
+
+
+class KeysetPage:
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<KeysetPage of {len(self.object_list)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @property
+    def count(self):
+        return self.paginator.count
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate ``queryset`` by its ordering (or ``ordering`` if given).
+
+    The ordering is made total by appending the primary key when it is not
+    already the last term; ordering fields must be non-nullable model fields.
+    With ``with_count=False`` no COUNT(*) is issued and ``count`` is None.
+    """
+
+    def __init__(self, queryset, per_page, ordering=None, with_count=True, salt='keyset'):
+        ordering = list(ordering or queryset.query.order_by or queryset.model._meta.ordering)
+        if not all(isinstance(term, str) for term in ordering):
+            raise ImproperlyConfigured('KeysetPaginator only supports ordering by field names.')
+        if not ordering or ordering[-1].lstrip('-') not in ('pk', 'id'):
+            ordering.append('-pk' if ordering and ordering[0].startswith('-') else 'pk')
+        self.ordering = tuple(ordering)
+        self.queryset = queryset.order_by(*self.ordering)
+        self.per_page = int(per_page)
+        self.with_count = with_count
+        self.salt = f'{salt}:{queryset.model._meta.label}:{",".join(self.ordering)}'
+        self._fields = [self._model_field(term.lstrip('-')) for term in self.ordering]
+
+    def _model_field(self, name):
+        opts = self.queryset.model._meta
+        if name == 'pk':
+            return opts.pk
+        try:
+            return opts.get_field(name)
+        except FieldDoesNotExist:
+            return None  # annotation
+
+    @cached_property
+    def count(self):
+        return self.queryset.count() if self.with_count else None
+
+    def _values(self, obj):
+        return [
+            getattr(obj, field.attname if field else term.lstrip('-'))
+            for term, field in zip(self.ordering, self._fields)
+        ]
+
+    def encode_cursor(self, obj, backwards=False):
+        payload = {'v': [_dump_value(v) for v in self._values(obj)], 'd': 'p' if backwards else 'n'}
+        return signing.dumps(payload, salt=self.salt, compress=True)
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = signing.loads(cursor, salt=self.salt)
+            raw = payload['v']
+            if len(raw) != len(self.ordering):
+                raise ValueError('cursor does not match ordering')
+            values = [field.to_python(v) if field else v for v, field in zip(raw, self._fields)]
+        except (signing.BadSignature, KeyError, TypeError, ValueError) as exc:
+            raise InvalidCursor(str(exc)) from exc
+        return values, payload.get('d') == 'p'
+
+    def _seek(self, values, backwards):
+        # (a, b, c) > (x, y, z) expanded to an OR of prefix-equal comparisons
+        condition = Q()
+        for i, term in enumerate(self.ordering):
+            descending = term.startswith('-')
+            lookup = 'gt' if descending == backwards else 'lt'
+            name = term.lstrip('-')
+            clause = Q(**{f'{name}__{lookup}': values[i]})
+            for prev_term, prev_value in zip(self.ordering[:i], values[:i]):
+                clause &= Q(**{prev_term.lstrip('-'): prev_value})
+            condition |= clause
+        return condition
+
+    def after(self, values):
+        """The rows following the one with ordering values ``values``, as a queryset."""
+        return self.queryset.filter(self._seek(values, False))
+
+    def page(self, cursor=None):
+        """Return the page after/before ``cursor``; raises InvalidCursor for bad input."""
+        backwards = False
+        queryset = self.queryset
+        if cursor:
+            values, backwards = self.decode_cursor(cursor)
+            queryset = queryset.filter(self._seek(values, backwards))
+            if backwards:
+                queryset = queryset.reverse()
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+
+        next_cursor = self.encode_cursor(rows[-1]) if rows and has_next else None
+        previous_cursor = self.encode_cursor(rows[0], backwards=True) if rows and has_previous else None
+        return KeysetPage(rows, self, next_cursor, previous_cursor)
+
+    def get_page(self, cursor=None):
+        """Like page(), but falls back to the first page on a bad cursor."""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
+
+
+class KeysetPagination(BasePagination):
+    """DRF pagination class backed by KeysetPaginator (``?cursor=``)."""
+
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    with_count = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.paginator = KeysetPaginator(queryset, self.page_size, with_count=self.with_count, salt='api')
+        try:
+            self.page = self.paginator.page(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise NotFound('Invalid cursor.')
+        return list(self.page)
+
+    def restore_page(self, request, rows, next_cursor, previous_cursor):
+        """Answer with a page computed earlier (a cached one, so without a count) without querying."""
+        self.request = request
+        self.paginator = None
+        self.page = KeysetPage(rows, None, next_cursor, previous_cursor)
+        return rows
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self._link(self.page.next_cursor),
+            'previous': self._link(self.page.previous_cursor),
+        }
+        if self.with_count:
+            payload['count'] = self.paginator.count
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
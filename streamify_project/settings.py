@@ -5,9 +5,6 @@ Django settings for Streamify - Video & Music Streaming Platform
 import os
 from pathlib import Path
 from decouple import config
-import cloudinary
-import cloudinary.uploader
-import cloudinary.api
 import dj_database_url
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -109,7 +106,73 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 MEDIA_URL = '/media/'
-# MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_ROOT = config('MEDIA_ROOT', default=str(BASE_DIR / 'media'))
+
+# Local media serving (streamify_project/media_server.py). MEDIA_OFFLOAD hands
+# transfers to the proxy: 'x-accel-redirect' (nginx, internal location below)
+# or 'x-sendfile' (Apache/lighttpd); empty serves through sendfile/FileResponse
+SERVE_MEDIA = config('SERVE_MEDIA', default=DEBUG, cast=bool)
+MEDIA_OFFLOAD = config('MEDIA_OFFLOAD', default='')
+MEDIA_ACCEL_REDIRECT_LOCATION = config('MEDIA_ACCEL_REDIRECT_LOCATION', default='/protected-media/')
+MEDIA_CACHE_MAX_AGE = config('MEDIA_CACHE_MAX_AGE', default=3600, cast=int)
+
+# Where new Content uploads go: 'cloudinary', or 'local' for the sharded,
+# content-addressed store in LOCAL_MEDIA_ROOT (streamify_project/storage.py)
+MEDIA_STORAGE_BACKEND = config('MEDIA_STORAGE_BACKEND', default='cloudinary')
+LOCAL_MEDIA_ROOT = config('LOCAL_MEDIA_ROOT', default=str(BASE_DIR / 'var' / 'media'))
+LOCAL_MEDIA_URL = '/media/local/'
+LOCAL_MEDIA_ACCEL_REDIRECT_LOCATION = config('LOCAL_MEDIA_ACCEL_REDIRECT_LOCATION', default='/protected-local-media/')
+
+# Django's default upload handlers, plus a SHA-256 of each file computed while
+# it is received; uploads of known bytes reuse the stored file (apps/content/dedup.py)
+FILE_UPLOAD_HANDLERS = [
+    'apps.content.upload_handlers.HashingMemoryFileUploadHandler',
+    'apps.content.upload_handlers.HashingTemporaryFileUploadHandler',
+]
+
+# Image variants for cards and avatars (streamify_project/thumbnails.py).
+# Local images are resized by THUMBNAIL_WORKERS processes and cached on disk
+THUMBNAIL_WIDTHS = (160, 320, 640)
+THUMBNAIL_QUALITY = config('THUMBNAIL_QUALITY', default=80, cast=int)
+THUMBNAIL_WORKERS = config('THUMBNAIL_WORKERS', default=2, cast=int)
+THUMBNAIL_CACHE_DIR = config('THUMBNAIL_CACHE_DIR', default=str(BASE_DIR / 'var' / 'thumbnails'))
+THUMBNAIL_CACHE_MAX_BYTES = config('THUMBNAIL_CACHE_MAX_BYTES', default=1024 ** 3, cast=int)
+THUMBNAIL_ACCEL_REDIRECT_LOCATION = config('THUMBNAIL_ACCEL_REDIRECT_LOCATION', default='/protected-thumbnails/')
+
+# Full-text search (apps/search/engine.py): the PostgreSQL text search
+# configuration, and how strongly ln(1 + views) lifts relevance
+SEARCH_CONFIG = config('SEARCH_CONFIG', default='english')
+SEARCH_POPULARITY_WEIGHT = config('SEARCH_POPULARITY_WEIGHT', default=0.1, cast=float)
+# Matches one search request ranks by relevance and counts exactly
+# (apps/search/ranking.py); broader queries get an estimated count, and their
+# later pages follow the rest of the matches by trending
+SEARCH_SCAN_LIMIT = config('SEARCH_SCAN_LIMIT', default=1000, cast=int)
+# "Did you mean" (apps/search/fuzzy.py): the share of a query's trigrams a
+# candidate needs (pg_trgm word similarity on PostgreSQL), and how much
+# ln(1 + views) adds to a candidate's edit-distance similarity
+SEARCH_FUZZY_THRESHOLD = config('SEARCH_FUZZY_THRESHOLD', default=0.3, cast=float)
+SEARCH_FUZZY_POPULARITY_WEIGHT = config('SEARCH_FUZZY_POPULARITY_WEIGHT', default=0.01, cast=float)
+# Autocomplete (apps/search/suggest.py): workers memory-map one snapshot
+# (`manage.py build_suggest_index`) and replay changes logged in CACHES
+SUGGEST_SNAPSHOT_PATH = config('SUGGEST_SNAPSHOT_PATH', default=str(BASE_DIR / 'var' / 'suggest' / 'index.bin'))
+SUGGEST_REFRESH_INTERVAL = config('SUGGEST_REFRESH_INTERVAL', default=1.0, cast=float)
+# Items changed since the snapshot before a worker rebuilds it
+SUGGEST_OVERLAY_MAX_ENTRIES = config('SUGGEST_OVERLAY_MAX_ENTRIES', default=10000, cast=int)
+
+# Resumable chunked uploads (apps/content/uploads.py): parts wait in
+# UPLOAD_TMP_DIR until finalize; idle sessions expire after the TTL
+UPLOAD_TMP_DIR = config('UPLOAD_TMP_DIR', default=str(BASE_DIR / 'var' / 'uploads'))
+UPLOAD_CHUNK_SIZE = config('UPLOAD_CHUNK_SIZE', default=8 * 1024 * 1024, cast=int)
+UPLOAD_MAX_SIZE = config('UPLOAD_MAX_SIZE', default=10 * 1024 ** 3, cast=int)
+UPLOAD_SESSION_TTL_HOURS = config('UPLOAD_SESSION_TTL_HOURS', default=24, cast=int)
+
+# Media processing after upload (apps/content/media_jobs.py): 'local' runs a
+# thread pool in each web process, 'worker' leaves jobs to
+# `manage.py process_media_jobs`, 'sync' processes inside the request
+MEDIA_PROCESSING_BACKEND = config('MEDIA_PROCESSING_BACKEND', default='local')
+MEDIA_PROCESSING_WORKERS = config('MEDIA_PROCESSING_WORKERS', default=2, cast=int)
+MEDIA_PROCESSING_MAX_ATTEMPTS = config('MEDIA_PROCESSING_MAX_ATTEMPTS', default=4, cast=int)
+MEDIA_PROCESSING_JOB_TIMEOUT = config('MEDIA_PROCESSING_JOB_TIMEOUT', default=15 * 60, cast=int)
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -139,10 +202,57 @@ CORS_ALLOWED_ORIGINS = [
 ]
 CORS_ALLOW_CREDENTIALS = True
 
+# Subscription lifecycle (`manage.py sweep_subscriptions`): auto-renewing
+# subscriptions lapsed at most this many days are renewed, older ones expire
+SUBSCRIPTION_RENEWAL_GRACE_DAYS = config('SUBSCRIPTION_RENEWAL_GRACE_DAYS', default=3, cast=int)
+
 # Stripe
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='')
 STRIPE_PUBLISHABLE_KEY = config('STRIPE_PUBLISHABLE_KEY', default='')
 
+# Cache (shared between workers when REDIS_URL is set, per-process otherwise)
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+
+# Search, browse and API result pages (apps/content/result_cache.py), kept
+# until Content/Genre changes bump their versions or this many seconds pass.
+# Off without Redis: per-process caches would miss other workers' changes
+RESULT_CACHE_TIMEOUT = config('RESULT_CACHE_TIMEOUT', default=300 if REDIS_URL else 0, cast=int)
+# Premium entitlements (apps/subscriptions/entitlements.py) are cached until
+# the plan lapses or billing changes; free users are re-checked this often.
+# 0 resolves once per request only (no Redis to share invalidations)
+ENTITLEMENT_CACHE_TIMEOUT = config('ENTITLEMENT_CACHE_TIMEOUT', default=3600 if REDIS_URL else 0, cast=int)
+
+# Content view ingestion: 'memory' buffers per worker, 'cache' shares one
+# buffer through CACHES (needs Redis/Memcached), 'sync' writes every view inline
+CONTENT_VIEW_BUFFER_BACKEND = config('CONTENT_VIEW_BUFFER_BACKEND', default='cache' if REDIS_URL else 'memory')
+CONTENT_VIEW_BUFFER_SIZE = config('CONTENT_VIEW_BUFFER_SIZE', default=500, cast=int)
+CONTENT_VIEW_FLUSH_INTERVAL = config('CONTENT_VIEW_FLUSH_INTERVAL', default=5, cast=int)
+# Views buffered beyond this are dropped; a batch failing this many writes is logged and dropped
+CONTENT_VIEW_BUFFER_MAX_EVENTS = config('CONTENT_VIEW_BUFFER_MAX_EVENTS', default=100_000, cast=int)
+CONTENT_VIEW_MAX_ATTEMPTS = config('CONTENT_VIEW_MAX_ATTEMPTS', default=5, cast=int)
+
+# Raw view retention: purge_content_views archives rows older than this
+# (and already rolled up) into gzipped daily partitions, then deletes them
+CONTENT_VIEW_RETENTION_DAYS = config('CONTENT_VIEW_RETENTION_DAYS', default=90, cast=int)
+CONTENT_VIEW_ARCHIVE_DIR = config('CONTENT_VIEW_ARCHIVE_DIR', default=str(BASE_DIR / 'var' / 'archive' / 'content_views'))
+
+# Trending: engagement loses half its weight every N hours
+# (run `manage.py rebuild_trending` after changing it)
+TRENDING_HALF_LIFE_HOURS = config('TRENDING_HALF_LIFE_HOURS', default=24, cast=float)
+
+# Offline recommender model (item factors written by refresh_recommendations)
+RECOMMENDER_MODEL_PATH = config('RECOMMENDER_MODEL_PATH', default=str(BASE_DIR / 'var' / 'recommender.npz'))
+# "For you" lists cached by the web workers and primed by refresh_recommendations.
+# Off without Redis: the command's per-process cache never reaches the workers
+RECOMMENDATION_CACHE_TIMEOUT = config('RECOMMENDATION_CACHE_TIMEOUT', default=3600 if REDIS_URL else 0, cast=int)
+
 # Login/Logout redirects
 LOGIN_URL = '/users/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
@@ -170,4 +280,8 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 
 
-CLOUDINARY_URL = config('CLOUDINARY_URL')
+# Only required while uploads go to Cloudinary
+if MEDIA_STORAGE_BACKEND == 'cloudinary':
+    CLOUDINARY_URL = config('CLOUDINARY_URL')
+else:
+    CLOUDINARY_URL = config('CLOUDINARY_URL', default='')
@@ -0,0 +1,119 @@
+"""
+Content-addressed local file storage.
+
+Files are named by the SHA-256 of their bytes and sharded into nested
+directories (``ab/cd/abcd...ef.mp4``) so no directory grows too large.
+Uploads are streamed chunk by chunk into a temporary file under the storage
+root while being hashed, fsynced, then moved into place with an atomic
+rename; identical uploads end up as a single file.
+"""
+import hashlib
+import os
+import tempfile
+from datetime import datetime, timezone
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import Storage
+from django.utils._os import safe_join
+from django.utils.deconstruct import deconstructible
+from django.utils.encoding import filepath_to_uri
+
+CHUNK_SIZE = 1024 * 1024
+
+
+@deconstructible
+class ShardedHashStorage(Storage):
+    def __init__(self, location=None, base_url=None, depth=2, width=2):
+        self._location = location
+        self._base_url = base_url
+        self.depth = depth
+        self.width = width
+
+    @property
+    def location(self):
+        return os.path.abspath(self._location or settings.LOCAL_MEDIA_ROOT)
+
+    @property
+    def base_url(self):
+        url = self._base_url or settings.LOCAL_MEDIA_URL
+        return url if url.endswith('/') else url + '/'
+
+    def path(self, name):
+        return safe_join(self.location, name)
+
+    def hashed_name(self, digest, original_name=''):
+        ext = os.path.splitext(original_name)[1].lower()[:16]
+        shards = [digest[i * self.width:(i + 1) * self.width] for i in range(self.depth)]
+        return '/'.join(shards + [digest + ext])
+
+    def get_available_name(self, name, max_length=None):
+        # Names are decided by content in _save(); nothing to de-duplicate here
+        return name
+
+    def _save(self, name, content):
+        tmp_dir = os.path.join(self.location, '.tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                if hasattr(content, 'seek') and getattr(content, 'seekable', lambda: True)():
+                    content.seek(0)
+                for chunk in content.chunks(CHUNK_SIZE) if hasattr(content, 'chunks') else iter(lambda: content.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    out.write(chunk)
+                out.flush()
+                os.fsync(out.fileno())
+            final_name = self.hashed_name(digest.hexdigest(), name)
+            final_path = self.path(final_name)
+            # Replaced even when the same bytes are stored: an existing file
+            # may be unlinked by a concurrent delete right after any check
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, final_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return final_name
+
+    def _open(self, name, mode='rb'):
+        return File(open(self.path(name), mode))
+
+    def delete(self, name):
+        try:
+            os.unlink(self.path(name))
+        except FileNotFoundError:
+            pass
+
+    def exists(self, name):
+        return os.path.exists(self.path(name))
+
+    def listdir(self, path):
+        directories, files = [], []
+        with os.scandir(self.path(path)) as entries:
+            for entry in entries:
+                if entry.name == '.tmp':
+                    continue
+                (directories if entry.is_dir() else files).append(entry.name)
+        return directories, files
+
+    def size(self, name):
+        return os.path.getsize(self.path(name))
+
+    def url(self, name):
+        return urljoin(self.base_url, filepath_to_uri(name))
+
+    def get_modified_time(self, name):
+        return datetime.fromtimestamp(os.path.getmtime(self.path(name)), tz=timezone.utc)
+
+    def get_created_time(self, name):
+        return datetime.fromtimestamp(os.path.getctime(self.path(name)), tz=timezone.utc)
+
+    def get_accessed_time(self, name):
+        return datetime.fromtimestamp(os.path.getatime(self.path(name)), tz=timezone.utc)
+
+
+local_media_storage = ShardedHashStorage()
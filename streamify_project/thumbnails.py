@@ -0,0 +1,282 @@
+"""
+Fixed-size WebP/JPEG derivatives of uploaded images.
+
+Cards and avatars ask for an image at one of THUMBNAIL_WIDTHS instead of the
+uploaded original. Images in Cloudinary are resized by Cloudinary itself
+(transformation URLs). Local images (the sharded store and MEDIA_ROOT) are
+resized with Pillow in a process pool the first time a variant is requested
+and cached on disk under the SHA-256 of the source bytes, so identical
+uploads share variants. The cache is trimmed least-recently-used first once
+it grows past THUMBNAIL_CACHE_MAX_BYTES.
+"""
+import functools
+import hashlib
+import mimetypes
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.http import Http404
+from django.urls import reverse
+from django.utils._os import safe_join
+from rest_framework import serializers
+
+from .storage import local_media_storage
+
+DEFAULT_WIDTHS = (160, 320, 640)
+FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+RENDER_TIMEOUT = 30
+# Cache hits refresh the file's mtime (the LRU clock) at most this often
+TOUCH_INTERVAL = 60 * 60
+# Eviction trims the cache to this fraction of the limit
+EVICT_TO = 0.9
+
+mimetypes.add_type('image/webp', '.webp')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def widths():
+    return tuple(_setting('THUMBNAIL_WIDTHS', DEFAULT_WIDTHS))
+
+
+def cache_dir():
+    return os.path.abspath(_setting('THUMBNAIL_CACHE_DIR', os.path.join(settings.BASE_DIR, 'var', 'thumbnails')))
+
+
+# ── URLs ──────────────────────────────────────
+
+def _local_source(image):
+    """Return (kind, name) for images this module resizes itself, else None."""
+    from apps.content.fields import LocalMedia
+
+    if isinstance(image, LocalMedia):
+        return 'local', image.name
+    storage = getattr(image, 'storage', None)
+    if isinstance(storage, FileSystemStorage) and getattr(image, 'name', None):
+        return 'media', image.name
+    return None
+
+
+def variant_url(image, width, fmt='jpg'):
+    """URL of ``image`` resized to ``width`` pixels wide, in ``fmt`` ('webp' or 'jpg')."""
+    if not image:
+        return ''
+    source = _local_source(image)
+    if source:
+        kind, name = source
+        return reverse('thumbnail', kwargs={'kind': kind, 'width': width, 'fmt': fmt, 'path': name})
+    if hasattr(image, 'build_url'):  # CloudinaryResource
+        return image.build_url(
+            secure=True, width=width, crop='limit', quality='auto',
+            format='jpg' if fmt == 'jpg' else 'webp',
+        )
+    return image.url
+
+
+def srcset(image, fmt='jpg', absolute=lambda url: url):
+    """A srcset attribute value listing every configured width."""
+    if not image:
+        return ''
+    return ', '.join(f'{absolute(variant_url(image, width, fmt))} {width}w' for width in widths())
+
+
+def default_width():
+    return widths()[len(widths()) // 2]
+
+
+class SrcsetField(serializers.ReadOnlyField):
+    """An image as {'src': ..., 'srcset': {'webp': ..., 'jpg': ...}}."""
+
+    def to_representation(self, image):
+        if not image:
+            return None
+        request = self.context.get('request')
+        absolute = request.build_absolute_uri if request else (lambda url: url)
+        return {
+            'src': absolute(variant_url(image, default_width(), 'jpg')),
+            'srcset': {fmt: srcset(image, fmt, absolute) for fmt in FORMATS},
+        }
+
+
+# ── Rendering ─────────────────────────────────
+
+def render_variant(source_path, target_path, width, fmt, quality):
+    """Resize ``source_path`` into ``target_path``. Runs in a worker process."""
+    from PIL import Image, ImageOps
+
+    with Image.open(source_path) as image:
+        # JPEG sources decode straight at a reduced scale
+        image.draft('RGB', (width, max(width * image.height // max(image.width, 1), 1)))
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            image.thumbnail((width, image.height), Image.LANCZOS)
+        if fmt == 'jpg':
+            image = image.convert('RGB')
+            options = {'quality': quality, 'optimize': True, 'progressive': True}
+        else:
+            if image.mode not in ('RGB', 'RGBA'):
+                transparent = 'A' in image.mode or 'transparency' in image.info
+                image = image.convert('RGBA' if transparent else 'RGB')
+            options = {'quality': quality, 'method': 4}
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target_path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                image.save(out, FORMATS[fmt], **options)
+            os.replace(tmp_path, target_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+    return os.path.getsize(target_path)
+
+
+_state_lock = threading.Lock()
+_state = {'pid': None, 'pool': None, 'inflight': {}, 'cached_bytes': None}
+
+
+def _get_pool():
+    """Return this process's render pool, rebuilding it after a fork."""
+    if _state['pid'] != os.getpid():
+        with _state_lock:
+            if _state['pid'] != os.getpid():
+                _state.update(
+                    pid=os.getpid(), inflight={}, cached_bytes=None,
+                    # Spawned, not forked: web workers are multi-threaded
+                    pool=ProcessPoolExecutor(
+                        max_workers=_setting('THUMBNAIL_WORKERS', 2),
+                        mp_context=multiprocessing.get_context('spawn'),
+                    ),
+                )
+    return _state['pool']
+
+
+def _render(source_path, target_path, width, fmt):
+    """Render through the pool; concurrent requests for one variant share a render."""
+    pool = _get_pool()
+    with _state_lock:
+        future = _state['inflight'].get(target_path)
+        if future is None:
+            future = pool.submit(render_variant, source_path, target_path, width, fmt,
+                                 _setting('THUMBNAIL_QUALITY', 80))
+            _state['inflight'][target_path] = future
+            owner = True
+        else:
+            owner = False
+    try:
+        size = future.result(timeout=RENDER_TIMEOUT)
+    finally:
+        if owner:
+            with _state_lock:
+                _state['inflight'].pop(target_path, None)
+    if owner:
+        _account(size)
+
+
+# ── Disk cache ────────────────────────────────
+
+@functools.lru_cache(maxsize=4096)
+def _file_digest(path, size, mtime_ns):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source(kind, name):
+    """Return (source_path, content_hash) for a variant request."""
+    try:
+        if kind == 'local':
+            path = local_media_storage.path(name)
+            # Sharded names are already the SHA-256 of the bytes
+            digest = os.path.splitext(os.path.basename(name))[0]
+        else:
+            path = default_storage.path(name)
+            stat = os.stat(path)
+            digest = _file_digest(path, stat.st_size, stat.st_mtime_ns)
+    except (SuspiciousFileOperation, FileNotFoundError, NotImplementedError):
+        raise Http404('Image not found')
+    if not os.path.isfile(path):
+        raise Http404('Image not found')
+    return path, digest
+
+
+def _cache_entries(root):
+    for directory, _subdirs, files in os.walk(root):
+        for filename in files:
+            if filename.endswith('.tmp'):
+                continue
+            path = os.path.join(directory, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield stat.st_mtime, stat.st_size, path
+
+
+def evict(max_bytes=None):
+    """Delete least recently used variants until the cache fits. Returns bytes freed."""
+    max_bytes = _setting('THUMBNAIL_CACHE_MAX_BYTES', 1024 ** 3) if max_bytes is None else max_bytes
+    entries = sorted(_cache_entries(cache_dir()))
+    total = sum(size for _mtime, size, _path in entries)
+    freed = 0
+    if total > max_bytes:
+        target = max_bytes * EVICT_TO
+        for _mtime, size, path in entries:
+            if total - freed <= target:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            freed += size
+    _state['cached_bytes'] = total - freed
+    return freed
+
+
+def _account(size):
+    """Track the cache size in this process and evict when it is over the limit."""
+    if _state['cached_bytes'] is None:
+        evict()
+    with _state_lock:
+        _state['cached_bytes'] += size
+        over = _state['cached_bytes'] > _setting('THUMBNAIL_CACHE_MAX_BYTES', 1024 ** 3)
+    if over:
+        evict()
+
+
+def variant_path(kind, name, width, fmt):
+    """Return the cached variant's path, rendering it first if needed."""
+    if width not in widths() or fmt not in FORMATS:
+        raise Http404('Unknown thumbnail size')
+    source_path, digest = _source(kind, name)
+    relative = os.path.join(digest[:2], f'{digest}-{width}.{fmt}')
+    target_path = safe_join(cache_dir(), relative)
+    try:
+        stat = os.stat(target_path)
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        try:
+            _render(source_path, target_path, width, fmt)
+        except OSError:  # not a readable image
+            raise Http404('Image could not be resized')
+    else:
+        if time.time() - stat.st_mtime > TOUCH_INTERVAL:
+            os.utime(target_path)
+    return relative
+
+
+def serve_thumbnail(request, kind, width, fmt, path):
+    from .media_server import serve_media
+
+    relative = variant_path(kind, path, int(width), fmt)
+    return serve_media(request, relative, document_root=cache_dir(),
+                       accel_location=_setting('THUMBNAIL_ACCEL_REDIRECT_LOCATION', '/protected-thumbnails/'))
@@ -1,29 +1,10 @@
-import os
-import mimetypes
 from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
-from django.http import Http404
 
-# --- THE FIX: Custom view to handle video range requests locally ---
-def ranged_media_serve(request, path, document_root=None):
-    from ranged_response import RangedFileResponse
-    
-    # Securely resolve the file path
-    document_root = os.path.abspath(document_root)
-    fullpath = os.path.normpath(os.path.join(document_root, path.lstrip('/')))
-    
-    # Check if file exists and is safely inside the media folder
-    if not fullpath.startswith(document_root) or not os.path.exists(fullpath):
-        raise Http404("File not found")
-        
-    # Guess the content type (e.g., video/mp4)
-    content_type, _ = mimetypes.guess_type(fullpath)
-    content_type = content_type or 'application/octet-stream'
-    
-    # Return the special ranged response
-    return RangedFileResponse(request, open(fullpath, 'rb'), content_type=content_type)
+from .media_server import serve_media
+from .thumbnails import serve_thumbnail
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -44,11 +25,26 @@ urlpatterns = [
     ])),
 ]
 
-if settings.DEBUG:
-    # 1. Route media files through our new ranged_media_serve view
+# Resized variants of locally stored images (see thumbnails.py)
+urlpatterns += [
+    re_path(r'^media/thumbs/(?P<kind>local|media)/(?P<width>\d+)w\.(?P<fmt>webp|jpg)/(?P<path>.+)$',
+            serve_thumbnail, name='thumbnail'),
+]
+
+# Content-addressed local uploads (MEDIA_STORAGE_BACKEND = 'local'); always
+# mounted so files stored locally keep resolving after switching backends
+urlpatterns += [
+    re_path(r'^media/local/(?P<path>.*)$', serve_media, {
+        'document_root': settings.LOCAL_MEDIA_ROOT,
+        'accel_location': settings.LOCAL_MEDIA_ACCEL_REDIRECT_LOCATION,
+    }),
+]
+
+if settings.SERVE_MEDIA:
+    # Local media with range, ETag/304 and sendfile or proxy offload support
     urlpatterns += [
-        re_path(r'^media/(?P<path>.*)$', ranged_media_serve, {'document_root': settings.MEDIA_ROOT}),
+        re_path(r'^media/(?P<path>.*)$', serve_media, {'document_root': settings.MEDIA_ROOT}),
     ]
-    
-    # 2. Keep standard static files setup for CSS/JS
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
+
+if settings.DEBUG:
+    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)